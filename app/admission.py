@@ -0,0 +1,202 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Admission control for live sessions.
+
+Each instance runs at most MAX_LIVE_SESSIONS Gemini Live sessions. Connections
+beyond that wait in a short FIFO queue and are told their position and an ETA;
+once the queue is full (or a waiter times out) the connection is rejected
+quickly so the client can retry with backoff, ideally against another instance.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional
+
+from app.metrics import (
+    ADMISSION_REJECTED_TOTAL,
+    ADMISSION_WAIT_SECONDS,
+    ADMISSION_WAITING,
+    LIVE_SESSION_CAPACITY,
+    LIVE_SESSION_OCCUPANCY,
+    LIVE_SESSIONS_ACTIVE,
+)
+
+# --- Configurable constants ---
+MAX_LIVE_SESSIONS = int(os.getenv("MAX_LIVE_SESSIONS", "40"))
+# How many connections may wait for a slot, and for how long.
+ADMISSION_QUEUE_MAX = int(os.getenv("ADMISSION_QUEUE_MAX", "20"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "30"))
+# Seed for the session-length estimate used in ETAs until real sessions have ended.
+ADMISSION_EXPECTED_SESSION_SECONDS = float(os.getenv("ADMISSION_EXPECTED_SESSION_SECONDS", "600"))
+
+# WebSocket close code 1013 is "Try Again Later".
+ADMISSION_REJECT_CLOSE_CODE = 1013
+
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+# Weight of the newest session in the running session-length average.
+_SESSION_SECONDS_ALPHA = 0.2
+
+PositionCallback = Callable[[int, float], Awaitable[None]]
+
+
+class AdmissionRejected(Exception):
+    """Raised by AdmissionController.acquire() when the connection should be shed."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("admitted", "moved")
+
+    def __init__(self) -> None:
+        self.admitted = False
+        self.moved = asyncio.Event()
+
+
+class AdmissionController:
+    """
+    Counting limiter with a bounded FIFO wait queue.
+
+    acquire() returns a ticket that must be passed to release() when the live
+    session ends. Slots are handed directly to the oldest waiter on release,
+    so a newly arriving connection can never jump the queue.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = MAX_LIVE_SESSIONS,
+        max_waiting: int = ADMISSION_QUEUE_MAX,
+        wait_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        expected_session_seconds: float = ADMISSION_EXPECTED_SESSION_SECONDS,
+    ):
+        self.max_sessions = max(1, max_sessions)
+        self.max_waiting = max(0, max_waiting)
+        self.wait_timeout = wait_timeout
+        self.mean_session_seconds = expected_session_seconds
+        self.active = 0
+        self._waiters: Deque[_Waiter] = deque()
+        LIVE_SESSION_CAPACITY.set(self.max_sessions)
+        self._publish()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def occupancy(self) -> float:
+        return self.active / self.max_sessions
+
+    def eta_seconds(self, position: int) -> float:
+        """Expected wait for the waiter at `position` (1-based), assuming slots free up at max_sessions / mean session length."""
+        return position * self.mean_session_seconds / self.max_sessions
+
+    def _publish(self) -> None:
+        LIVE_SESSIONS_ACTIVE.set(self.active)
+        LIVE_SESSION_OCCUPANCY.set(self.occupancy)
+        ADMISSION_WAITING.set(len(self._waiters))
+
+    def _wake_waiters(self) -> None:
+        for waiter in self._waiters:
+            waiter.moved.set()
+
+    def _admit_waiters(self) -> None:
+        admitted = False
+        while self._waiters and self.active < self.max_sessions:
+            waiter = self._waiters.popleft()
+            waiter.admitted = True
+            waiter.moved.set()
+            self.active += 1
+            admitted = True
+        if admitted:
+            self._wake_waiters()
+        self._publish()
+
+    async def acquire(self, on_position: Optional[PositionCallback] = None) -> float:
+        """
+        Waits for a live-session slot. `on_position(position, eta_seconds)` is
+        awaited whenever this connection's queue position changes. Raises
+        AdmissionRejected if the queue is full or the wait times out.
+        """
+        started = time.monotonic()
+        if self.active < self.max_sessions and not self._waiters:
+            self.active += 1
+            self._publish()
+            ADMISSION_WAIT_SECONDS.observe(0.0)
+            return started
+        if len(self._waiters) >= self.max_waiting:
+            ADMISSION_REJECTED_TOTAL.inc(reason=QUEUE_FULL)
+            raise AdmissionRejected(QUEUE_FULL)
+
+        waiter = _Waiter()
+        self._waiters.append(waiter)
+        self._publish()
+        deadline = started + self.wait_timeout
+        last_position = None
+        try:
+            while not waiter.admitted:
+                position = self._waiters.index(waiter) + 1
+                if on_position is not None and position != last_position:
+                    last_position = position
+                    await on_position(position, self.eta_seconds(position))
+                    continue  # the callback may have yielded long enough to be admitted
+                waiter.moved.clear()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AdmissionRejected(QUEUE_TIMEOUT)
+                try:
+                    await asyncio.wait_for(waiter.moved.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException as e:
+            if waiter.admitted:
+                # Cancelled (e.g. the client left) right after being handed a slot.
+                self.release(None)
+            else:
+                self._waiters.remove(waiter)
+                self._wake_waiters()
+                self._publish()
+                if isinstance(e, AdmissionRejected):
+                    ADMISSION_REJECTED_TOTAL.inc(reason=e.reason)
+            raise
+        return self._admitted(started)
+
+    def _admitted(self, started: float) -> float:
+        admitted_at = time.monotonic()
+        ADMISSION_WAIT_SECONDS.observe(admitted_at - started)
+        return admitted_at
+
+    def release(self, ticket: Optional[float]) -> None:
+        """Frees the slot taken by acquire() and hands it to the next waiter, if any."""
+        if ticket is not None:
+            held = time.monotonic() - ticket
+            self.mean_session_seconds += _SESSION_SECONDS_ALPHA * (held - self.mean_session_seconds)
+        self.active = max(0, self.active - 1)
+        self._admit_waiters()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "capacity": self.max_sessions,
+            "waiting": len(self._waiters),
+            "occupancy": round(self.occupancy, 4),
+            "mean_session_seconds": round(self.mean_session_seconds, 1),
+        }
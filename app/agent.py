@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
+import functools
 import json
 import os
 from datetime import datetime
@@ -25,7 +27,8 @@ from google import genai
 from google.genai import types
 
 from google.adk.sessions import InMemorySessionService, Session
-from google.adk.agents import Agent, SequentialAgent
+from google.adk.agents import Agent, BaseAgent, SequentialAgent
+from google.adk.events import Event
 from google.adk.tools import FunctionTool, agent_tool
 
 from google.adk.agents.invocation_context import InvocationContext
@@ -36,13 +39,12 @@ from google.cloud import storage
 from google.adk.runners import InMemoryRunner
 
 from pydantic import BaseModel, Field, conlist
-from typing import List, Optional, Annotated
-
-import google.cloud.firestore as firestore
+from typing import AsyncGenerator, List, Optional, Annotated
 
 from google.adk.sessions.base_session_service import BaseSessionService
 
 import asyncio
+import time
 
 from .prompts import (
     LESSON_PLANNER_INSTRUCTION,
@@ -57,6 +59,18 @@ from app.models import (
     LessonPlan,
     PresentationInput
 )
+from app.logging_utils import AGENT_LOG, CALLBACKS_LOG, FIRESTORE_LOG, TOOLS_LOG, get_logger, truncate
+from app.io_supervisor import storage_io
+from app.lesson_cache import LESSON_CONTENT_CACHE_ENABLED, LessonContentCache, lesson_content_key
+from app.persistence import WriteScheduler
+from app.presentation import render_presentation_markdown, section_markdown, split_presentation_markdown
+from app.repository import repository
+from app.topic_index import TopicIndex
+
+logger = get_logger(AGENT_LOG)
+callbacks_logger = get_logger(CALLBACKS_LOG)
+tools_logger = get_logger(TOOLS_LOG)
+firestore_logger = get_logger(FIRESTORE_LOG)
 
 # Constants
 # --- Configurable constants ---
@@ -69,16 +83,19 @@ LESSON_LOGIC_MODEL_ID = os.getenv("LESSON_LOGIC_MODEL_ID", "gemini-2.5-flash-lit
 IMAGE_MODEL_ID = os.getenv("IMAGE_MODEL_ID", "imagen-3.0-generate-002")
 
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "generated_images_kiddo")
+# Second step of lesson creation: "template" renders the plan locally (app/presentation.py), "llm" asks PresentationAgentLessonPlan.
+PRESENTATION_RENDERER = os.getenv("PRESENTATION_RENDERER", "template").lower()
 
 STAGING_BUCKET = os.getenv("STAGING_BUCKET", "gs://kido-sessions")
 
 
 # Initialize Google Cloud clients
-credentials, project_id = google.auth.default()
 
 
 
 if VERTEXAI_ENABLED:
+    # Only Vertex AI needs application default credentials; API-key mode runs without them.
+    credentials, project_id = google.auth.default()
     vertexai.init(project=project_id, location=LOCATION, staging_bucket=STAGING_BUCKET)
     genai_client = genai.Client(project=project_id, location=LOCATION, vertexai=True)
     storage_client = storage.Client(project=project_id)
@@ -88,12 +105,13 @@ else:
     
 
 
-def send_current_section_markdown_func(section_index: int, markdown_content: str):
+def show_lesson_section_func(section_index: int):
     """
-    This tool is called by the lesson_delivered_agent to send the Markdown
-    for the current section to the frontend.
+    Shows the presentation for a lesson section on the student's screen.
+    Pass only the 0-based index of the section; its stored Markdown is sent
+    to the frontend by the server.
     """
-    return {"status": "success", "section_index": section_index,"markdown_content": markdown_content, "markdown_content_length": len(markdown_content)}
+    return {"status": "success", "section_index": section_index}
 
 
 # end of long running tasks
@@ -111,14 +129,14 @@ def generate_image_with_imagen(prompt: str) -> dict:
         A dictionary containing the public URL of the generated image or an error message.
     """
     try:
-        print(f"[TOOL] Calling Imagen with prompt: '{prompt}'")
+        tools_logger.info("Calling Imagen with prompt: '%s'", truncate(prompt))
         response = genai_client.models.generate_images(
             model=IMAGE_MODEL_ID,
             prompt=prompt,
             config=types.GenerateImagesConfig(number_of_images=1)
         )
 
-        print(f"[TOOL] Imagen response: {response}")
+        tools_logger.debug("Imagen returned %d image(s)", len(response.generated_images or []))
 
         if response.generated_images:
             generated_image_obj = response.generated_images[0]
@@ -129,11 +147,11 @@ def generate_image_with_imagen(prompt: str) -> dict:
                 nested_image_data = generated_image_obj.image
                 if hasattr(nested_image_data, 'image_bytes') and nested_image_data.image_bytes:
                     image_bytes_data = nested_image_data.image_bytes
-                    print(f"[TOOL] Retrieved image bytes (length: {len(image_bytes_data)} bytes)")
+                    tools_logger.debug("Retrieved image bytes (length: %d bytes)", len(image_bytes_data))
                 elif hasattr(nested_image_data, 'gcs_uri') and nested_image_data.gcs_uri:
                     # If GCS URI is directly provided, we can just use that
                     # This path might be taken by some model configurations
-                    print(f"[TOOL] Imagen directly returned GCS URI: {nested_image_data.gcs_uri}")
+                    tools_logger.info("Imagen directly returned GCS URI: %s", nested_image_data.gcs_uri)
                     return {"image_url": nested_image_data.gcs_uri, "status": "Image generated and hosted successfully."}
             
             if not image_bytes_data:
@@ -149,14 +167,14 @@ def generate_image_with_imagen(prompt: str) -> dict:
             blob.upload_from_string(image_bytes_data, content_type='image/png')
 
             public_url = blob.public_url
-            print(f"[TOOL] Image uploaded to GCS: {public_url}")
+            tools_logger.info("Image uploaded to GCS: %s", public_url)
 
             # --- RETURN ONLY THE URL TO THE LLM ---
             return {"image_url": public_url, "status": "Image generated and hosted successfully."}
         else:
             return {"error": "Image generation failed: No images generated in the response."}
     except Exception as e:
-        print(f"[TOOL ERROR] Imagen generation failed or GCS upload failed: {e}")
+        tools_logger.exception("Imagen generation failed or GCS upload failed: %s", e)
         return {"error": f"Failed to generate or upload image: {str(e)}"}
 
 # Wrap the Python function as an ADK FunctionTool
@@ -166,47 +184,50 @@ generate_image_tool = FunctionTool(
 )
 
 generate_image_tool.is_long_running = True
-print(f"[AGENT DEBUG] Custom 'generate_image_tool' created.")
+logger.debug("Custom 'generate_image_tool' created.")
 
 def signal_ui_feedback_func(status: str, message: str):
     """
     A special tool that does nothing except signal to the system that a certain UI feedback state should be triggered on the frontend.
     For example, call this with status='generating_image' before calling the image generation tool.
     """
-    print(f"[UI_SIGNAL] Received signal: status='{status}', message='{message}'")
+    tools_logger.info("[UI_SIGNAL] Received signal: status='%s', message='%s'", status, message)
     return {"status": "signal_received"}
 
 signal_ui_feedback_tool = FunctionTool(signal_ui_feedback_func)
 
-send_current_section_markdown_tool = FunctionTool(
-    send_current_section_markdown_func
+show_lesson_section_tool = FunctionTool(
+    show_lesson_section_func
 )
 
-send_current_section_markdown_tool.is_long_running = True
+show_lesson_section_tool.is_long_running = True
 
 
 APP_NAME = "kido-app-462308"
 
-def before_lesson_planner_callback(callback_context: CallbackContext):
+async def before_lesson_planner_callback(callback_context: CallbackContext):
     """
     Callback that runs before the lesson planner agent.
     It fetches the user's learning history and injects it into the session state.
     """
-    print("[CALLBACK] before_lesson_planner_callback triggered.")
+    callbacks_logger.debug("before_lesson_planner_callback triggered.")
     user_id = callback_context.state.get('user_id')
     if user_id:
-        print(f"[CALLBACK] Found user_id: {user_id}. Fetching learning profile.")
-        learning_profile = get_user_learning_profile(user_id) # Direct python call
+        learning_profile = callback_context.state.get("learning_profile")
+        if learning_profile is None:
+            callbacks_logger.debug("Found user_id: %s. Fetching learning profile.", user_id)
+            learning_profile = await repository.learning_profile(user_id)
+            callback_context.state["learning_profile"] = learning_profile
         if learning_profile and learning_profile.get("completed_topics"):
             # Put the profile into the session state for the agent to use
             callback_context.state['user_learning_context'] = learning_profile
-            print(f"[CALLBACK] Injected learning profile into session state: {learning_profile}")
+            callbacks_logger.info("Injected learning profile into session state: %s", truncate(learning_profile))
         else:
             # Explicitly clear any old context if no new one is found
             callback_context.state['user_learning_context'] = None
-            print(f"[CALLBACK] No completed lessons found for user {user_id}. Cleared any existing context.")
+            callbacks_logger.info("No completed lessons found for user %s. Cleared any existing context.", user_id)
     else:
-        print("[CALLBACK] No user_id found in state, cannot fetch learning profile.")
+        callbacks_logger.warning("No user_id found in state, cannot fetch learning profile.")
 
 
 presentation_agent = Agent(
@@ -233,7 +254,7 @@ lesson_planner_agent = Agent(
         output_key="current_lesson_plan",
         before_agent_callback=before_lesson_planner_callback,
     )
-print(f"[AGENT DEBUG] lesson_planner_agent initialized with model: {lesson_planner_agent.model}")
+logger.debug("lesson_planner_agent initialized with model: %s", lesson_planner_agent.model)
 
 
 # --- Centralized State Update Helper ---
@@ -242,86 +263,104 @@ def _update_and_persist_state(context, updates):
     context.state.update(updates)
     user_id = context.state.get('user_id')
     if user_id:
-        # Use create_task to run in the background without awaiting
-        # This is safe to call from a sync function within an async event loop
-        asyncio.create_task(save_lesson_state_to_firestore(user_id, context.state))
-        print(f"[STATE_HELPER] State persistence task created for user {user_id} with updates: {list(updates.keys())}")
+        # Written in the background; bursts of updates collapse into one write
+        schedule_state_write(user_id, context.state)
+        callbacks_logger.debug("[STATE_HELPER] State persistence scheduled for user %s with updates: %s", user_id, list(updates.keys()))
     else:
-        print("[STATE_HELPER] WARNING: No user_id found in state for persistence.")
+        callbacks_logger.warning("[STATE_HELPER] No user_id found in state for persistence.")
+
+
+# --- Shared lesson content cache ---
+# Validated LessonPlans plus their parsed sections, reused across learners; see app/lesson_cache.py.
+lesson_content_cache = LessonContentCache(
+    repository, validate=lambda plan: LessonPlan.model_validate(plan).model_dump(), index_factory=TopicIndex
+)
+
+
+async def _lesson_content_key(tool_context, args):
+    """Cache key for a lesson_creation_workflow call, from its request and the learner's profile."""
+    learning_profile = tool_context.state.get("learning_profile")
+    user_id = tool_context.state.get("user_id")
+    if learning_profile is None and user_id:
+        learning_profile = await repository.learning_profile(user_id)
+        tool_context.state["learning_profile"] = learning_profile
+    return lesson_content_key((args or {}).get("request", ""), learning_profile)
 
 
 # --- Define Root Agent (Orchestrator) ---
-def handle_before_agent_callback(callback_context: CallbackContext):
+async def handle_before_agent_callback(callback_context: CallbackContext):
     """Enhanced before_agent callback with better error handling and logging"""
     agent_name = callback_context.agent_name if hasattr(callback_context, 'agent_name') else "Unknown"
-    print(f"[AGENT DEBUG] before_agent callback triggered for {agent_name}")
-    print(f"[AGENT DEBUG] Current user_id in session: {callback_context.state.get('user_id')}")
-    print(f"[AGENT DEBUG] Session state has user_id: {'user_id' in callback_context.state}")
-    print(f"[AGENT DEBUG] Session state has current_lesson_plan: {'current_lesson_plan' in callback_context.state}")
+    callbacks_logger.debug(
+        "before_agent callback triggered for %s (user_id=%s, has current_lesson_plan=%s)",
+        agent_name, callback_context.state.get('user_id'), 'current_lesson_plan' in callback_context.state,
+    )
     
     # --- Welcome back logic for root orchestrator ---
     if agent_name == "main_tutor_orchestrator_agent":
-        print(f"[AGENT DEBUG] Main tutor orchestrator agent being invoked")
         # Enhanced welcome back logic that reads from lesson state
         user_id = callback_context.state.get('user_id')
-        print(f"[WELCOME_BACK DEBUG] Starting welcome back logic for user_id: {user_id}")
+        callbacks_logger.debug("[WELCOME_BACK] Starting welcome back logic for user_id: %s", user_id)
         
         # Initialize variables
         last_topic = None
         last_progress = None
         
         if user_id:
-            lesson_state = load_lesson_state_from_firestore(user_id)
-            print(f"[WELCOME_BACK DEBUG] Loaded lesson state from Firestore: {lesson_state is not None}")
+            if callback_context.state.get(SESSION_BOOTSTRAPPED_KEY):
+                # The lesson state was applied at session start and our own
+                # writes keep it current, so session state is authoritative.
+                lesson_state = None
+                if callback_context.state.get("current_lesson_plan"):
+                    lesson_state = {
+                        "current_lesson_plan": callback_context.state.get("current_lesson_plan"),
+                        "current_lesson_section_index": callback_context.state.get("current_lesson_section_index"),
+                    }
+            else:
+                lesson_state = await repository.load_lesson_state(user_id)
+                callbacks_logger.debug("[WELCOME_BACK] Loaded lesson state from Firestore: %s", lesson_state is not None)
             
             if lesson_state and lesson_state.get("current_lesson_plan"):
                 # We have an actual lesson in progress, use that
                 last_topic = lesson_state.get("current_lesson_plan", {}).get("topic")
                 last_progress = {
                     "current_lesson_plan": lesson_state.get("current_lesson_plan"),
-                    "current_lesson_section_index": lesson_state.get("current_lesson_section_index", 0),
+                    "current_lesson_section_index": lesson_state.get("current_lesson_section_index") or 0,
                 }
                 # Restore the lesson state to session
-                print(f"[WELCOME_BACK DEBUG] Restoring lesson state to session: {last_topic}")
                 callback_context.state.update(lesson_state)
-                print(f"[WELCOME_BACK] Restored lesson state for topic: {last_topic}")
+                callbacks_logger.info("[WELCOME_BACK] Restored lesson state for topic: %s", last_topic)
             else:
-                print(f"[WELCOME_BACK DEBUG] No lesson state found, checking session state")
                 last_topic = callback_context.state.get("user:last_lesson_topic")
                 last_progress = callback_context.state.get("user:last_lesson_progress")
-                print(f"[WELCOME_BACK] Using session state for topic: {last_topic}")
+                callbacks_logger.info("[WELCOME_BACK] No lesson state found, using session state for topic: %s", last_topic)
         else:
-            print(f"[WELCOME_BACK DEBUG] No user_id found in callback_context.state")
-        
-        print(f"[WELCOME_BACK DEBUG] Final last_topic: {last_topic}")
-        print(f"[WELCOME_BACK DEBUG] Final last_progress: {last_progress}")
+            callbacks_logger.warning("[WELCOME_BACK] No user_id found in callback_context.state")
         
         if last_topic:
             callback_context.state["welcome_back_message"] = f"Hey, you were learning {last_topic} last time. Would you like to continue?"
             if last_progress:
                 callback_context.state["resume_lesson_progress"] = last_progress
-                print(f"[WELCOME_BACK] Set welcome back message and resume progress for topic: {last_topic}")
+                callbacks_logger.info("[WELCOME_BACK] Set welcome back message and resume progress for topic: %s", last_topic)
         else:
-            print(f"[WELCOME_BACK] No previous lesson found for user {user_id}")
+            callbacks_logger.info("[WELCOME_BACK] No previous lesson found for user %s", user_id)
     # --- Existing logic for lesson_delivered_agent ---
     if agent_name == "lesson_delivered_agent":
         lesson_plan = callback_context.state.get("current_lesson_plan")
         parsed_markdowns = callback_context.state.get("parsed_section_markdowns")
         current_section_index = callback_context.state.get("current_lesson_section_index", 0)
         
-        print(f"[BEFORE_AGENT] Lesson delivery agent invoked")
-        print(f"[BEFORE_AGENT] Lesson plan present: {lesson_plan is not None}")
-        print(f"[BEFORE_AGENT] Parsed markdowns present: {parsed_markdowns is not None}")
-        print(f"[BEFORE_AGENT] Current section index: {current_section_index}")
-        if parsed_markdowns:
-            print(f"[BEFORE_AGENT] Number of parsed markdown sections: {len(parsed_markdowns)}")
+        callbacks_logger.debug(
+            "[BEFORE_AGENT] Lesson delivery agent invoked (lesson plan present: %s, parsed markdown sections: %s, current section index: %s)",
+            lesson_plan is not None, len(parsed_markdowns) if parsed_markdowns else None, current_section_index,
+        )
         
         # NOTE: Logic to regenerate markdown has been removed.
         # State persistence should ensure that if a lesson plan exists,
         # the markdown also exists.
         
         if lesson_plan:
-            print(f"[BEFORE_AGENT] Lesson delivery agent found lesson plan. Topic: {lesson_plan.get('topic', 'Unknown')}")
+            callbacks_logger.info("[BEFORE_AGENT] Lesson delivery agent found lesson plan. Topic: %s", lesson_plan.get('topic', 'Unknown'))
             callback_context.state["lesson_plan_for_delivery"] = lesson_plan
             lesson_context = f"""
 You are now delivering a lesson on: {lesson_plan.get('topic', 'Unknown Topic')}
@@ -332,7 +371,7 @@ The lesson plan structure is available in your session context. Follow it while
 """
             callback_context.state["lesson_context"] = lesson_context
         else:
-            print(f"[BEFORE_AGENT] Warning: Lesson delivery agent started without a lesson plan")
+            callbacks_logger.warning("[BEFORE_AGENT] Lesson delivery agent started without a lesson plan")
             callback_context.state["lesson_context"] = """
 You are ready to deliver a lesson, but no specific lesson plan was provided. 
 Ask the student what they'd like to learn about, then be prepared to teach that topic.
@@ -362,34 +401,67 @@ def complete_lesson_func():
 complete_lesson_tool = FunctionTool(complete_lesson_func)
 
 
+# --- before_tool callback: serve lessons from the content cache ---
+async def handle_orchestrator_before_tool_callback(tool, args, tool_context):
+    """On a content cache hit, fills lesson state and returns the tool's response so the workflow is skipped."""
+    tool_name = tool.name if hasattr(tool, 'name') else str(tool)
+    if tool_name != "lesson_creation_workflow" or not LESSON_CONTENT_CACHE_ENABLED:
+        return None
+    try:
+        key = await _lesson_content_key(tool_context, args)
+        entry = await lesson_content_cache.get(key) if key is not None else None
+    except Exception as e:
+        callbacks_logger.warning("Lesson content cache lookup failed, generating the lesson instead: %s", e)
+        return None
+    if entry is None:
+        return None
+
+    callbacks_logger.info("Serving lesson for '%s' from the content cache.", key)
+    updates = {
+        "current_lesson_plan": entry["lesson_plan"],
+        "parsed_section_markdowns": entry["parsed_section_markdowns"],
+        "current_lesson_section_index": 0,
+        # Images pre-generated by the catalog (app/catalog.py), by image prompt.
+        "lesson_image_urls": entry.get("image_urls", {}),
+    }
+    _update_and_persist_state(tool_context, updates)
+    return { "status": "success", "message": "Lesson plan and presentation are ready.", "ready_for_delivery": True }
+
+
 # --- Enhanced after_tool callback with Firestore sync ---
-def handle_orchestrator_tool_callback(tool, args, tool_context, tool_response):
+async def handle_orchestrator_tool_callback(tool, args, tool_context, tool_response):
     tool_name = tool.name if hasattr(tool, 'name') else str(tool)
     
-    print(f"[CALLBACK] Processing response from tool: {tool_name}")
-    print(f"[CALLBACK] Processing response from tool: {tool_name} with args: {args}")
+    callbacks_logger.info("Processing response from tool: %s with args: %s", tool_name, truncate(args))
 
     if tool_name == "get_my_learning_history_func":
-        print("[CALLBACK] History tool called. Fetching history.")
+        callbacks_logger.debug("History tool called. Fetching history.")
         user_id = tool_context.state.get("user_id")
         if not user_id:
             return {"summary": "I can't seem to find your user profile to check your history."}
 
-        completed_lessons = get_user_completed_lessons(user_id)
+        learning_profile = tool_context.state.get("learning_profile")
+        if learning_profile is None:
+            learning_profile = await repository.learning_profile(user_id)
+            tool_context.state["learning_profile"] = learning_profile
+        history = await repository.completed_lessons_page(user_id, total=learning_profile.get("total_lessons_completed"))
+        completed_lessons = history["lessons"]
         if not completed_lessons:
             return {"summary": "You haven't completed any lessons yet. What would you like to learn about first?"}
 
-        topic_list = [f"- {lesson['topic']} (on {lesson.get('completion_date', 'N/A')[:10]})" for lesson in completed_lessons]
+        topic_list = [f"- {lesson['topic']} (on {(lesson.get('completion_date') or 'N/A')[:10]})" for lesson in completed_lessons]
         
         summary = (
-            f"You have completed {len(completed_lessons)} lesson(s) so far! Great job!\n\n"
-            "Here are the topics you've mastered:\n" +
+            f"You have completed {history['total']} lesson(s) so far! Great job!\n\n"
+            "Here are the topics you've mastered most recently:\n" +
             '\n'.join(topic_list)
         )
+        if history["total"] > len(completed_lessons):
+            summary += f"\n...and {history['total'] - len(completed_lessons)} more before that."
         return {"summary": summary}
 
     if tool_name == "complete_lesson_func":
-        print("[CALLBACK] Lesson completion tool called. Clearing state.")
+        callbacks_logger.info("Lesson completion tool called. Clearing state.")
         state = tool_context.state
         user_id = state.get("user_id")
         lesson_plan = state.get("current_lesson_plan")
@@ -397,8 +469,14 @@ def handle_orchestrator_tool_callback(tool, args, tool_context, tool_response):
         if user_id and lesson_plan:
             # Save to completed lessons history
             specific_topic = lesson_plan.get("topic", "Unknown")
-            save_completed_lesson_to_firestore(user_id, lesson_plan)
-            print(f"[CALLBACK] Saved completed lesson '{specific_topic}' for user {user_id}.")
+            # Awaited, not backgrounded: a profile read racing the transaction would
+            # cache the aggregate without this lesson for the rest of the session.
+            try:
+                state['learning_profile'] = await repository.save_completed_lesson(user_id, lesson_plan)
+                callbacks_logger.info("Saved completed lesson '%s' for user %s.", specific_topic, user_id)
+            except Exception as e:
+                callbacks_logger.error("Failed to save completed lesson '%s' for user %s: %s", specific_topic, user_id, e)
+                state['learning_profile'] = None
             # Store the specific topic for the next conversational turn.
             state['last_completed_topic'] = specific_topic
 
@@ -412,6 +490,7 @@ def handle_orchestrator_tool_callback(tool, args, tool_context, tool_response):
             "welcome_back_message",
             "resume_lesson_progress",
             "user:last_lesson_progress",
+            "lesson_image_urls",
         ]
         cleared_keys = []
         for key in keys_to_clear:
@@ -420,45 +499,44 @@ def handle_orchestrator_tool_callback(tool, args, tool_context, tool_response):
                 state[key] = None
                 cleared_keys.append(key)
         
-        print(f"[CALLBACK] Cleared session state keys: {cleared_keys}")
+        callbacks_logger.debug("Cleared session state keys: %s", cleared_keys)
 
         if user_id:
             # Persist the cleared state to Firestore
-            asyncio.create_task(save_lesson_state_to_firestore(user_id, {}))
-            print(f"[CALLBACK] Firestore persistence task created for clearing lesson state.")
+            schedule_state_write(user_id, state, lesson_state={})
+            callbacks_logger.debug("Firestore persistence scheduled for clearing lesson state.")
         
         return {"status": "success", "message": "Lesson state has been cleared."}
     if tool_name == "lesson_creation_workflow":
-        print(f"[CALLBACK] Lesson creation workflow finished.")
+        if isinstance(tool_response, dict) and tool_response.get("ready_for_delivery"):
+            # Served from the content cache by the before_tool callback; state is already filled.
+            return tool_response
+        callbacks_logger.info("Lesson creation workflow finished.")
         # The response from a Sequential agent is the response of the LAST step.
         # In our case, this is the markdown from the presentation agent.
-        presentation_markdown = tool_response
-        
-        parsed_section_markdowns = []
-        if isinstance(presentation_markdown, str):
-            sections = presentation_markdown.split('---')
-            for idx, section in enumerate(sections):
-                section_content = section.strip()
-                if section_content:
-                    parsed_section_markdowns.append({"index": idx, "markdown": section_content})
+        parsed_section_markdowns = split_presentation_markdown(tool_response)
         
         # The lesson plan was saved to state in the first step of the workflow.
         # Now we save the generated markdown.
         updates = {
             "parsed_section_markdowns": parsed_section_markdowns,
             "current_lesson_section_index": 0,
+            "lesson_image_urls": {},
         }
         _update_and_persist_state(tool_context, updates)
+
+        lesson_plan = tool_context.state.get("current_lesson_plan")
+        if LESSON_CONTENT_CACHE_ENABLED and lesson_plan and parsed_section_markdowns:
+            key = await _lesson_content_key(tool_context, args)
+            if key is not None:
+                storage_io.spawn(lesson_content_cache.put(key, lesson_plan, parsed_section_markdowns), name="cache_lesson_content")
         
         return { "status": "success", "message": "Lesson plan and presentation are ready.", "ready_for_delivery": True }
         
-    elif tool_name == "send_current_section_markdown_func":
+    elif tool_name == "show_lesson_section_func":
         section_index = args.get("section_index")
-        markdown_content = args.get("markdown_content")
         
-        print(f"[CALLBACK] send_current_section_markdown_func called with section_index={section_index}")
-        print(f"[CALLBACK] Markdown content length: {len(markdown_content) if markdown_content else 0}")
-        print(f"[CALLBACK] Markdown content preview: {markdown_content[:200] if markdown_content else 'None'}...")
+        callbacks_logger.info("show_lesson_section_func called with section_index=%s", section_index)
         
         # --- Update user:last_lesson_progress on section advance ---
         # This logic is about creating a temporary resume point, not full state persistence
@@ -467,27 +545,45 @@ def handle_orchestrator_tool_callback(tool, args, tool_context, tool_response):
                 "current_lesson_plan": tool_context.state["current_lesson_plan"],
                 "current_lesson_section_index": tool_context.state.get("current_lesson_section_index", 0),
             }
-            print(f"[CALLBACK] Updated user:last_lesson_progress with section_index={tool_context.state.get('current_lesson_section_index', 0)}")
+            callbacks_logger.debug("Updated user:last_lesson_progress with section_index=%s", tool_context.state.get('current_lesson_section_index', 0))
             
         # Update the current section index and persist the entire state
         updates = {"current_lesson_section_index": section_index}
         _update_and_persist_state(tool_context, updates)
         
-        return {
-            "status": "success",
-            "section_index": section_index,
-            "markdown_content": markdown_content,
-        }
+        return {"status": "success", "section_index": section_index}
     else:
-        print(f"[CALLBACK] Passing through response from {tool_name}")
+        callbacks_logger.debug("Passing through response from %s", tool_name)
         return tool_response
 
+def _normalize_image_prompt(prompt):
+    return " ".join(str(prompt or "").lower().split())
+
+
+def handle_delivery_agent_before_tool_callback(tool, args, tool_context):
+    """
+    Answers image requests from the lesson's pre-generated images. Prompts must
+    match exactly, ignoring case and whitespace: section prompts of one lesson
+    share most of their words, so a fuzzy match could return another section's image.
+    """
+    tool_name = tool.name if hasattr(tool, 'name') else str(tool)
+    image_urls = tool_context.state.get("lesson_image_urls")
+    if tool_name != "generate_image_with_imagen" or not image_urls:
+        return None
+    prompt = (args or {}).get("prompt", "")
+    normalized_urls = {_normalize_image_prompt(known_prompt): url for known_prompt, url in image_urls.items()}
+    image_url = normalized_urls.get(_normalize_image_prompt(prompt))
+    if not image_url:
+        return None
+    callbacks_logger.info("[DELIVERY] Using pre-generated image for prompt: %s", truncate(prompt))
+    return {"image_url": image_url, "status": "Image generated and hosted successfully."}
+
+
 def handle_delivery_agent_tool_callback(tool, args, tool_context, tool_response):
     """Enhanced after_tool callback with comprehensive response handling"""
     tool_name = tool.name if hasattr(tool, 'name') else str(tool)
     
-    print(f"[CALLBACK1] handle_before_tool_callback response from tool: {tool_name}")
-    print(f"[CALLBACK1] handle_before_tool_callback response from tool: {tool_name} with args: {args}")
+    callbacks_logger.info("[DELIVERY] Processing response from tool: %s with args: %s", tool_name, truncate(args))
     
     # Handle image generation tool
     if tool_name == "generate_image_with_imagen":
@@ -495,7 +591,7 @@ def handle_delivery_agent_tool_callback(tool, args, tool_context, tool_response)
             if "image_url" in tool_response and "error" not in tool_response:
                 # Successful image generation
                 image_url = tool_response["image_url"]
-                print(f"[CALLBACK1] Image generated successfully: {image_url}")
+                callbacks_logger.info("[DELIVERY] Image generated successfully: %s", image_url)
                 # Store in session for potential future reference
                 current_images = tool_context.state.get("generated_image_urls", [])
                 current_images.append({
@@ -511,51 +607,28 @@ def handle_delivery_agent_tool_callback(tool, args, tool_context, tool_response)
                     "image_url": image_url
                 }
             elif "error" in tool_response:
-                print(f"[CALLBACK1] Image generation failed: {tool_response['error']}")
+                callbacks_logger.warning("[DELIVERY] Image generation failed: %s", tool_response['error'])
                 return {
                     "status": "error",
                     "message": "I had trouble creating that image. Let me try to explain with words instead!"
                 }
         return {"status": "error", "message": "Unexpected response from image generation"}
     
-    elif tool_name == "send_current_section_markdown_func":
+    elif tool_name == "show_lesson_section_func":
         section_index = args.get("section_index")
-        markdown_content = args.get("markdown_content")
-
-        if section_index is not None:
-            tool_context.state["current_lesson_section_index"] = section_index
-
-        print(f"[CALLBACK1] Received request to send section {section_index} markdown content")
-        print(f"[DEBUG] State after section advance: section_index={tool_context.state.get('current_lesson_section_index')}, parsed_section_markdowns={tool_context.state.get('parsed_section_markdowns')}")
-        
-        # Enhanced logging and state management
-        print(f"[CALLBACK1] send_current_section_markdown_func called with section_index={section_index}")
-        print(f"[CALLBACK1] Markdown content length: {len(markdown_content) if markdown_content else 0}")
-        print(f"[CALLBACK1] Markdown content preview: {markdown_content[:200] if markdown_content else 'None'}...")
-        
-        # Update the current section index
-        if section_index is not None:
-            tool_context.state["current_lesson_section_index"] = section_index
-            print(f"[CALLBACK1] Updated current_lesson_section_index to {section_index}")
-        else:
-            print(f"[CALLBACK1] WARNING: section_index is None!")
-        
-        print(f"[DEBUG] State after section update in delivery agent:")
-        print(f"[DEBUG] - current_lesson_section_index: {tool_context.state.get('current_lesson_section_index')}")
-        print(f"[DEBUG] - parsed_section_markdowns: {len(tool_context.state.get('parsed_section_markdowns', []))} sections")
-        
-        # --- Debug: Check if parsed_section_markdowns exists and has the right content ---
         parsed_markdowns = tool_context.state.get('parsed_section_markdowns')
-        if parsed_markdowns and isinstance(parsed_markdowns, list) and section_index is not None:
-            if section_index < len(parsed_markdowns):
-                expected_markdown = parsed_markdowns[section_index].get('markdown', '')
-                print(f"[CALLBACK1] Expected markdown from parsed_section_markdowns[{section_index}]: {expected_markdown[:200]}...")
-                if markdown_content != expected_markdown:
-                    print(f"[CALLBACK1] WARNING: Markdown content mismatch! Using provided content.")
-            else:
-                print(f"[CALLBACK1] WARNING: Section index {section_index} out of range for parsed_section_markdowns (length: {len(parsed_markdowns)})")
-        else:
-            print(f"[CALLBACK1] WARNING: parsed_section_markdowns not found or invalid: {parsed_markdowns}")
+
+        # --- Only the index comes from the model; the markdown is resolved from parsed_section_markdowns ---
+        markdown_content = section_markdown(parsed_markdowns, section_index)
+        if markdown_content is None:
+            callbacks_logger.warning(
+                "[DELIVERY] No stored markdown for section %s (%d sections)",
+                section_index, len(parsed_markdowns) if isinstance(parsed_markdowns, list) else 0,
+            )
+            return {"status": "error", "message": f"This lesson has no section {section_index}."}
+        section_index = int(section_index)
+        tool_context.state["current_lesson_section_index"] = section_index
+        callbacks_logger.info("[DELIVERY] show_lesson_section_func called with section_index=%s (%d chars stored)", section_index, len(markdown_content))
         
         # --- Update user:last_lesson_progress on section advance ---
         if tool_context.state.get("current_lesson_plan") is not None:
@@ -563,40 +636,59 @@ def handle_delivery_agent_tool_callback(tool, args, tool_context, tool_response)
                 "current_lesson_plan": tool_context.state["current_lesson_plan"],
                 "current_lesson_section_index": tool_context.state.get("current_lesson_section_index", 0),
             }
-            print(f"[CALLBACK1] Updated user:last_lesson_progress with section_index={tool_context.state.get('current_lesson_section_index', 0)}")
+            callbacks_logger.debug("[DELIVERY] Updated user:last_lesson_progress with section_index=%s", tool_context.state.get('current_lesson_section_index', 0))
         
         # --- Save lesson state to Firestore after section advance in delivery agent ---
         user_id = tool_context.state.get('user_id')
         if user_id:
-            print(f"[CALLBACK1] Creating task to save lesson state to Firestore for user {user_id} after section advance")
-            asyncio.create_task(save_lesson_state_to_firestore(user_id, tool_context.state))
+            callbacks_logger.debug("[DELIVERY] Scheduling lesson state save to Firestore for user %s after section advance", user_id)
+            # One batched write covers the lesson document and the session snapshot.
+            schedule_state_write(user_id, tool_context.state)
         else:
-            print(f"[CALLBACK1] WARNING: No user_id found for Firestore save")
+            callbacks_logger.warning("[DELIVERY] No user_id found for Firestore save")
         
-        # --- Firestore persistence after lesson checkpoint ---
-        session_id = tool_context.state.get('session_id', None)
-        if user_id and session_id:
-            asyncio.create_task(persist_session_state_to_firestore(APP_NAME, user_id, session_id, dict(tool_context.state)))
-            print(f"[CALLBACK1] Session state persistence task created")
-        
-        return {
-            "status": "success",
-            "section_index": section_index,
-            "markdown_content": markdown_content,
-        }
+        # The server pushes the section's markdown to the client from session state.
+        return {"status": "success", "section_index": section_index}
     # Handle other tools - return their response as-is
     else:
-        print(f"[CALLBACK] Passing through response from {tool_name}")
+        callbacks_logger.debug("Passing through response from %s", tool_name)
         return tool_response
 
 
+class TemplatePresentationAgent(BaseAgent):
+    """Drop-in for presentation_agent: renders current_lesson_plan with app.presentation instead of a model call."""
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        lesson_plan = ctx.session.state.get("current_lesson_plan")
+        if isinstance(lesson_plan, dict):
+            markdown = render_presentation_markdown(lesson_plan)
+        else:
+            callbacks_logger.warning("No lesson plan in state to render; the planner step produced nothing usable.")
+            markdown = ""
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=markdown)]),
+        )
+
+
+template_presentation_agent = TemplatePresentationAgent(
+    name="TemplatePresentationLessonPlan",
+    description="Renders a structured lesson plan into a Markdown presentation without a model call",
+)
+
+# The LLM renderer stays available for comparison (PRESENTATION_RENDERER=llm).
+presentation_step = presentation_agent if PRESENTATION_RENDERER == "llm" else template_presentation_agent
+logger.info("Lesson presentations rendered by %s", presentation_step.name)
+
 # --- Define the Lesson Creation Workflow ---
 lesson_creation_workflow_agent = SequentialAgent(
     name="lesson_creation_workflow",
     description="A workflow that first creates a lesson plan based on a topic, and then generates a presentation for it. The final output is the presentation content.",
     # The `input_schema` of the first step becomes the input for the workflow.
     # The output of the first step is passed as input to the second step.
-    sub_agents=[lesson_planner_agent, presentation_agent]
+    sub_agents=[lesson_planner_agent, presentation_step]
 )
 
 # Wrap the workflow in an AgentTool to be used by the orchestrator
@@ -612,11 +704,12 @@ lesson_delivered_agent = Agent(
     model=MODEL_ID,
     description="An AI assistant specialized in delivering lessons and answering questions during a lesson.",
     instruction=LESSON_DELIVERED_INSTRUCTION,
-    tools=[generate_image_tool, send_current_section_markdown_tool, signal_ui_feedback_tool],
+    tools=[generate_image_tool, show_lesson_section_tool, signal_ui_feedback_tool],
+    before_tool_callback=handle_delivery_agent_before_tool_callback,
     after_tool_callback=handle_delivery_agent_tool_callback,
     before_agent_callback=handle_before_agent_callback,
 )
-print(f"[AGENT DEBUG] lesson_delivered_agent initialized with model: {lesson_delivered_agent.model}")
+logger.debug("lesson_delivered_agent initialized with model: %s", lesson_delivered_agent.model)
 
 
 root_agent = Agent(
@@ -627,331 +720,130 @@ instruction=MAIN_TUTOR_ORCHESTRATOR_INSTRUCTION,
 # The root agent now has a single tool for creating lessons.
 tools=[lesson_creation_tool, complete_lesson_tool, get_my_learning_history_tool],
 sub_agents=[lesson_delivered_agent],
+before_tool_callback=handle_orchestrator_before_tool_callback,
 after_tool_callback=handle_orchestrator_tool_callback,
 before_agent_callback=handle_before_agent_callback,
 )
 # NOTE: Only lesson_delivered_agent can call generate_image_with_imagen. All lesson delivery, including image generation, must be delegated to lesson_delivered_agent after planning.
 
-print(f"[AGENT DEBUG] root_agent initialized. Tools: {[getattr(tool, 'name', str(tool)) for tool in root_agent.tools]}")
+logger.debug("root_agent initialized. Tools: %s", [getattr(tool, 'name', str(tool)) for tool in root_agent.tools])
 
-# --- Firestore lesson state helpers (manual persistence, not session service) ---
-firestore_client = firestore.Client()
-lesson_collection = firestore_client.collection("adk_lessons")
-session_collection = firestore_client.collection("adk_sessions")
-completed_lessons_collection = firestore_client.collection("adk_completed_lessons")
+# --- Firestore persistence (manual, not session service); see app/repository.py ---
+# Callbacks and the server await the repository directly.
 
-def _save_lesson_state_to_firestore_sync(user_id, lesson_state):
+async def commit_state_to_firestore(user_id, lesson_state=None, session_write=None, app_name=APP_NAME):
     """
-    Synchronous implementation of saving lesson state to Firestore.
-    This should be run in a separate thread to avoid blocking.
+    Saves lesson state and/or a session snapshot in one batched write.
     """
-    try:
-        print(f"[FIRESTORE DEBUG] === SAVING LESSON STATE ===")
-        print(f"[FIRESTORE DEBUG] User ID: '{user_id}' (type: {type(user_id)})")
-        print(f"[FIRESTORE DEBUG] User ID length: {len(str(user_id)) if user_id else 0}")
-        
-        # Validate user_id
-        if not user_id:
-            print(f"[FIRESTORE ERROR] user_id is None or empty")
-            return False
-        
-        # Ensure user_id is a string
-        user_id_str = str(user_id).strip()
-        if not user_id_str:
-            print(f"[FIRESTORE ERROR] user_id is empty after conversion to string")
-            return False
-        
-        print(f"[FIRESTORE DEBUG] Using user_id_str: '{user_id_str}'")
-        
-        lesson_state_to_save = {
-            "user_id": user_id_str,
-            "current_lesson_plan": lesson_state.get("current_lesson_plan"),
-            "parsed_section_markdowns": lesson_state.get("parsed_section_markdowns"),
-            "current_lesson_section_index": lesson_state.get("current_lesson_section_index"),
-            "last_updated": datetime.now().isoformat(),
-        }
-        
-        print(f"[FIRESTORE DEBUG] Saving lesson state for user {user_id_str}:")
-        print(f"[FIRESTORE DEBUG] - current_lesson_plan: {lesson_state_to_save['current_lesson_plan'] is not None}")
-        print(f"[FIRESTORE DEBUG] - current_lesson_section_index: {lesson_state_to_save['current_lesson_section_index']}")
-        print(f"[FIRESTORE DEBUG] - parsed_section_markdowns: {len(lesson_state_to_save['parsed_section_markdowns']) if lesson_state_to_save['parsed_section_markdowns'] else 0} sections")
-        
-        if lesson_state_to_save['parsed_section_markdowns']:
-            for idx, section in enumerate(lesson_state_to_save['parsed_section_markdowns']):
-                print(f"[FIRESTORE DEBUG] - Section {idx} length: {len(section.get('markdown', ''))} chars")
-        
-        # Check if Firestore client is properly initialized
-        if not hasattr(lesson_collection, 'document'):
-            print(f"[FIRESTORE ERROR] lesson_collection is not properly initialized")
-            return False
-        
-        # Check if document already exists
-        doc_ref = lesson_collection.document(user_id_str)
-        existing_doc = doc_ref.get()
-        if existing_doc.exists:
-            print(f"[FIRESTORE DEBUG] Document already exists for user {user_id_str}, will overwrite")
-            existing_data = existing_doc.to_dict()
-            if existing_data and isinstance(existing_data, dict):
-                current_lesson_plan = existing_data.get('current_lesson_plan')
-                if current_lesson_plan and isinstance(current_lesson_plan, dict):
-                    print(f"[FIRESTORE DEBUG] Existing topic: {current_lesson_plan.get('topic', 'None')}")
-                else:
-                    print(f"[FIRESTORE DEBUG] Existing topic: None (no lesson plan)")
-            else:
-                print(f"[FIRESTORE DEBUG] Existing topic: None (invalid data)")
-        else:
-            print(f"[FIRESTORE DEBUG] Creating new document for user {user_id_str}")
-        
-        # Attempt to save
-        print(f"[FIRESTORE DEBUG] Attempting to save document...")
-        doc_ref.set(lesson_state_to_save)
-        print(f"[FIRESTORE DEBUG] Lesson state saved to Firestore successfully")
-        
-        # Verify the save by reading it back
-        verification_doc = doc_ref.get()
-        if verification_doc.exists:
-            saved_data = verification_doc.to_dict()
-            print(f"[FIRESTORE DEBUG] Verification: Document exists after save")
-            print(f"[FIRESTORE DEBUG] Verification: Saved section_index = {saved_data.get('current_lesson_section_index') if saved_data else 'None'}")
-            
-            # Safe check for parsed_section_markdowns
-            parsed_markdowns = saved_data.get('parsed_section_markdowns') if saved_data else None
-            if parsed_markdowns is not None:
-                print(f"[FIRESTORE DEBUG] Verification: Saved markdown sections = {len(parsed_markdowns)}")
-            else:
-                print(f"[FIRESTORE DEBUG] Verification: Saved markdown sections = 0 (None)")
-            
-            # Safe check for topic
-            current_lesson_plan = saved_data.get('current_lesson_plan') if saved_data else None
-            if current_lesson_plan and isinstance(current_lesson_plan, dict):
-                print(f"[FIRESTORE DEBUG] Verification: Saved topic = {current_lesson_plan.get('topic', 'None')}")
-            else:
-                print(f"[FIRESTORE DEBUG] Verification: Saved topic = None (no lesson plan)")
-            return True
-        else:
-            print(f"[FIRESTORE ERROR] Document does not exist after save attempt!")
-            return False
-            
-    except Exception as e:
-        print(f"[FIRESTORE ERROR] Failed to save lesson state for user {user_id}: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+    return await repository.commit_state(app_name, user_id, lesson_state=lesson_state, session_write=session_write)
 
 async def save_lesson_state_to_firestore(user_id, lesson_state):
     """
-    Asynchronously saves lesson state to Firestore by running the sync version in a thread.
+    Saves lesson state to Firestore.
     """
-    return await asyncio.to_thread(
-        _save_lesson_state_to_firestore_sync, user_id, lesson_state
-    )
+    return await commit_state_to_firestore(user_id, lesson_state=lesson_state)
 
-def save_completed_lesson_to_firestore(user_id, lesson_plan, completion_date=None):
+async def persist_session_state_to_firestore(app_name, user_id, session_id, state):
     """
-    Save a completed lesson to Firestore for tracking learning history.
+    Persists the restorable part of session state to Firestore.
     """
-    if completion_date is None:
-        completion_date = datetime.now().isoformat()
-    
-    completed_lesson_data = {
-        "user_id": user_id,
-        "topic": lesson_plan.get("topic", "Unknown"),
-        "grade_level": lesson_plan.get("grade_level", "Unknown"),
-        "duration_minutes": lesson_plan.get("duration_minutes", 0),
-        "learning_objectives": lesson_plan.get("learning_objectives", []),
-        "completion_date": completion_date,
-        "sections_count": len(lesson_plan.get("sections", [])),
+    return await commit_state_to_firestore(
+        user_id, session_write=(session_id, session_state_snapshot(state)), app_name=app_name
+    )
+
+# Session state keys written to adk_sessions: only what a reconnect restores.
+# The lesson itself is restored from adk_lessons (see apply_bootstrap_to_session_state).
+SESSION_SNAPSHOT_KEYS = ("last_completed_topic", "generated_image_urls")
+
+def lesson_state_snapshot(state):
+    """The lesson fields saved to adk_lessons, copied so later state changes don't leak into a pending write."""
+    return {
+        "current_lesson_plan": state.get("current_lesson_plan"),
+        "parsed_section_markdowns": state.get("parsed_section_markdowns"),
+        "current_lesson_section_index": state.get("current_lesson_section_index"),
     }
-    
-    # Use topic as document ID to avoid duplicates
-    doc_ref = completed_lessons_collection.document(f"{user_id}_{lesson_plan.get('topic', 'unknown').replace(' ', '_').lower()}")
-    doc_ref.set(completed_lesson_data)
-    print(f"[FIRESTORE] Saved completed lesson: {lesson_plan.get('topic', 'Unknown')} for user {user_id}")
 
-def get_user_completed_lessons(user_id):
-    """
-    Get all completed lessons for a user from Firestore.
-    """
-    docs = completed_lessons_collection.where("user_id", "==", user_id).stream()
-    completed_lessons = []
-    for doc in docs:
-        lesson_data = doc.to_dict()
-        completed_lessons.append({
-            "topic": lesson_data.get("topic", "Unknown"),
-            "grade_level": lesson_data.get("grade_level", "Unknown"),
-            "completion_date": lesson_data.get("completion_date", ""),
-            "learning_objectives": lesson_data.get("learning_objectives", [])
-        })
-    return completed_lessons
-
-def get_user_learning_profile(user_id):
+def session_state_snapshot(state):
     """
-    Get a comprehensive learning profile for a user based on completed lessons.
+    The session state keys saved to adk_sessions (SESSION_SNAPSHOT_KEYS).
+    Values are shallow-copied: generated_image_urls is appended to in place.
     """
-    completed_lessons = get_user_completed_lessons(user_id)
-    
-    if not completed_lessons:
-        return {
-            "completed_topics": [],
-            "grade_level": "Ages 6-10",  # Default
-            "learning_style": "mixed",
-            "interests": [],
-            "total_lessons_completed": 0
-        }
-    
-    # Analyze completed lessons to build learning profile
-    topics = [lesson["topic"] for lesson in completed_lessons]
-    grade_levels = [lesson["grade_level"] for lesson in completed_lessons]
-    all_objectives = []
-    for lesson in completed_lessons:
-        all_objectives.extend(lesson.get("learning_objectives", []))
-    
-    # Determine most common grade level
-    grade_level = max(set(grade_levels), key=grade_levels.count) if grade_levels else "Ages 6-10"
-    
-    # Extract potential interests from topics and objectives
-    interests = list(set(topics))  # Unique topics as interests
-    
-    return {
-        "completed_topics": topics,
-        "grade_level": grade_level,
-        "learning_style": "mixed",  # Could be enhanced with more analysis
-        "interests": interests,
-        "total_lessons_completed": len(completed_lessons)
-    }
+    return {key: copy.copy(state.get(key)) for key in SESSION_SNAPSHOT_KEYS if state.get(key) is not None}
+
+async def _write_state(user_id, payload):
+    lesson_state, session_write = payload
+    return await commit_state_to_firestore(user_id, lesson_state=lesson_state, session_write=session_write)
+
+# Background writes are coalesced per user: at most one in flight, newest snapshot wins.
+state_writes = WriteScheduler(_write_state, name="state", spawn=functools.partial(storage_io.spawn, name="state_write"))
 
-def load_lesson_state_from_firestore(user_id):
+def schedule_state_write(user_id, state, lesson_state=None):
     """
-    Load the lesson state for a user from Firestore, if it exists.
+    Schedules one batched write of the lesson document and session snapshot for
+    `user_id`. `lesson_state` defaults to the lesson fields of `state`.
     """
-    doc_ref = lesson_collection.document(user_id)
-    doc = doc_ref.get()
-    if doc.exists:
-        return doc.to_dict()
-    return None
-
-# --- Call this after session creation to pre-populate state from Firestore ---
-def populate_session_state_from_firestore(session):
-    user_id = session.user_id
-    lesson_state = load_lesson_state_from_firestore(user_id)
-    if lesson_state:
-        session.state.update(lesson_state)
-        # Ensure parsed_section_markdowns is restored
-        if 'parsed_section_markdowns' in lesson_state:
-            session.state['parsed_section_markdowns'] = lesson_state['parsed_section_markdowns']
-    # Always ensure user_id is set in session.state
-    session.state['user_id'] = user_id
-
-# --- Firestore lesson existence check and loader ---
-def get_or_create_lesson_for_user(user_id, topic, session):
+    if lesson_state is None:
+        lesson_state = lesson_state_snapshot(state)
+    session_write = (state.get('session_id'), session_state_snapshot(state))
+    state_writes.schedule(user_id, (lesson_state, session_write))
+
+async def flush_pending_writes(user_id=None):
     """
-    Checks Firestore for an existing lesson plan for this user and topic.
-    If found and markdown is present, updates session.state and returns 'existing'.
-    If not found or markdown missing, returns 'new'.
+    Writes any debounced state now. Call with a user_id when that user's
+    session closes, or without one on shutdown.
     """
-    lesson_state = load_lesson_state_from_firestore(user_id)
-    parsed_markdowns = lesson_state.get('parsed_section_markdowns') if lesson_state else None
-    if (
-        lesson_state
-        and lesson_state.get("current_lesson_plan", {}).get("topic", "").lower() == topic.lower()
-        and parsed_markdowns
-        and isinstance(parsed_markdowns, list)
-        and len(parsed_markdowns) > 0
-    ):
-        session.state.update(lesson_state)
-        session.state['user_id'] = user_id
-        session.state['parsed_section_markdowns'] = parsed_markdowns
-        return "existing"
+    if user_id is None:
+        await state_writes.flush_all()
     else:
-        session.state['user_id'] = user_id
-        return "new"
+        await state_writes.flush(user_id)
+        if not state_writes.pending(user_id):
+            # The next session re-seeds these from its bootstrap reads.
+            repository.forget_persisted(user_id)
+    firestore_logger.debug("Flushed pending writes (user=%s): %s", user_id, state_writes.stats())
 
-async def persist_session_state_to_firestore(app_name, user_id, session_id, state):
+# Session state key marking that bootstrap_session_state() results were applied,
+# so the callbacks can rely on session state instead of reading Firestore.
+SESSION_BOOTSTRAPPED_KEY = "session_bootstrapped"
+
+async def bootstrap_session_state(app_name, user_id):
     """
-    Asynchronously persists session state to Firestore by running blocking I/O
-    in a separate thread to avoid blocking the event loop.
+    Fetches everything a new live session needs from Firestore in one concurrent
+    step: the session snapshot, the lesson state and the learning profile.
+    Returns (restored_state, lesson_state, learning_profile, timings) where
+    timings maps each fetch to its duration in seconds.
     """
-    def do_persist():
+    timings = {}
+
+    async def timed(name, coro):
+        started = time.monotonic()
         try:
-            doc_id = f"{app_name}__{user_id}"
-            doc_ref = session_collection.document(doc_id)
-            
-            print(f"[FIRESTORE DEBUG] Persisting session state for user {user_id}, session {session_id}")
-            print(f"[FIRESTORE DEBUG] Document ID: {doc_id}")
-            
-            # Check if document already exists
-            existing_doc = doc_ref.get()
-            if existing_doc.exists:
-                print(f"[FIRESTORE DEBUG] Session document already exists, will overwrite")
-            else:
-                print(f"[FIRESTORE DEBUG] Creating new session document")
-            
-            doc_ref.set({
-                "session_id": session_id,
-                "state": state,
-            })
-            print(f"[FIRESTORE DEBUG] Session state persisted successfully")
-            
-            # Verify the save
-            verification_doc = doc_ref.get()
-            if verification_doc.exists:
-                saved_data = verification_doc.to_dict()
-                print(f"[FIRESTORE DEBUG] Session verification: Document exists after save")
-                print(f"[FIRESTORE DEBUG] Session verification: Saved session_id = {saved_data.get('session_id') if saved_data else 'None'}")
-            else:
-                print(f"[FIRESTORE DEBUG] WARNING: Session document does not exist after save attempt!")
-        except Exception as e:
-            # It's important to catch exceptions inside the threaded function
-            print(f"[FIRESTORE ERROR] Exception in do_persist for user {user_id}: {e}")
-            import traceback
-            traceback.print_exc()
+            return await coro
+        finally:
+            timings[name] = time.monotonic() - started
+
+    restored_state, lesson_state, learning_profile = await asyncio.gather(
+        timed("session_state", repository.load_session_state(app_name, user_id)),
+        # Always a fresh read: another instance may have written since we cached it.
+        timed("lesson_state", repository.load_lesson_state(user_id, refresh=True)),
+        timed("learning_profile", repository.learning_profile(user_id)),
+    )
+    # This is what adk_lessons holds now, so the first save can be a delta.
+    repository.mark_lesson_state_loaded(user_id, lesson_state)
+    return restored_state, lesson_state, learning_profile, timings
 
-    try:
-        await asyncio.to_thread(do_persist)
-    except Exception as e:
-        # This will catch errors related to threading, but not from the function itself
-        print(f"[FIRESTORE ERROR] Failed to run persist_session_state_to_firestore in thread for user {user_id}: {e}")
-        import traceback
-        traceback.print_exc()
-        raise  # Re-raise the exception so we can see it in the logs
-
-def load_session_state_from_firestore(app_name, user_id):
-    doc_id = f"{app_name}__{user_id}"
-    doc_ref = session_collection.document(doc_id)
-    doc = doc_ref.get()
-    if doc is not None and hasattr(doc, 'exists') and doc.exists:
-        data = doc.to_dict() if hasattr(doc, 'to_dict') else None
-        return data.get("state", {}) if data else {}
-    return {}
-
-def test_firestore_connectivity():
+def apply_bootstrap_to_session_state(state, user_id, session_id, restored_state, lesson_state, learning_profile):
     """
-    Test function to verify Firestore connectivity and basic operations.
+    Applies bootstrap_session_state() results to a session state mapping in the
+    same precedence the callbacks used to: session snapshot first, then an
+    in-progress lesson from adk_lessons on top. session_id is kept in state so
+    state writes can record which session the adk_sessions snapshot came from.
     """
-    try:
-        print(f"[FIRESTORE TEST] Testing Firestore connectivity...")
-        
-        # Test basic collection access
-        test_doc = lesson_collection.document("test_connection")
-        test_doc.set({"test": "data", "timestamp": datetime.now().isoformat()})
-        print(f"[FIRESTORE TEST] Write test successful")
-        
-        # Test read
-        doc = test_doc.get()
-        if doc.exists:
-            data = doc.to_dict()
-            print(f"[FIRESTORE TEST] Read test successful: {data}")
-        else:
-            print(f"[FIRESTORE TEST] WARNING: Read test failed - document not found")
-        
-        # Clean up test document
-        test_doc.delete()
-        print(f"[FIRESTORE TEST] Cleanup test successful")
-        print(f"[FIRESTORE TEST] All Firestore tests passed!")
-        return True
-        
-    except Exception as e:
-        print(f"[FIRESTORE TEST] ERROR: Firestore connectivity test failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
\ No newline at end of file
+    if restored_state:
+        state.update(restored_state)
+    if lesson_state and lesson_state.get("current_lesson_plan"):
+        state.update(lesson_state)
+    state["learning_profile"] = learning_profile
+    # Ensure user_id is not overwritten by restored state
+    state["user_id"] = user_id
+    state["session_id"] = session_id
+    state[SESSION_BOOTSTRAPPED_KEY] = True
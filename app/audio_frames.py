@@ -0,0 +1,114 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Binary framing for client -> server realtime media.
+
+When the client asks for ``"audio_transport": "binary"`` in its ``setup``
+message, every microphone chunk is sent as a single binary WebSocket frame:
+
+    +---------+-----------+-------------+----------------+-----------------+
+    | version | mime code | sample rate | sequence       | payload ...     |
+    | uint8   | uint8     | uint16 (BE) | uint32 (BE)    | raw PCM / bytes |
+    +---------+-----------+-------------+----------------+-----------------+
+
+The 8-byte header replaces the JSON envelope and the base64 encoding of the
+JSON path, which stays available as a fallback.
+"""
+
+import struct
+from typing import NamedTuple, Optional
+
+BINARY_AUDIO_TRANSPORT = "binary"
+JSON_AUDIO_TRANSPORT = "json"
+
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("!BBHI")
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+
+# Mime codes carried in the header. Sample rate is only meaningful for PCM.
+MIME_PCM = 1
+MIME_JPEG = 2
+
+_MIME_TYPES = {
+    MIME_PCM: "audio/pcm",
+    MIME_JPEG: "image/jpeg",
+}
+
+
+class FrameError(ValueError):
+    """Raised when a binary frame cannot be decoded."""
+
+
+class MediaFrame(NamedTuple):
+    mime_type: str
+    sample_rate: int
+    sequence: int
+    data: bytes
+
+
+def negotiate_audio_transport(setup: dict) -> str:
+    """Returns the audio transport requested in the setup message, defaulting to JSON."""
+    requested = str(setup.get("audio_transport") or JSON_AUDIO_TRANSPORT).lower()
+    if requested == BINARY_AUDIO_TRANSPORT:
+        return BINARY_AUDIO_TRANSPORT
+    return JSON_AUDIO_TRANSPORT
+
+
+def encode_media_frame(data: bytes, sequence: int, sample_rate: int = 16000, mime_code: int = MIME_PCM) -> bytes:
+    """Builds a binary media frame. Used by tests and load generators."""
+    return FRAME_HEADER.pack(FRAME_VERSION, mime_code, sample_rate, sequence & 0xFFFFFFFF) + data
+
+
+def decode_media_frame(frame: bytes) -> MediaFrame:
+    """Splits a binary frame into its header fields and payload."""
+    if len(frame) <= FRAME_HEADER_SIZE:
+        raise FrameError(f"Frame too short ({len(frame)} bytes)")
+    version, mime_code, sample_rate, sequence = FRAME_HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise FrameError(f"Unsupported frame version {version}")
+    base_mime = _MIME_TYPES.get(mime_code)
+    if base_mime is None:
+        raise FrameError(f"Unknown mime code {mime_code}")
+    mime_type = f"{base_mime};rate={sample_rate}" if mime_code == MIME_PCM and sample_rate else base_mime
+    # A single slice of the payload; no base64 decode or JSON parse per frame.
+    return MediaFrame(mime_type, sample_rate, sequence, frame[FRAME_HEADER_SIZE:])
+
+
+class SequenceTracker:
+    """Counts frames lost or reordered between the client and the gateway."""
+
+    def __init__(self) -> None:
+        self.last_sequence: Optional[int] = None
+        self.frames = 0
+        self.gaps = 0
+        self.missing_frames = 0
+
+    def observe(self, sequence: int) -> int:
+        """Records a sequence number and returns how many frames were skipped before it."""
+        skipped = 0
+        if self.last_sequence is not None:
+            expected = (self.last_sequence + 1) & 0xFFFFFFFF
+            if sequence != expected:
+                skipped = (sequence - expected) & 0xFFFFFFFF
+                if skipped > 0x7FFFFFFF:
+                    # Late or duplicate frame rather than a gap.
+                    self.frames += 1
+                    return 0
+                else:
+                    self.gaps += 1
+                    self.missing_frames += skipped
+        self.last_sequence = sequence
+        self.frames += 1
+        return skipped
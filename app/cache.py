@@ -0,0 +1,94 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Size-bounded, in-process TTL cache.
+
+Used as a read-through cache in front of Firestore documents. Storage is
+async, so the cache is only used from the event loop and needs no locking;
+no operation awaits, so each one is atomic with respect to other tasks.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+from app.metrics import CACHE_REQUESTS_TOTAL
+
+# --- Configurable constants ---
+LESSON_CACHE_MAX_USERS = int(os.getenv("LESSON_CACHE_MAX_USERS", "10000"))
+# Upper bound on how stale a cached document can be if another instance writes it.
+LESSON_CACHE_TTL_SECONDS = float(os.getenv("LESSON_CACHE_TTL_SECONDS", "600"))
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """
+    LRU cache whose entries also expire `ttl_seconds` after they were stored.
+    `None` is a valid cached value (e.g. "this user has no document").
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        # Stats
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Optional[V]]:
+        """Returns (hit, value); records the hit or miss."""
+        now = self._clock()
+        entry = self._entries.get(key, _MISSING)
+        if entry is not _MISSING:
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS_TOTAL.inc(cache=self.name, result="hit")
+                return True, value
+            del self._entries[key]
+        self.misses += 1
+        CACHE_REQUESTS_TOTAL.inc(cache=self.name, result="miss")
+        return False, None
+
+    def put(self, key: Hashable, value: V) -> None:
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
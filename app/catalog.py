@@ -0,0 +1,261 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline pre-generation of a lesson catalog.
+
+    uv run python -m app.catalog --topics topics.txt
+    uv run python -m app.catalog --popular 200 --checkpoint catalog.jsonl
+
+Runs lesson_creation_workflow_agent (planner, then presentation) for each
+topic with bounded parallelism, and pre-generates each section's image from
+its image_prompt. Finished lessons are published to the shared lesson content
+cache (app/lesson_cache.py) with a long TTL, so the runtime serves them like
+any cached lesson. Each lesson is also appended to a JSON-lines checkpoint.
+The checkpoint doubles as the catalog: a rerun skips every topic already in
+it, and --republish pushes it to the cache again, e.g. to renew the TTL.
+
+Lessons are generated for a first-time learner (the "intro" bucket at the
+default grade level), which is where most generation cost is.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.lesson_cache import LessonContentKey, lesson_content_key, normalize_topic
+from app.logging_utils import AGENT_LOG, get_logger
+
+# --- Configurable constants ---
+CATALOG_CONCURRENCY = int(os.getenv("CATALOG_CONCURRENCY", "4"))
+# Catalog lessons outlive ordinary cache entries; rerun with --republish before this runs out.
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", str(30 * 86400)))
+CATALOG_CHECKPOINT_PATH = os.getenv("CATALOG_CHECKPOINT_PATH", "lesson_catalog.jsonl")
+
+CATALOG_USER_ID = "lesson-catalog"
+
+logger = get_logger(AGENT_LOG)
+
+# topic -> {"lesson_plan", "parsed_section_markdowns", "image_urls"}
+LessonGenerator = Callable[[str], Awaitable[Dict[str, Any]]]
+Publisher = Callable[[LessonContentKey, Dict[str, Any]], Awaitable[bool]]
+
+
+def popular_topics(topics: Iterable[str], limit: int) -> List[str]:
+    """
+    The `limit` most requested topics, counting phrasings that normalise alike
+    as one topic and naming each by its most common phrasing.
+    """
+    phrasings: Dict[str, Counter] = defaultdict(Counter)
+    for topic in topics:
+        normalized = normalize_topic(topic)
+        if normalized:
+            phrasings[normalized][topic.strip()] += 1
+    ranked = sorted(phrasings.items(), key=lambda item: (-sum(item[1].values()), item[0]))
+    return [counts.most_common(1)[0][0] for _, counts in ranked[:limit]]
+
+
+def read_topics_file(path: str) -> List[str]:
+    """One topic per line; blank lines and lines starting with '#' are skipped."""
+    with open(path, encoding="utf-8") as topics_file:
+        return [line.strip() for line in topics_file if line.strip() and not line.lstrip().startswith("#")]
+
+
+def read_checkpoint(path: str) -> Dict[str, Dict[str, Any]]:
+    """Checkpointed lessons by cache key. A torn last line (a run killed mid-write) is ignored."""
+    entries: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as checkpoint:
+        for line_number, line in enumerate(checkpoint, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Skipping unreadable checkpoint line %d in %s", line_number, path)
+                continue
+            entries[entry["key"]] = entry
+    return entries
+
+
+class CatalogBuilder:
+    """
+    Generates lessons for a topic list with at most `concurrency` in flight.
+    A lesson is checkpointed only once it is published (when there is a
+    publisher), so a failed or interrupted topic is simply retried next run.
+    """
+
+    def __init__(
+        self,
+        generate: LessonGenerator,
+        checkpoint_path: str = CATALOG_CHECKPOINT_PATH,
+        publish: Optional[Publisher] = None,
+        concurrency: int = CATALOG_CONCURRENCY,
+    ):
+        self._generate = generate
+        self._publish = publish
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = max(1, concurrency)
+        # Stats
+        self.generated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.published = 0
+
+    def _append_checkpoint(self, record: Dict[str, Any]) -> None:
+        with open(self.checkpoint_path, "a", encoding="utf-8") as checkpoint:
+            checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    async def _build_one(self, semaphore: asyncio.Semaphore, topic: str, key: LessonContentKey) -> None:
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                entry = await self._generate(topic)
+                if not entry.get("lesson_plan") or not entry.get("parsed_section_markdowns"):
+                    raise ValueError("the workflow produced no lesson plan or no sections")
+                if self._publish is not None:
+                    if not await self._publish(key, entry):
+                        raise ValueError("the lesson content cache rejected the lesson")
+                    self.published += 1
+            except Exception as e:
+                self.failed += 1
+                logger.exception("[CATALOG] Failed to generate '%s': %s", topic, e)
+                return
+            self._append_checkpoint({"key": str(key), "topic": topic, **entry, "generated_at": datetime.now().isoformat()})
+            self.generated += 1
+            logger.info("[CATALOG] Generated '%s' in %.1fs", topic, time.monotonic() - started)
+
+    async def run(self, topics: Iterable[str], republish: bool = False) -> dict:
+        """Generates every topic not yet in the checkpoint; with `republish`, re-publishes the checkpointed ones first."""
+        done = read_checkpoint(self.checkpoint_path)
+        if republish and self._publish is not None:
+            for key_text, entry in done.items():
+                key = LessonContentKey.parse(key_text)
+                if key is not None and await self._publish(key, entry):
+                    self.published += 1
+
+        pending: Dict[LessonContentKey, str] = {}
+        for topic in topics:
+            key = lesson_content_key(topic)
+            if key is None or str(key) in done or key in pending:
+                self.skipped += 1
+                continue
+            pending[key] = topic
+        logger.info("[CATALOG] %d topic(s) to generate, %d skipped, concurrency %d", len(pending), self.skipped, self.concurrency)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._build_one(semaphore, topic, key) for key, topic in pending.items()))
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {"generated": self.generated, "skipped": self.skipped, "failed": self.failed, "published": self.published}
+
+
+def agent_lesson_generator(with_images: bool = True) -> LessonGenerator:
+    """Generates lessons with the live app's lesson_creation_workflow_agent and Imagen tool."""
+    # Imported here so the catalog helpers above stay usable without the agent stack.
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+
+    from app.agent import generate_image_with_imagen, lesson_creation_workflow_agent, presentation_step
+    from app.presentation import split_presentation_markdown
+
+    runner = InMemoryRunner(agent=lesson_creation_workflow_agent, app_name="lesson-catalog")
+
+    async def generate(topic: str) -> Dict[str, Any]:
+        session = await runner.session_service.create_session(app_name=runner.app_name, user_id=CATALOG_USER_ID)
+        message = types.Content(role="user", parts=[types.Part(text=topic)])
+        presentation_markdown = None
+        async for event in runner.run_async(user_id=CATALOG_USER_ID, session_id=session.id, new_message=message):
+            if event.author == presentation_step.name and event.content and event.content.parts:
+                text = "".join(part.text or "" for part in event.content.parts)
+                if text:
+                    presentation_markdown = text
+        session = await runner.session_service.get_session(app_name=runner.app_name, user_id=CATALOG_USER_ID, session_id=session.id)
+        lesson_plan = session.state.get("current_lesson_plan") if session else None
+
+        image_urls: Dict[str, str] = {}
+        if with_images and isinstance(lesson_plan, dict):
+            prompts = [section.get("image_prompt") for section in lesson_plan.get("sections", [])]
+            prompts.append((lesson_plan.get("wrap_up") or {}).get("image_prompt"))
+            for prompt in filter(None, prompts):
+                result = await asyncio.to_thread(generate_image_with_imagen, prompt)
+                if "image_url" in result:
+                    image_urls[prompt] = result["image_url"]
+                else:
+                    logger.warning("[CATALOG] No image for '%s': %s", topic, result.get("error"))
+        return {
+            "lesson_plan": lesson_plan,
+            "parsed_section_markdowns": split_presentation_markdown(presentation_markdown),
+            "image_urls": image_urls,
+        }
+
+    return generate
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    from app.agent import lesson_content_cache
+    from app.io_supervisor import storage_io
+    from app.repository import repository
+
+    try:
+        if args.topics:
+            topics = read_topics_file(args.topics)
+        elif args.popular:
+            topics = popular_topics(await repository.completed_lesson_topics(), args.popular)
+        else:
+            topics = []
+
+        async def publish(key: LessonContentKey, entry: Dict[str, Any]) -> bool:
+            return await lesson_content_cache.put(
+                key, entry["lesson_plan"], entry["parsed_section_markdowns"], entry.get("image_urls"), ttl_seconds=args.ttl_seconds
+            )
+
+        builder = CatalogBuilder(
+            agent_lesson_generator(with_images=not args.no_images) if topics else None,
+            checkpoint_path=args.checkpoint,
+            publish=None if args.no_publish else publish,
+            concurrency=args.concurrency,
+        )
+        return await builder.run(topics, republish=args.republish)
+    finally:
+        await storage_io.drain()
+        await repository.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.catalog", description="Pre-generate a catalog of lessons.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--topics", help="file with one topic per line")
+    source.add_argument("--popular", type=int, metavar="N", help="the N most completed topics in adk_completed_lessons")
+    parser.add_argument("--checkpoint", default=CATALOG_CHECKPOINT_PATH, help="JSON-lines checkpoint / catalog file")
+    parser.add_argument("--concurrency", type=int, default=CATALOG_CONCURRENCY)
+    parser.add_argument("--ttl-seconds", type=float, default=CATALOG_TTL_SECONDS, help="how long published lessons stay cached")
+    parser.add_argument("--no-images", action="store_true", help="skip pre-generating section images")
+    parser.add_argument("--no-publish", action="store_true", help="only write the checkpoint, not the lesson content cache")
+    parser.add_argument("--republish", action="store_true", help="publish every checkpointed lesson again first")
+    args = parser.parse_args(argv)
+    if not (args.topics or args.popular or args.republish):
+        parser.error("give --topics, --popular or --republish")
+    print(json.dumps(asyncio.run(_run(args))))
+
+
+if __name__ == "__main__":
+    main()
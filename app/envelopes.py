@@ -0,0 +1,88 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Encoders for every server -> client WebSocket message.
+
+Fixed envelopes (audio, turnComplete, interrupted) are precomputed byte
+templates with only the variable fields spliced in, so the hot audio path
+never builds nested dicts or calls a generic JSON serializer. Messages with
+free-form payloads (tool responses, markdown, ...) are serialized with orjson
+when it is installed and the standard library json module otherwise.
+"""
+
+import base64
+import json
+from functools import lru_cache
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj: Any) -> bytes:
+    """Serializes an arbitrary message to compact JSON bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # e.g. non-str dict keys, which json coerces and orjson rejects.
+            pass
+    return _json_dumps(obj)
+
+
+# --- Fixed envelopes ---
+TURN_COMPLETE_MESSAGE = _json_dumps({"serverContent": {"turnComplete": True, "modelTurn": {"parts": []}}})
+INTERRUPTED_MESSAGE = _json_dumps({"serverContent": {"interrupted": True, "modelTurn": {"parts": []}}})
+
+_AUDIO_PREFIX = b'{"serverContent":{"modelTurn":{"parts":[{"inlineData":{"data":"'
+
+
+@lru_cache(maxsize=32)
+def _audio_suffix(mime_type: str) -> bytes:
+    return b'","mimeType":' + _json_dumps(mime_type) + b"}}]}}}"
+
+
+def encode_audio(data: bytes, mime_type: str) -> bytes:
+    """serverContent.modelTurn message carrying one base64 inlineData audio part."""
+    return b"".join((_AUDIO_PREFIX, base64.b64encode(data), _audio_suffix(mime_type)))
+
+
+def encode_ui_feedback(status: str, message: str) -> bytes:
+    return b'{"ui_feedback":{"status":' + dumps(status) + b',"message":' + dumps(message) + b"}}"
+
+
+def encode_image(url: str, alt: str) -> bytes:
+    return b'{"image":{"url":' + dumps(url) + b',"alt":' + dumps(alt) + b"}}"
+
+
+def encode_markdown(section_index: Optional[int], content: str) -> bytes:
+    return b'{"markdown":{"sectionIndex":' + dumps(section_index) + b',"content":' + dumps(content) + b"}}"
+
+
+def encode_tool_response(name: str, response: Any, call_id: Optional[str]) -> bytes:
+    """toolResponse message with a single function response, as MultimodalLiveClient expects."""
+    return (
+        b'{"toolResponse":{"functionResponses":[{"name":' + dumps(name)
+        + b',"response":' + dumps(response)
+        + b',"id":' + dumps(call_id) + b"}]}}"
+    )
@@ -0,0 +1,116 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cloud Firestore implementation of the storage interface (app/storage.py),
+on the AsyncClient.
+"""
+
+import asyncio
+import functools
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import google.cloud.firestore as firestore
+from google.api_core.exceptions import Conflict, NotFound
+
+from app.storage import DocumentExists, DocumentNotFound, StorageBackend, Write, project
+
+
+def _translate_errors(func):
+    """Maps Firestore exceptions onto the backend-neutral ones."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        except NotFound as e:
+            raise DocumentNotFound(str(e)) from e
+        except Conflict as e:
+            raise DocumentExists(str(e)) from e
+    return wrapper
+
+
+class FirestoreBackend(StorageBackend):
+    name = "firestore"
+
+    def __init__(self, client_factory: Callable[[], "firestore.AsyncClient"] = firestore.AsyncClient):
+        super().__init__()
+        self._client_factory = client_factory
+        # AsyncClient channels are bound to the loop they were first used on.
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, firestore.AsyncClient]" = weakref.WeakKeyDictionary()
+
+    def _db(self) -> "firestore.AsyncClient":
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = self._client_factory()
+        return client
+
+    def _add(self, target, write: Write) -> None:
+        """Adds `write` to a WriteBatch or Transaction."""
+        ref = self._db().collection(write.collection).document(write.doc_id)
+        if write.op == "set":
+            target.set(ref, write.data)
+        elif write.op == "update":
+            target.update(ref, write.data)
+        elif write.op == "create":
+            target.create(ref, write.data)
+        elif write.op == "delete":
+            target.delete(ref)
+        else:
+            raise ValueError(f"Unknown write op {write.op!r}")
+
+    @_translate_errors
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        self._count("get")
+        doc = await self._db().collection(collection).document(doc_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    @_translate_errors
+    async def commit(self, writes: Sequence[Write]) -> None:
+        self._count("commit")
+        batch = self._db().batch()
+        for write in writes:
+            self._add(batch, write)
+        await batch.commit()
+
+    @_translate_errors
+    async def query(self, collection, where, order_by=None, descending=False, fields=None, limit=None, start_after=None) -> List[Dict[str, Any]]:
+        self._count("query")
+        query = self._db().collection(collection)
+        for name, value in where.items():
+            query = query.where(name, "==", value)
+        if order_by is not None:
+            query = query.order_by(order_by, direction=firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING)
+            if start_after is not None:
+                query = query.start_after({order_by: start_after})
+        if fields is not None:
+            query = query.select(list(fields))
+        if limit:
+            query = query.limit(limit)
+        return [project(doc.to_dict(), fields) async for doc in query.stream()]
+
+    @_translate_errors
+    async def read_modify_write(self, collection, doc_id, mutate) -> None:
+        ref = self._db().collection(collection).document(doc_id)
+
+        @firestore.async_transactional
+        async def run(transaction):
+            self._count("get")
+            snapshot = await ref.get(transaction=transaction)
+            for write in await mutate(snapshot.to_dict() if snapshot.exists else None):
+                self._add(transaction, write)
+
+        self._count("commit")
+        await run(self._db().transaction())
@@ -0,0 +1,116 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Activity tracking for idle live-session reclamation.
+
+The microphone streams continuously, so "silent" means the audio carries no
+voice, not that no frames arrive. Voice is detected with a cheap peak check on
+16-bit PCM. While the model stream is suspended the last few hundred
+milliseconds of audio are kept in a pre-roll buffer so the first words that
+wake the stream are not lost.
+"""
+
+import os
+import sys
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+# --- Configurable constants ---
+# Quiet period after which the live model stream is torn down. 0 disables.
+LIVE_IDLE_TIMEOUT_SECONDS = float(os.getenv("LIVE_IDLE_TIMEOUT_SECONDS", "90"))
+# A connection that sends nothing at all (not even a heartbeat) for this long is closed.
+CLIENT_HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("CLIENT_HEARTBEAT_TIMEOUT_SECONDS", "60"))
+# Peak 16-bit sample value above which an audio chunk counts as voice.
+IDLE_VOICE_PEAK = int(os.getenv("IDLE_VOICE_PEAK", "1000"))
+# Audio kept while suspended and replayed to the resumed stream.
+IDLE_PREROLL_MS = int(os.getenv("IDLE_PREROLL_MS", "500"))
+
+# Every Nth sample is inspected; speech energy spans many samples.
+_PEAK_STRIDE = 4
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def pcm16_peak(data: bytes, stride: int = _PEAK_STRIDE) -> int:
+    """Returns the (sampled) peak absolute sample value of little-endian 16-bit PCM."""
+    usable = len(data) & ~1
+    if not usable:
+        return 0
+    if _LITTLE_ENDIAN:
+        samples = memoryview(data)[:usable].cast("h")[::stride]
+        return max(max(samples), -min(samples))
+    peak = 0
+    for offset in range(0, usable, 2 * stride):
+        peak = max(peak, abs(int.from_bytes(data[offset:offset + 2], "little", signed=True)))
+    return peak
+
+
+class ActivityTracker:
+    """
+    Remembers when the connection last showed signs of life (any inbound
+    message, heartbeats included) and when it was last *active* (voice,
+    typed content, or model output).
+    """
+
+    def __init__(self, voice_peak: int = IDLE_VOICE_PEAK, now: Optional[float] = None):
+        self.voice_peak = voice_peak
+        now = time.monotonic() if now is None else now
+        self.last_active_at = now
+        self.last_seen_at = now
+
+    def on_message(self) -> None:
+        """Any inbound frame, including heartbeats and silent audio."""
+        self.last_seen_at = time.monotonic()
+
+    def on_activity(self) -> None:
+        """Typed content, model output, or anything else that should keep the model stream up."""
+        self.last_active_at = time.monotonic()
+
+    def on_audio(self, data: bytes) -> bool:
+        """Records an inbound audio chunk; returns True if it carries voice."""
+        if pcm16_peak(data) >= self.voice_peak:
+            self.on_activity()
+            return True
+        return False
+
+    def idle_seconds(self, now: Optional[float] = None) -> float:
+        return (time.monotonic() if now is None else now) - self.last_active_at
+
+    def silent_seconds(self, now: Optional[float] = None) -> float:
+        return (time.monotonic() if now is None else now) - self.last_seen_at
+
+
+class PreRollBuffer:
+    """Keeps the most recent `max_bytes` of audio chunks."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._chunks: Deque[Tuple[bytes, str]] = deque()
+        self._size = 0
+
+    def add(self, data: bytes, mime_type: str) -> None:
+        if self.max_bytes <= 0:
+            return
+        self._chunks.append((data, mime_type))
+        self._size += len(data)
+        while self._size > self.max_bytes and len(self._chunks) > 1:
+            dropped, _ = self._chunks.popleft()
+            self._size -= len(dropped)
+
+    def drain(self) -> List[Tuple[bytes, str]]:
+        chunks = list(self._chunks)
+        self._chunks.clear()
+        self._size = 0
+        return chunks
@@ -0,0 +1,145 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Supervisor for storage I/O and the background tasks that use it.
+
+Storage backends are async (see app/storage.py); every call goes through
+measure(), where a semaphore caps how many are in flight at once and their
+durations and errors are recorded. Background tasks are held in a registry,
+counted when they fail, and drained on shutdown.
+"""
+
+import asyncio
+import contextlib
+import functools
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Optional, Set
+
+from app.logging_utils import FIRESTORE_LOG, get_logger
+from app.metrics import (
+    BACKGROUND_TASK_ERRORS_TOTAL,
+    BACKGROUND_TASKS_ACTIVE,
+    STORAGE_IO_ERRORS_TOTAL,
+    STORAGE_IO_IN_FLIGHT,
+    STORAGE_IO_SECONDS,
+)
+
+# --- Configurable constants ---
+# Calls beyond this many wait on the event loop before reaching the backend.
+STORAGE_IO_MAX_CONCURRENCY = int(os.getenv("STORAGE_IO_MAX_CONCURRENCY", "32"))
+STORAGE_IO_DRAIN_TIMEOUT_SECONDS = float(os.getenv("STORAGE_IO_DRAIN_TIMEOUT_SECONDS", "10"))
+
+logger = get_logger(FIRESTORE_LOG)
+
+
+class IOSupervisor:
+    """
+    measure() admits and times one storage call; spawn() starts a tracked
+    background coroutine. drain() waits for background work (cancelling
+    whatever is left after the timeout) and refuses further calls.
+    """
+
+    def __init__(self, max_concurrency: int = STORAGE_IO_MAX_CONCURRENCY, name: str = "storage"):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._closed = False
+        # Stats
+        self.calls = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_call_seconds = 0.0
+        self.spawned = 0
+        self.task_errors = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the supervisor can be built at import time, outside any loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @contextlib.asynccontextmanager
+    async def measure(self, op: str = "call") -> AsyncIterator[None]:
+        """Admits one storage call under the concurrency cap and records its duration and errors. `op` labels the metrics."""
+        if self._closed:
+            raise RuntimeError(f"{self.name} I/O supervisor is shut down")
+        async with self._get_semaphore():
+            STORAGE_IO_IN_FLIGHT.inc()
+            started = time.monotonic()
+            try:
+                yield
+            except Exception:
+                self.errors += 1
+                STORAGE_IO_ERRORS_TOTAL.inc(op=op)
+                raise
+            finally:
+                elapsed = time.monotonic() - started
+                STORAGE_IO_IN_FLIGHT.dec()
+                STORAGE_IO_SECONDS.observe(elapsed, op=op)
+                self.calls += 1
+                self.busy_seconds += elapsed
+                self.max_call_seconds = max(self.max_call_seconds, elapsed)
+
+    def spawn(self, coro: Awaitable[Any], name: str = "background") -> asyncio.Task:
+        """Starts `coro` as a tracked background task. Failures are logged and counted, never lost."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        self.spawned += 1
+        BACKGROUND_TASKS_ACTIVE.inc()
+        task.add_done_callback(functools.partial(self._on_task_done, name))
+        return task
+
+    def _on_task_done(self, name: str, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        BACKGROUND_TASKS_ACTIVE.dec()
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.task_errors += 1
+            BACKGROUND_TASK_ERRORS_TOTAL.inc(task=name)
+            logger.error("[%s] Background task '%s' failed: %r", self.name, name, error, exc_info=error)
+
+    @property
+    def pending_tasks(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self, timeout: float = STORAGE_IO_DRAIN_TIMEOUT_SECONDS) -> None:
+        """Waits up to `timeout` for background tasks, cancels the rest, then refuses further calls."""
+        if self._tasks:
+            done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            if pending:
+                logger.warning("[%s] Cancelling %d background task(s) still running after %.1fs.", self.name, len(pending), timeout)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        self._closed = True
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_call_seconds": round(self.busy_seconds / self.calls, 4) if self.calls else None,
+            "max_call_seconds": round(self.max_call_seconds, 4),
+            "background_tasks": len(self._tasks),
+            "spawned": self.spawned,
+            "task_errors": self.task_errors,
+        }
+
+
+# Shared by everything that talks to Firestore.
+storage_io = IOSupervisor()
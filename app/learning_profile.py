@@ -0,0 +1,120 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-user learning-profile aggregate.
+
+One document per user (adk_learning_profiles) holds a running aggregate of
+the user's adk_completed_lessons: topics, a grade-level histogram, counts and
+the most recent topics. It is updated in the same transaction that records a
+completed lesson, so reading a profile is a single document fetch however
+many lessons the user has completed.
+
+Completed lessons are keyed by topic, so completing a topic again replaces the
+earlier record; the aggregate mirrors that by keeping each topic's grade level
+and adjusting the grade histogram when it changes.
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+# --- Configurable constants ---
+PROFILE_RECENT_TOPICS = int(os.getenv("PROFILE_RECENT_TOPICS", "10"))
+
+DEFAULT_GRADE_LEVEL = "Ages 6-10"
+PROFILE_SCHEMA_VERSION = 1
+
+
+def topic_key(topic: str) -> str:
+    """Same normalisation as the adk_completed_lessons document id suffix."""
+    return topic.replace(" ", "_").lower()
+
+
+def empty_profile_document(user_id: str) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "schema_version": PROFILE_SCHEMA_VERSION,
+        "topics": {},  # topic key -> {"topic", "grade_level", "completion_date"}
+        "grade_counts": {},  # grade level -> number of topics completed at it
+        "total_lessons_completed": 0,
+        "recent_topics": [],  # newest first
+        "last_updated": None,
+    }
+
+
+def apply_completed_lesson(document: Mapping[str, Any], lesson: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a new profile document with one completed lesson (the fields saved
+    to adk_completed_lessons) folded in. `document` is not modified.
+    """
+    topic = lesson.get("topic", "Unknown")
+    grade_level = lesson.get("grade_level", "Unknown")
+    key = topic_key(topic)
+
+    topics = dict(document.get("topics") or {})
+    grade_counts = dict(document.get("grade_counts") or {})
+    previous = topics.get(key)
+    if previous is not None:
+        old_grade = previous.get("grade_level")
+        grade_counts[old_grade] = grade_counts.get(old_grade, 0) - 1
+        if grade_counts[old_grade] <= 0:
+            del grade_counts[old_grade]
+    topics[key] = {"topic": topic, "grade_level": grade_level, "completion_date": lesson.get("completion_date", "")}
+    grade_counts[grade_level] = grade_counts.get(grade_level, 0) + 1
+
+    recent = [t for t in document.get("recent_topics") or [] if topic_key(t) != key]
+    recent.insert(0, topic)
+
+    return {
+        **document,
+        "schema_version": PROFILE_SCHEMA_VERSION,
+        "topics": topics,
+        "grade_counts": grade_counts,
+        "total_lessons_completed": len(topics),
+        "recent_topics": recent[:PROFILE_RECENT_TOPICS],
+        "last_updated": datetime.now().isoformat(),
+    }
+
+
+def build_profile_document(user_id: str, completed_lessons: Iterable[Mapping[str, Any]]) -> Dict[str, Any]:
+    """Builds the aggregate from scratch; used once per user to backfill from adk_completed_lessons."""
+    ordered = sorted(completed_lessons, key=lambda lesson: lesson.get("completion_date") or "")
+    document = empty_profile_document(user_id)
+    for lesson in ordered:
+        document = apply_completed_lesson(document, lesson)
+    return document
+
+
+def profile_from_document(document: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    """The learning profile the planner consumes, derived from an aggregate document."""
+    topics = [entry.get("topic", "Unknown") for entry in ((document or {}).get("topics") or {}).values()]
+    if not topics:
+        return {
+            "completed_topics": [],
+            "grade_level": DEFAULT_GRADE_LEVEL,
+            "learning_style": "mixed",
+            "interests": [],
+            "total_lessons_completed": 0,
+        }
+    grade_counts = document.get("grade_counts") or {}
+    grade_level = max(grade_counts, key=grade_counts.get) if grade_counts else DEFAULT_GRADE_LEVEL
+    return {
+        "completed_topics": topics,
+        "grade_level": grade_level,
+        "learning_style": "mixed",  # Could be enhanced with more analysis
+        "interests": list(set(topics)),  # Unique topics as interests
+        "total_lessons_completed": len(topics),
+        "recent_topics": list(document.get("recent_topics") or []),
+    }
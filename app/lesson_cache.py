@@ -0,0 +1,245 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shared cache of generated lesson content.
+
+Creating a lesson runs two LLM agents (the planner, then the presentation
+agent), yet many learners ask for the same topics. The validated lesson plan
+and its parsed section markdowns are cached under the normalised topic, the
+grade level and a learning-context bucket: "intro" for a first lesson on a
+topic, "advanced" when the learner already completed it (the planner prompt
+makes exactly that distinction). Per-learner interests are deliberately not
+part of the key.
+
+An in-process LRU/TTL tier sits in front of a persistent tier in the storage
+backend (adk_lesson_content), which all instances share. When the exact key
+misses, an optional topic index (see app/topic_index.py) proposes a cached
+topic phrased differently, within the same grade level and bucket.
+"""
+
+import copy
+import hashlib
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from app.cache import TTLCache
+from app.learning_profile import DEFAULT_GRADE_LEVEL
+from app.logging_utils import FIRESTORE_LOG, get_logger
+from app.metrics import CACHE_REQUESTS_TOTAL
+
+# --- Configurable constants ---
+LESSON_CONTENT_CACHE_ENABLED = os.getenv("LESSON_CONTENT_CACHE_ENABLED", "true").lower() == "true"
+LESSON_CONTENT_CACHE_MAX_ENTRIES = int(os.getenv("LESSON_CONTENT_CACHE_MAX_ENTRIES", "500"))
+LESSON_CONTENT_CACHE_TTL_SECONDS = float(os.getenv("LESSON_CONTENT_CACHE_TTL_SECONDS", "86400"))
+
+INTRO_BUCKET = "intro"
+ADVANCED_BUCKET = "advanced"
+
+# Request phrasings stripped before keying, so "teach me about volcanoes" and "Volcanoes" share an entry.
+_LEADING_PHRASES = ("teach me about ", "tell me about ", "learn about ", "a lesson about ", "a lesson on ", "lesson about ", "lesson on ", "about ")
+_ARTICLES = ("the ", "a ", "an ")
+
+logger = get_logger(FIRESTORE_LOG)
+
+
+def normalize_topic(topic: str) -> str:
+    text = " ".join(re.sub(r"[^a-z0-9]+", " ", (topic or "").lower()).split())
+    for prefix in _LEADING_PHRASES:
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+            break
+    for article in _ARTICLES:
+        if text.startswith(article):
+            text = text[len(article):]
+            break
+    return text
+
+
+def normalize_grade_level(grade_level: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (grade_level or "").lower()).strip("-")
+
+
+class LessonContentKey(NamedTuple):
+    topic: str
+    grade_level: str
+    bucket: str
+
+    def __str__(self) -> str:
+        return f"{self.topic}|{self.grade_level}|{self.bucket}"
+
+    @property
+    def document_id(self) -> str:
+        return hashlib.sha1(str(self).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def parse(cls, text: str) -> Optional["LessonContentKey"]:
+        parts = (text or "").split("|")
+        return cls(*parts) if len(parts) == 3 and all(parts) else None
+
+
+def lesson_content_key(topic: str, learning_profile: Optional[Mapping[str, Any]] = None) -> Optional[LessonContentKey]:
+    """The cache key for a lesson request, or None if the topic normalises to nothing."""
+    normalized = normalize_topic(topic)
+    if not normalized:
+        return None
+    profile = learning_profile or {}
+    grade_level = normalize_grade_level(profile.get("grade_level") or DEFAULT_GRADE_LEVEL)
+    completed = {normalize_topic(completed_topic) for completed_topic in profile.get("completed_topics") or []}
+    return LessonContentKey(normalized, grade_level, ADVANCED_BUCKET if normalized in completed else INTRO_BUCKET)
+
+
+class LessonContentCache:
+    """
+    Two-tier lesson content cache. `repository` provides load_lesson_content,
+    save_lesson_content and lesson_content_keys (the persistent tier);
+    `validate` turns a lesson plan into its canonical dict or raises, and
+    guards both tiers against malformed content. `index_factory` builds the
+    fuzzy topic index (e.g. TopicIndex) kept per grade level and bucket;
+    without it only exact keys hit.
+    """
+
+    def __init__(
+        self,
+        repository: Any,
+        max_entries: int = LESSON_CONTENT_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = LESSON_CONTENT_CACHE_TTL_SECONDS,
+        validate: Optional[Callable[[Any], Dict[str, Any]]] = None,
+        index_factory: Optional[Callable[[], Any]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._repository = repository
+        self.ttl_seconds = ttl_seconds
+        self._validate = validate
+        self._index_factory = index_factory
+        self._clock = clock
+        self._memory: TTLCache[Dict[str, Any]] = TTLCache("lesson_content", max_entries, ttl_seconds)
+        self._indexes: Dict[Tuple[str, str], Any] = {}
+        # Stats
+        self.fuzzy_hits = 0
+
+    def _index(self, key: LessonContentKey) -> Optional[Any]:
+        if self._index_factory is None:
+            return None
+        index = self._indexes.get((key.grade_level, key.bucket))
+        if index is None:
+            index = self._indexes[(key.grade_level, key.bucket)] = self._index_factory()
+        return index
+
+    def _remember_topic(self, key: LessonContentKey) -> None:
+        index = self._index(key)
+        if index is not None:
+            index.add(key.topic)
+
+    def _entry(self, lesson_plan: Any, parsed_section_markdowns: Any, image_urls: Any = None) -> Optional[Dict[str, Any]]:
+        if not isinstance(parsed_section_markdowns, list) or not parsed_section_markdowns:
+            return None
+        try:
+            plan = self._validate(lesson_plan) if self._validate is not None else dict(lesson_plan)
+        except Exception as e:
+            logger.warning("Not caching lesson content that fails validation: %s", e)
+            return None
+        entry = {"lesson_plan": plan, "parsed_section_markdowns": parsed_section_markdowns}
+        if image_urls and isinstance(image_urls, dict):
+            entry["image_urls"] = image_urls
+        return entry
+
+    async def _get_exact(self, key: LessonContentKey) -> Optional[Dict[str, Any]]:
+        hit, entry = self._memory.lookup(key)
+        if hit:
+            return entry
+        document = await self._repository.load_lesson_content(key.document_id)
+        entry = None
+        if document is not None and document.get("key") == str(key) and document.get("expires_at", 0) > self._clock():
+            entry = self._entry(document.get("lesson_plan"), document.get("parsed_section_markdowns"), document.get("image_urls"))
+        CACHE_REQUESTS_TOTAL.inc(cache="lesson_content_store", result="hit" if entry is not None else "miss")
+        if entry is not None:
+            self._memory.put(key, entry)
+            self._remember_topic(key)
+        return entry
+
+    async def get(self, key: LessonContentKey) -> Optional[Dict[str, Any]]:
+        """
+        {"lesson_plan", "parsed_section_markdowns"} for `key`, plus "image_urls"
+        (image prompt -> URL) for pre-generated lessons; None on a miss. The
+        result is the caller's to keep.
+        """
+        entry = await self._get_exact(key)
+        index = self._index(key)
+        if entry is None and index is not None:
+            match = index.best_match(key.topic)
+            if match is not None and match[0] != key.topic:
+                similar_key = key._replace(topic=match[0])
+                entry = await self._get_exact(similar_key)
+                CACHE_REQUESTS_TOTAL.inc(cache="lesson_content_fuzzy", result="hit" if entry is not None else "miss")
+                if entry is None:
+                    index.discard(similar_key.topic)
+                else:
+                    self.fuzzy_hits += 1
+                    logger.info("Lesson content for '%s' served from similar topic '%s' (%.2f)", key.topic, match[0], match[1])
+                    self._memory.put(key, entry)
+        if entry is None:
+            return None
+        # Session state takes ownership of what we return; the cached copy must stay pristine.
+        return copy.deepcopy(entry)
+
+    async def put(
+        self,
+        key: LessonContentKey,
+        lesson_plan: Any,
+        parsed_section_markdowns: List[Dict[str, Any]],
+        image_urls: Optional[Dict[str, str]] = None,
+        ttl_seconds: Optional[float] = None,
+    ) -> bool:
+        """
+        Caches freshly generated content in both tiers. `ttl_seconds`
+        overrides the persistent tier's TTL (the catalog keeps lessons longer).
+        Returns False if the content was not cacheable.
+        """
+        entry = self._entry(lesson_plan, parsed_section_markdowns, image_urls)
+        if entry is None:
+            return False
+        entry = copy.deepcopy(entry)
+        self._memory.put(key, entry)
+        self._remember_topic(key)
+        await self._repository.save_lesson_content(key.document_id, {
+            "key": str(key),
+            **entry,
+            "expires_at": self._clock() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds),
+            "created_at": datetime.now().isoformat(),
+        })
+        return True
+
+    async def warm(self) -> int:
+        """Indexes the topics of every unexpired entry in the persistent tier. Returns how many."""
+        if self._index_factory is None:
+            return 0
+        now = self._clock()
+        indexed = 0
+        for document in await self._repository.lesson_content_keys():
+            key = LessonContentKey.parse(document.get("key", ""))
+            if key is not None and document.get("expires_at", 0) > now:
+                self._remember_topic(key)
+                indexed += 1
+        return indexed
+
+    def stats(self) -> dict:
+        return {
+            **self._memory.stats(),
+            "fuzzy_hits": self.fuzzy_hits,
+            "indexed_topics": sum(len(index) for index in self._indexes.values()),
+        }
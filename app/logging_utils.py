@@ -0,0 +1,166 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Non-blocking, sampled, leveled logging for the app.
+
+Records are handed to a QueueHandler on the calling thread and written to
+stdout by a QueueListener thread, so the event loop never blocks on I/O.
+Each category has its own logger ("kido.<category>") so levels and sampling
+can be tuned independently:
+
+    LOG_LEVEL=INFO
+    LOG_LEVELS="firestore=DEBUG,audio=DEBUG"   # per-category overrides
+    LOG_SAMPLE_RATES="audio=0.001"             # keep 1 in 1000 audio records
+    LOG_FORMAT=json                            # or "text"
+    LOG_MAX_FIELD_CHARS=300                    # truncation for large payloads
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+# Categories
+SERVER_LOG = "server"
+AUDIO_LOG = "audio"
+AGENT_LOG = "agent"
+CALLBACKS_LOG = "callbacks"
+TOOLS_LOG = "tools"
+FIRESTORE_LOG = "firestore"
+
+# --- Configurable constants ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "300"))
+# Firestore debug output is off unless explicitly enabled.
+DEFAULT_CATEGORY_LEVELS = {FIRESTORE_LOG: "INFO"}
+DEFAULT_SAMPLE_RATES = {AUDIO_LOG: 0.001}
+
+_configure_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+def _parse_mapping(raw: Optional[str]) -> Dict[str, str]:
+    mapping = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            mapping[key.strip()] = value.strip()
+    return mapping
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one record in every round(1 / rate). Warnings and errors always pass.
+    Installed on the logger, so a dropped record has still been created (its
+    arguments captured, but not formatted) and the saving is in formatting and
+    output. Counter based rather than random, so deciding costs an increment.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = 0 if rate <= 0 else max(1, round(1 / rate))
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.every == 0:
+            return False
+        self._seen += 1
+        if self._seen >= self.every:
+            self._seen = 0
+            return True
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the keys Cloud Logging understands."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "severity": record.levelname,
+            "category": record.name.removeprefix("kido."),
+            "message": record.getMessage(),
+            "time": self.formatTime(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def truncate(value: Any, limit: Optional[int] = None) -> str:
+    """Returns a string form of `value` that is at most `limit` characters (plus a marker)."""
+    limit = LOG_MAX_FIELD_CHARS if limit is None else limit
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...({len(text) - limit} more chars)"
+
+
+def configure_logging() -> None:
+    """Installs the queue-based handler once per process. Safe to call repeatedly."""
+    global _listener, _queue_handler
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+        root = logging.getLogger("kido")
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        record_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _queue_handler = logging.handlers.QueueHandler(record_queue)
+        root.addHandler(_queue_handler)
+        _listener = logging.handlers.QueueListener(record_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+        levels = {**DEFAULT_CATEGORY_LEVELS, **_parse_mapping(os.getenv("LOG_LEVELS"))}
+        for category, level in levels.items():
+            logging.getLogger(f"kido.{category}").setLevel(level.upper())
+
+        rates = {**DEFAULT_SAMPLE_RATES, **{k: float(v) for k, v in _parse_mapping(os.getenv("LOG_SAMPLE_RATES")).items()}}
+        for category, rate in rates.items():
+            if rate < 1:
+                logging.getLogger(f"kido.{category}").addFilter(SamplingFilter(rate))
+
+
+def shutdown_logging() -> None:
+    """Flushes queued records and stops the listener thread."""
+    global _listener, _queue_handler
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        if _queue_handler is not None:
+            logging.getLogger("kido").removeHandler(_queue_handler)
+            _queue_handler = None
+
+
+def get_logger(category: str) -> logging.Logger:
+    configure_logging()
+    return logging.getLogger(f"kido.{category}")
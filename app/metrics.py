@@ -0,0 +1,281 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Minimal in-process metrics exported in Prometheus text format from /metrics.
+
+Histograms use fixed buckets, so memory stays bounded no matter how many
+sessions or observations there are. All updates happen on the event loop.
+"""
+
+import math
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+AUDIO_GAP_BUCKETS = (0.005, 0.01, 0.02, 0.04, 0.08, 0.16, 0.32, 0.64, 1.28, 2.56)
+BYTES_BUCKETS = (1e4, 1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}", *self._samples()])
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = (*sorted(buckets), math.inf)
+        # label values -> [per-bucket counts..., sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def _samples(self):
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series[: len(self.buckets)], strict=True):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+ACTIVE_CONNECTIONS = REGISTRY.register(Gauge(
+    "kido_active_connections", "WebSocket connections currently open."))
+SETUP_TO_FIRST_EVENT_SECONDS = REGISTRY.register(Histogram(
+    "kido_setup_to_first_event_seconds", "Time from the setup message to the first live_events event."))
+USER_AUDIO_TO_MODEL_AUDIO_SECONDS = REGISTRY.register(Histogram(
+    "kido_user_audio_to_model_audio_seconds",
+    "Time from the last voiced user audio before a model turn to the turn's first model audio."))
+MODEL_AUDIO_GAP_SECONDS = REGISTRY.register(Histogram(
+    "kido_model_audio_gap_seconds", "Gap between consecutive model audio parts within a turn.", buckets=AUDIO_GAP_BUCKETS))
+TOOL_ROUND_TRIP_SECONDS = REGISTRY.register(Histogram(
+    "kido_tool_round_trip_seconds", "Time from a tool call to its function response.", labelnames=("tool",)))
+BARGE_IN_SECONDS = REGISTRY.register(Histogram(
+    "kido_barge_in_to_silence_seconds", "Time from an interruption to the interrupted message reaching the socket."))
+CONNECTION_BYTES = REGISTRY.register(Histogram(
+    "kido_connection_bytes", "Bytes transferred per connection.", labelnames=("direction",), buckets=BYTES_BUCKETS))
+SESSION_SETUP_PHASE_SECONDS = REGISTRY.register(Histogram(
+    "kido_session_setup_phase_seconds",
+    "Time spent in each phase of session setup (session, bootstrap and its fetches, run_live up to the first model event).",
+    labelnames=("phase",)))
+LIVE_SESSIONS_ACTIVE = REGISTRY.register(Gauge(
+    "kido_live_sessions_active", "Live sessions currently holding an admission slot."))
+LIVE_SESSION_CAPACITY = REGISTRY.register(Gauge(
+    "kido_live_session_capacity", "Maximum concurrent live sessions on this instance."))
+LIVE_SESSION_OCCUPANCY = REGISTRY.register(Gauge(
+    "kido_live_session_occupancy", "Active live sessions divided by capacity (autoscaling signal)."))
+ADMISSION_WAITING = REGISTRY.register(Gauge(
+    "kido_admission_waiting", "Connections waiting for a live-session slot."))
+ADMISSION_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "kido_admission_wait_seconds", "Time from arrival to admission for admitted connections."))
+ADMISSION_REJECTED_TOTAL = REGISTRY.register(Counter(
+    "kido_admission_rejected_total", "Connections shed by admission control.", labelnames=("reason",)))
+LIVE_STREAMS_SUSPENDED = REGISTRY.register(Gauge(
+    "kido_live_streams_suspended", "Open connections whose live model stream is suspended for idleness."))
+LIVE_STREAM_SUSPENSIONS_TOTAL = REGISTRY.register(Counter(
+    "kido_live_stream_suspensions_total", "Live model streams torn down because the connection went idle."))
+LIVE_STREAM_RESUME_SECONDS = REGISTRY.register(Histogram(
+    "kido_live_stream_resume_seconds", "Time from the input that wakes a suspended connection to its new live stream starting."))
+FIRESTORE_SAVES_TOTAL = REGISTRY.register(Counter(
+    "kido_firestore_saves_total", "Logical state saves by write mode (full, delta, noop, failed).",
+    labelnames=("kind", "mode")))
+FIRESTORE_RPCS_TOTAL = REGISTRY.register(Counter(
+    "kido_firestore_rpcs_total", "Firestore RPCs issued by state saves; divide by saves for write amplification.",
+    labelnames=("kind", "op")))
+FIRESTORE_WRITE_BYTES_TOTAL = REGISTRY.register(Counter(
+    "kido_firestore_write_bytes_total", "Approximate JSON size of the data sent by state saves.", labelnames=("kind",)))
+STORAGE_IO_SECONDS = REGISTRY.register(Histogram(
+    "kido_storage_io_seconds", "Time from submitting a storage call to its completion, including queueing.",
+    labelnames=("op",)))
+STORAGE_IO_ERRORS_TOTAL = REGISTRY.register(Counter(
+    "kido_storage_io_errors_total", "Storage calls that raised.", labelnames=("op",)))
+STORAGE_IO_IN_FLIGHT = REGISTRY.register(Gauge(
+    "kido_storage_io_in_flight", "Storage calls admitted by the concurrency cap and not yet finished."))
+BACKGROUND_TASKS_ACTIVE = REGISTRY.register(Gauge(
+    "kido_background_tasks_active", "Supervised background tasks still running."))
+BACKGROUND_TASK_ERRORS_TOTAL = REGISTRY.register(Counter(
+    "kido_background_task_errors_total", "Supervised background tasks that ended with an exception.", labelnames=("task",)))
+CACHE_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "kido_cache_requests_total", "In-process cache lookups by result (hit, miss).", labelnames=("cache", "result")))
+BYTES_TOTAL = REGISTRY.register(Counter(
+    "kido_bytes_total", "Bytes transferred over all connections.", labelnames=("direction",)))
+
+TIMED_TOOLS = ("lesson_creation_workflow", "generate_image_with_imagen")
+# Calls whose response never arrives are forgotten beyond this many per session.
+MAX_PENDING_TOOL_CALLS = 16
+
+
+class SessionMetrics:
+    """Per-connection timing and byte accounting, feeding the module-level histograms."""
+
+    def __init__(self, setup_at: Optional[float] = None):
+        self.setup_at = setup_at if setup_at is not None else time.monotonic()
+        self.first_event_at: Optional[float] = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._awaiting_model_audio_since: Optional[float] = None
+        self._model_turn_open = False
+        self._last_model_audio_at: Optional[float] = None
+        self._pending_tools: Dict[str, Tuple[str, float]] = {}
+        self._closed = False
+        ACTIVE_CONNECTIONS.inc()
+
+    def on_live_event(self) -> None:
+        if self.first_event_at is None:
+            self.first_event_at = time.monotonic()
+            SETUP_TO_FIRST_EVENT_SECONDS.observe(self.first_event_at - self.setup_at)
+
+    def on_bytes_in(self, nbytes: int) -> None:
+        self.bytes_in += nbytes
+        BYTES_TOTAL.inc(nbytes, direction="in")
+
+    def on_bytes_out(self, nbytes: int) -> None:
+        self.bytes_out += nbytes
+        BYTES_TOTAL.inc(nbytes, direction="out")
+
+    def on_user_audio(self) -> None:
+        """A voiced user audio chunk (silence is not reported). The last one before model audio starts the response timer."""
+        if not self._model_turn_open:
+            self._awaiting_model_audio_since = time.monotonic()
+
+    def on_model_audio(self) -> None:
+        now = time.monotonic()
+        if self._model_turn_open and self._last_model_audio_at is not None:
+            MODEL_AUDIO_GAP_SECONDS.observe(now - self._last_model_audio_at)
+        elif self._awaiting_model_audio_since is not None:
+            USER_AUDIO_TO_MODEL_AUDIO_SECONDS.observe(now - self._awaiting_model_audio_since)
+        self._awaiting_model_audio_since = None
+        self._model_turn_open = True
+        self._last_model_audio_at = now
+
+    def on_turn_end(self) -> None:
+        """turnComplete or interrupted: the next model audio starts a new turn."""
+        self._model_turn_open = False
+        self._last_model_audio_at = None
+
+    def on_tool_call(self, name: str, call_id: Optional[str]) -> None:
+        if name in TIMED_TOOLS:
+            if len(self._pending_tools) >= MAX_PENDING_TOOL_CALLS:
+                self._pending_tools.pop(next(iter(self._pending_tools)))
+            self._pending_tools[call_id or name] = (name, time.monotonic())
+
+    def on_tool_response(self, name: str, call_id: Optional[str]) -> None:
+        pending = self._pending_tools.pop(call_id or name, None)
+        if pending is not None:
+            TOOL_ROUND_TRIP_SECONDS.observe(time.monotonic() - pending[1], tool=pending[0])
+
+    def on_barge_in(self, seconds: float) -> None:
+        BARGE_IN_SECONDS.observe(seconds)
+
+    def close(self) -> dict:
+        if not self._closed:
+            self._closed = True
+            ACTIVE_CONNECTIONS.dec()
+            CONNECTION_BYTES.observe(self.bytes_in, direction="in")
+            CONNECTION_BYTES.observe(self.bytes_out, direction="out")
+        return {
+            "setup_to_first_event_seconds": round(self.first_event_at - self.setup_at, 4) if self.first_event_at else None,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
@@ -39,9 +39,8 @@ class LessonPlanOutput(BaseModel):
     wrap_up: dict # Consider defining a nested WrapUp model
     
     
-class SendCurrentSectionMarkdownInput(BaseModel):
-    section_index: int = Field(description="The 0-based index of the section whose Markdown content is being sent. For wrap-up, use total_sections_count.")
-    markdown_content: str = Field(description="The Markdown content for the specific lesson section.")
+class ShowLessonSectionInput(BaseModel):
+    section_index: int = Field(description="The 0-based index of the section to show; its stored Markdown is sent by the server. For wrap-up, use total_sections_count.")
 
 class PresentationInput(BaseModel):
     lesson_plan: LessonPlan = Field(description="The JSON lesson plan to convert to Markdown.")
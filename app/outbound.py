@@ -0,0 +1,303 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Server -> client outbound path helpers.
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Tuple
+
+# --- Configurable constants ---
+# Consecutive audio/pcm parts are merged until the buffer holds this much audio...
+AUDIO_COALESCE_MS = int(os.getenv("AUDIO_COALESCE_MS", "120"))
+# ...or this many bytes, whichever comes first. 0 disables coalescing.
+AUDIO_COALESCE_MAX_BYTES = int(os.getenv("AUDIO_COALESCE_MAX_BYTES", "16384"))
+# Per-connection send queue bound and what to do when a slow client fills it.
+OUTBOUND_QUEUE_MAX_MESSAGES = int(os.getenv("OUTBOUND_QUEUE_MAX_MESSAGES", "64"))
+OUTBOUND_OVERFLOW_POLICY = os.getenv("OUTBOUND_OVERFLOW_POLICY", "drop_oldest_audio")
+
+DROP_OLDEST_AUDIO = "drop_oldest_audio"
+BLOCK = "block"
+DISCONNECT = "disconnect"
+OVERFLOW_POLICIES = (DROP_OLDEST_AUDIO, BLOCK, DISCONNECT)
+
+# Outbound message classes, see OutboundQueue.
+CONTROL = "control"
+NORMAL = "normal"
+AUDIO = "audio"
+
+# Live model output is 16-bit mono PCM; used when the mime type has no rate.
+DEFAULT_OUTPUT_SAMPLE_RATE = 24000
+PCM_BYTES_PER_SAMPLE = 2
+
+_RATE_RE = re.compile(r"rate=(\d+)")
+
+
+def pcm_bytes_for_ms(mime_type: str, ms: int) -> int:
+    """Returns the number of PCM bytes that hold `ms` milliseconds of audio for this mime type."""
+    match = _RATE_RE.search(mime_type or "")
+    sample_rate = int(match.group(1)) if match else DEFAULT_OUTPUT_SAMPLE_RATE
+    return sample_rate * PCM_BYTES_PER_SAMPLE * ms // 1000
+
+
+class AudioCoalescer:
+    """
+    Merges consecutive audio/pcm parts into larger frames.
+    Callers must call flush() before sending anything that is not audio
+    (tool messages, turnComplete, interrupted) so ordering is preserved.
+    """
+
+    def __init__(self, window_ms: int = AUDIO_COALESCE_MS, max_bytes: int = AUDIO_COALESCE_MAX_BYTES):
+        self.window_ms = window_ms
+        self.max_bytes = max_bytes
+        self._buffer = bytearray()
+        self._mime_type: Optional[str] = None
+        self._threshold = 0
+        self.parts_in = 0
+        self.frames_out = 0
+        self.parts_discarded = 0
+        self._buffered_parts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0 and self.max_bytes > 0
+
+    @property
+    def frames_saved(self) -> int:
+        return self.parts_in - self.parts_discarded - self.frames_out
+
+    @property
+    def pending_bytes(self) -> int:
+        return len(self._buffer)
+
+    def add(self, data: bytes, mime_type: str) -> List[Tuple[bytes, str]]:
+        """Buffers an audio part and returns any frames that are ready to send."""
+        self.parts_in += 1
+        if not self.enabled:
+            self.frames_out += 1
+            return [(data, mime_type)]
+
+        ready = []
+        if self._mime_type is not None and mime_type != self._mime_type:
+            ready.extend(self.flush())
+        if self._mime_type is None:
+            self._mime_type = mime_type
+            self._threshold = min(self.max_bytes, max(1, pcm_bytes_for_ms(mime_type, self.window_ms)))
+        self._buffer += data
+        self._buffered_parts += 1
+        if len(self._buffer) >= self._threshold:
+            ready.extend(self.flush())
+        return ready
+
+    def flush(self) -> List[Tuple[bytes, str]]:
+        """Returns whatever audio is buffered as a single frame."""
+        if not self._buffer or self._mime_type is None:
+            self._mime_type = None
+            return []
+        frame = (bytes(self._buffer), self._mime_type)
+        self._buffer.clear()
+        self._mime_type = None
+        self._buffered_parts = 0
+        self.frames_out += 1
+        return [frame]
+
+    def discard(self) -> int:
+        """Drops buffered audio without sending it (e.g. on interruption). Returns bytes dropped."""
+        dropped = len(self._buffer)
+        self.parts_discarded += self._buffered_parts
+        self._buffer.clear()
+        self._mime_type = None
+        self._buffered_parts = 0
+        return dropped
+
+
+class SendQueueOverflow(Exception):
+    """Raised by OutboundQueue.put() when the queue is full and the policy is 'disconnect'."""
+
+
+class OutboundQueue:
+    """
+    Bounded per-connection send queue drained by a dedicated writer task, so a
+    slow client never stalls consumption of the live event stream.
+
+    Messages are queued in one of three classes:
+      - CONTROL (interrupted, turnComplete, ui_feedback) goes into a priority
+        lane that the writer always drains first. It is not bounded: control
+        messages are tiny and at most a few per turn.
+      - NORMAL (images, markdown, tool responses) and AUDIO share the bounded
+        lane and keep their relative order.
+
+    Overflow policies for the bounded lane:
+      - drop_oldest_audio: discard the oldest queued audio message to make room
+        (non-audio messages are never dropped; falls back to blocking if no
+        audio is queued).
+      - block: wait for the writer to make room.
+      - disconnect: raise SendQueueOverflow so the caller can close the socket.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes], Awaitable[None]],
+        max_messages: int = OUTBOUND_QUEUE_MAX_MESSAGES,
+        policy: str = OUTBOUND_OVERFLOW_POLICY,
+        on_barge_in: Optional[Callable[[float], None]] = None,
+    ):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown outbound overflow policy '{policy}', expected one of {OVERFLOW_POLICIES}")
+        self._send = send
+        self.max_messages = max(1, max_messages)
+        self.policy = policy
+        self._on_barge_in = on_barge_in
+        # (payload, kind, barge-in start time for interrupt messages)
+        self._control: Deque[Tuple[bytes, str, Optional[float]]] = deque()
+        self._items: Deque[Tuple[bytes, str, Optional[float]]] = deque()
+        self._changed = asyncio.Condition()
+        self._closed = False
+        self._sending = False
+        # Stats
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped_audio = 0
+        self.discarded_audio = 0
+        self.max_depth = 0
+        self.stall_seconds = 0.0
+        self.max_stall_seconds = 0.0
+        self.send_seconds = 0.0
+        self.max_send_seconds = 0.0
+        self.barge_ins = 0
+        self.barge_in_seconds = 0.0
+        self.max_barge_in_seconds = 0.0
+        self.last_barge_in_seconds: Optional[float] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._control) + len(self._items)
+
+    def _drop_oldest_audio(self) -> bool:
+        for idx, (_, kind, _) in enumerate(self._items):
+            if kind == AUDIO:
+                del self._items[idx]
+                self.dropped_audio += 1
+                return True
+        return False
+
+    def _enqueue(self, payload: bytes, kind: str, barge_in_started: Optional[float] = None) -> None:
+        lane = self._control if kind == CONTROL else self._items
+        lane.append((payload, kind, barge_in_started))
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        self._changed.notify_all()
+
+    async def put(self, payload: bytes, kind: str = NORMAL) -> None:
+        """Queues a message for the writer, applying the overflow policy when the bounded lane is full."""
+        async with self._changed:
+            if kind != CONTROL and len(self._items) >= self.max_messages:
+                if self.policy == DISCONNECT:
+                    raise SendQueueOverflow(f"Outbound queue full ({len(self._items)} messages)")
+                if self.policy == BLOCK or not self._drop_oldest_audio():
+                    started = time.monotonic()
+                    await self._changed.wait_for(lambda: len(self._items) < self.max_messages or self._closed)
+                    stalled = time.monotonic() - started
+                    self.stall_seconds += stalled
+                    self.max_stall_seconds = max(self.max_stall_seconds, stalled)
+            if self._closed:
+                return
+            self._enqueue(payload, kind)
+
+    async def put_interrupt(self, payload: bytes) -> int:
+        """
+        Handles a barge-in: drops every queued audio message of the interrupted
+        turn and sends `payload` ahead of everything else. The time until the
+        writer has handed it to the socket is recorded as barge-in latency.
+        Returns the number of audio messages discarded.
+        """
+        started = time.monotonic()
+        async with self._changed:
+            if self._closed:
+                return 0
+            kept = [item for item in self._items if item[1] != AUDIO]
+            discarded = len(self._items) - len(kept)
+            self._items = deque(kept)
+            self.discarded_audio += discarded
+            self._enqueue(payload, CONTROL, barge_in_started=started)
+            return discarded
+
+    async def join(self) -> None:
+        """Waits until every queued message has been handed to the socket."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: (not self.depth and not self._sending) or self._closed)
+
+    async def close(self) -> None:
+        """Stops the writer; anything still queued is discarded."""
+        async with self._changed:
+            self._closed = True
+            self._control.clear()
+            self._items.clear()
+            self._changed.notify_all()
+
+    async def run(self) -> None:
+        """Writer loop. Run as its own task for the lifetime of the connection."""
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.depth or self._closed)
+                if self._closed:
+                    return
+                lane = self._control if self._control else self._items
+                payload, _, barge_in_started = lane.popleft()
+                self._sending = True
+                self._changed.notify_all()
+            started = time.monotonic()
+            try:
+                await self._send(payload)
+            finally:
+                async with self._changed:
+                    self._sending = False
+                    self._changed.notify_all()
+            finished = time.monotonic()
+            elapsed = finished - started
+            self.sent += 1
+            self.send_seconds += elapsed
+            self.max_send_seconds = max(self.max_send_seconds, elapsed)
+            if barge_in_started is not None:
+                self._record_barge_in(finished - barge_in_started)
+
+    def _record_barge_in(self, seconds: float) -> None:
+        self.barge_ins += 1
+        self.barge_in_seconds += seconds
+        self.max_barge_in_seconds = max(self.max_barge_in_seconds, seconds)
+        self.last_barge_in_seconds = seconds
+        if self._on_barge_in is not None:
+            self._on_barge_in(seconds)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped_audio": self.dropped_audio,
+            "discarded_audio": self.discarded_audio,
+            "stall_seconds": round(self.stall_seconds, 4),
+            "max_stall_seconds": round(self.max_stall_seconds, 4),
+            "send_seconds": round(self.send_seconds, 4),
+            "max_send_seconds": round(self.max_send_seconds, 4),
+            "barge_ins": self.barge_ins,
+            "mean_barge_in_seconds": round(self.barge_in_seconds / self.barge_ins, 4) if self.barge_ins else None,
+            "max_barge_in_seconds": round(self.max_barge_in_seconds, 4),
+        }
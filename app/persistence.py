@@ -0,0 +1,176 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-key write coalescing and dirty-field tracking for background persistence.
+
+Callbacks schedule a snapshot for a key (a user id); the scheduler keeps at
+most one write in flight per key, waits a short debounce window so bursts of
+updates collapse into one write, and always writes the newest snapshot last,
+so an older state can never overwrite a newer one.
+
+DirtyFieldTracker remembers what was last persisted per key so a save can
+send only the fields that changed.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Hashable, Mapping, Optional
+
+from app.logging_utils import FIRESTORE_LOG, get_logger
+
+# --- Configurable constants ---
+PERSIST_DEBOUNCE_MS = int(os.getenv("PERSIST_DEBOUNCE_MS", "250"))
+
+logger = get_logger(FIRESTORE_LOG)
+
+
+class _Slot:
+    __slots__ = ("payload", "has_pending", "task", "flush_now")
+
+    def __init__(self) -> None:
+        self.payload: Any = None
+        self.has_pending = False
+        self.task: Optional[asyncio.Future] = None
+        self.flush_now = asyncio.Event()
+
+
+class WriteScheduler:
+    """
+    Coalesces writes per key. `write(key, payload)` is awaited by a worker task
+    that exists only while the key has pending work; `spawn` starts those
+    tasks (e.g. IOSupervisor.spawn, so they are tracked and drained). A write
+    that returns False or raises is counted as failed and not retried; the
+    next scheduled snapshot supersedes it anyway.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[Hashable, Any], Awaitable[Any]],
+        debounce_seconds: float = PERSIST_DEBOUNCE_MS / 1000,
+        name: str = "writes",
+        spawn: Callable[[Coroutine[Any, Any, None]], "asyncio.Future"] = asyncio.ensure_future,
+    ):
+        self._write = write
+        self._spawn = spawn
+        self.debounce_seconds = debounce_seconds
+        self.name = name
+        self._slots: Dict[Hashable, _Slot] = {}
+        # Stats
+        self.scheduled = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+
+    def schedule(self, key: Hashable, payload: Any) -> None:
+        """Replaces any pending payload for `key`. Must be called from the event loop."""
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _Slot()
+        if slot.has_pending:
+            self.coalesced += 1
+        slot.payload = payload
+        slot.has_pending = True
+        self.scheduled += 1
+        if slot.task is None:
+            slot.task = self._spawn(self._drain(key, slot))
+
+    def pending(self, key: Hashable) -> bool:
+        slot = self._slots.get(key)
+        return slot is not None and (slot.has_pending or slot.task is not None)
+
+    async def _drain(self, key: Hashable, slot: _Slot) -> None:
+        try:
+            while slot.has_pending:
+                if self.debounce_seconds > 0 and not slot.flush_now.is_set():
+                    try:
+                        await asyncio.wait_for(slot.flush_now.wait(), self.debounce_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                payload = slot.payload
+                slot.payload = None
+                slot.has_pending = False
+                try:
+                    result = await self._write(key, payload)
+                except Exception as e:
+                    self.failed += 1
+                    logger.exception("[%s] Write for %s failed: %s", self.name, key, e)
+                    continue
+                if result is False:
+                    self.failed += 1
+                else:
+                    self.written += 1
+        finally:
+            slot.task = None
+            if self._slots.get(key) is slot and not slot.has_pending:
+                del self._slots[key]
+
+    async def flush(self, key: Hashable) -> None:
+        """Writes whatever is pending for `key` now, skipping the debounce, and waits for it."""
+        slot = self._slots.get(key)
+        if slot is None or slot.task is None:
+            return
+        slot.flush_now.set()
+        await asyncio.shield(slot.task)
+
+    async def flush_all(self) -> None:
+        await asyncio.gather(*(self.flush(key) for key in list(self._slots)))
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": self.scheduled,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            "failed": self.failed,
+            "pending_keys": len(self._slots),
+        }
+
+
+class DirtyFieldTracker:
+    """
+    Last-persisted field values per key. Values are compared by identity
+    first, then equality, so unchanged large values (a lesson plan that is
+    only ever replaced, never mutated) cost almost nothing to check.
+    """
+
+    def __init__(self) -> None:
+        self._persisted: Dict[Hashable, Dict[str, Any]] = {}
+
+    def changed_fields(self, key: Hashable, fields: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns the subset of `fields` that differs from what was persisted, or None if nothing is known for `key`."""
+        persisted = self._persisted.get(key)
+        if persisted is None:
+            return None
+        changed = {}
+        for name, value in fields.items():
+            if name not in persisted:
+                changed[name] = value
+                continue
+            old = persisted[name]
+            if old is not value and old != value:
+                changed[name] = value
+        return changed
+
+    def mark_persisted(self, key: Hashable, fields: Mapping[str, Any], replace: bool = False) -> None:
+        """Records fields as written. `replace` drops everything known for the key first (full-document write)."""
+        if replace or key not in self._persisted:
+            self._persisted[key] = dict(fields)
+        else:
+            self._persisted[key].update(fields)
+
+    def forget(self, key: Hashable) -> None:
+        self._persisted.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._persisted
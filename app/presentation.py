@@ -0,0 +1,134 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Deterministic LessonPlan -> Markdown presentation renderer.
+
+Produces the same layout the presentation agent is prompted for (see
+PRESENTATION_PLANNER_INSTRUCTION): a title slide with the learning
+objectives, one slide per section and a wrap-up slide, separated by '---' and
+tagged with data-section-index spans. It is plain templating over the plan's
+fields, so it costs no model round trip and cannot fail to follow the format.
+"""
+
+import re
+from typing import Any, Dict, List, Mapping, Optional
+
+SLIDE_SEPARATOR = "\n\n---\n\n"
+
+# Tags the slide of lesson section N (the wrap-up is N = number of sections); the title slide has none.
+_SECTION_INDEX_SPAN = re.compile(r"""data-section-index=["']?(\d+)""")
+_LIST_MARKER = re.compile(r"^(?:[-*+•]|\d+[.)])\s+")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+
+
+def _clean(text: Any) -> str:
+    # '---' separates slides; one inside the text would split a slide in two.
+    return re.sub(r"-{3,}", "—", str(text or "")).strip()
+
+
+def bullet_points(text: Any) -> List[str]:
+    """Bullet points from a field that is either a list already or a narrative (split into sentences)."""
+    points: List[str] = []
+    for line in _clean(text).splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        marker = _LIST_MARKER.match(line)
+        if marker:
+            points.append(line[marker.end():].strip())
+        else:
+            points.extend(sentence for sentence in _SENTENCE_BREAK.split(line) if sentence)
+    return points
+
+
+def _bullets(text: Any) -> List[str]:
+    return [f"* {point}" for point in bullet_points(text)]
+
+
+def render_slides(lesson_plan: Mapping[str, Any]) -> List[str]:
+    """One markdown string per slide: title, each section, wrap-up."""
+    topic = _clean(lesson_plan.get("topic")) or "Today's Lesson"
+    title_slide = [f"# {topic}"]
+    objectives = [f"* **{_clean(objective)}**" for objective in lesson_plan.get("learning_objectives") or [] if _clean(objective)]
+    if objectives:
+        title_slide += ["", "## What We'll Learn Today", *objectives]
+    slides = ["\n".join(title_slide)]
+
+    sections = lesson_plan.get("sections") or []
+    for index, section in enumerate(sections):
+        lines = [f"## {_clean(section.get('title')) or f'Part {index + 1}'} <span data-section-index=\"{index}\"></span>"]
+        key_points = _bullets(section.get("content"))
+        if key_points:
+            lines += ["", "### Key Points:", *key_points]
+        activity = _bullets(section.get("activity"))
+        if activity:
+            lines += ["", "### Activity Time:", *activity]
+        slides.append("\n".join(lines))
+
+    wrap_up = lesson_plan.get("wrap_up") or {}
+    lines = [f"## {_clean(wrap_up.get('title')) or 'Wrap-Up: What We Learned'} <span data-section-index=\"{len(sections)}\"></span>"]
+    takeaways = _bullets(wrap_up.get("content"))
+    if takeaways:
+        lines += ["", "### Today's Key Takeaways:", *takeaways]
+    challenge = _bullets(wrap_up.get("activity"))
+    if challenge:
+        lines += ["", "### Final Challenge:", *challenge]
+    lines += ["", "### Great Job!", f"You've learned so much about {topic} today! \U0001f389"]
+    slides.append("\n".join(lines))
+    return slides
+
+
+def render_presentation_markdown(lesson_plan: Mapping[str, Any]) -> str:
+    """The whole presentation, in the presentation agent's '---'-separated output format."""
+    return SLIDE_SEPARATOR.join(render_slides(lesson_plan))
+
+
+def split_presentation_markdown(presentation_markdown: Any) -> List[Dict[str, Any]]:
+    """
+    parsed_section_markdowns from '---'-separated presentation markdown:
+    one {"index", "markdown"} per non-empty slide, "index" being its position.
+    """
+    slides = [slide.strip() for slide in presentation_markdown.split("---")] if isinstance(presentation_markdown, str) else []
+    return [{"index": index, "markdown": slide} for index, slide in enumerate(slide for slide in slides if slide)]
+
+
+def render_section_markdowns(lesson_plan: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """parsed_section_markdowns for `lesson_plan`, as split_presentation_markdown builds them from the workflow output."""
+    return [{"index": index, "markdown": slide} for index, slide in enumerate(render_slides(lesson_plan))]
+
+
+def section_markdown(parsed_section_markdowns: Any, section_index: Any) -> Optional[str]:
+    """
+    The stored slide of lesson section `section_index` (the wrap-up being
+    len(sections)), found by its data-section-index span; None if there is
+    none. Slides are not looked up by position: the first one is the title
+    slide. Presentations without any spans fall back to the slides after it.
+    """
+    if isinstance(section_index, float) and section_index.is_integer():
+        # Tool-call arguments arrive as JSON numbers.
+        section_index = int(section_index)
+    if not isinstance(parsed_section_markdowns, list) or not isinstance(section_index, int) or isinstance(section_index, bool):
+        return None
+    slides = [section["markdown"] for section in parsed_section_markdowns if isinstance(section, dict) and isinstance(section.get("markdown"), str)]
+    tagged = False
+    for slide in slides:
+        span = _SECTION_INDEX_SPAN.search(slide)
+        if span is not None:
+            tagged = True
+            if int(span.group(1)) == section_index:
+                return slide
+    if tagged or not 0 <= section_index < len(slides) - 1:
+        return None
+    return slides[section_index + 1]
@@ -0,0 +1,434 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Async repository for everything the tutor persists.
+
+  adk_lessons             lesson in progress, one document per user
+  adk_sessions            restorable session snapshot, "<app_name>__<user_id>"
+  adk_completed_lessons   one document per user and topic
+  adk_learning_profiles   per-user aggregate of completed lessons
+
+Documents live in a StorageBackend (app/storage.py): Firestore in
+production, memory or SQLite locally (STORAGE_BACKEND). Each public
+operation is admitted and measured by the storage I/O supervisor
+(kido_storage_io_seconds{op} etc.), which also caps how many run at once.
+The Firestore backend keeps one AsyncClient per event loop, so callers
+await the repository on the loop they live on.
+"""
+
+import asyncio
+import json
+import os
+import random
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.cache import LESSON_CACHE_MAX_USERS, LESSON_CACHE_TTL_SECONDS, TTLCache
+from app.io_supervisor import IOSupervisor, storage_io
+from app.learning_profile import apply_completed_lesson, build_profile_document, profile_from_document
+from app.logging_utils import FIRESTORE_LOG, get_logger, truncate
+from app.metrics import FIRESTORE_RPCS_TOTAL, FIRESTORE_SAVES_TOTAL, FIRESTORE_WRITE_BYTES_TOTAL
+from app.persistence import DirtyFieldTracker
+from app.storage import DocumentExists, DocumentNotFound, StorageBackend, Write, create_backend
+
+# --- Configurable constants ---
+# Fraction of state saves that are read back to verify them (diagnostic, 0 disables).
+FIRESTORE_VERIFY_SAMPLE_RATE = float(os.getenv("FIRESTORE_VERIFY_SAMPLE_RATE", "0"))
+# Lessons listed by the learning-history tool.
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10"))
+
+LESSONS_COLLECTION = "adk_lessons"
+SESSIONS_COLLECTION = "adk_sessions"
+COMPLETED_LESSONS_COLLECTION = "adk_completed_lessons"
+LEARNING_PROFILES_COLLECTION = "adk_learning_profiles"
+LESSON_CONTENT_COLLECTION = "adk_lesson_content"
+
+# Lesson fields kept in adk_lessons.
+LESSON_STATE_FIELDS = ("current_lesson_plan", "parsed_section_markdowns", "current_lesson_section_index")
+# A change to either of these rewrites the whole document; anything else is a field update.
+LESSON_FULL_REWRITE_FIELDS = frozenset({"current_lesson_plan", "parsed_section_markdowns"})
+
+# Fields returned by completed_lessons(), with the value used when a document lacks one.
+COMPLETED_LESSON_FIELDS = {
+    "topic": "Unknown",
+    "grade_level": "Unknown",
+    "completion_date": "",
+    "learning_objectives": [],
+}
+# What the learning-profile aggregate and the history tool actually read.
+PROFILE_LESSON_FIELDS = ("topic", "grade_level", "completion_date")
+HISTORY_LESSON_FIELDS = ("topic", "completion_date")
+
+logger = get_logger(FIRESTORE_LOG)
+
+
+def session_document_id(app_name: str, user_id: str) -> str:
+    return f"{app_name}__{user_id}"
+
+
+def _approx_document_bytes(data: Any) -> int:
+    return len(json.dumps(data, default=str))
+
+
+def _new_save_usage() -> Dict[str, Any]:
+    return {"read": 0, "write": 0, "bytes": 0, "mode": "failed"}
+
+
+def _record_save(kind: str, usage: Dict[str, Any]) -> None:
+    """Counts one logical save, the RPCs it took and the bytes it wrote, to track write amplification."""
+    FIRESTORE_SAVES_TOTAL.inc(kind=kind, mode=usage["mode"])
+    for op in ("read", "write"):
+        if usage[op]:
+            FIRESTORE_RPCS_TOTAL.inc(usage[op], kind=kind, op=op)
+    if usage["bytes"]:
+        FIRESTORE_WRITE_BYTES_TOTAL.inc(usage["bytes"], kind=kind)
+
+
+def _should_verify_save() -> bool:
+    return FIRESTORE_VERIFY_SAMPLE_RATE > 0 and random.random() < FIRESTORE_VERIFY_SAMPLE_RATE
+
+
+class Repository:
+    """
+    Reads and writes the tutor's documents. Per-user write state (what was
+    last persisted, for delta saves) and the lesson-state cache live here, so
+    every write path keeps them consistent.
+    """
+
+    def __init__(self, backend: StorageBackend, io: IOSupervisor = storage_io):
+        self.backend = backend
+        self._io = io
+        # Lesson fields / session snapshot as last written, per user.
+        self.persisted_lesson_fields = DirtyFieldTracker()
+        self.persisted_session_snapshots = DirtyFieldTracker()
+        # Read-through cache of adk_lessons documents (None = no document),
+        # refreshed at session start and kept current by our own saves.
+        self.lesson_cache = TTLCache("lesson_state", LESSON_CACHE_MAX_USERS, LESSON_CACHE_TTL_SECONDS)
+
+    # --- Lesson state (adk_lessons) ---
+
+    async def load_lesson_state(self, user_id: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        The user's lesson document, or None. Served from the cache when
+        possible; `refresh` re-reads the document (the cache is updated either way).
+        """
+        cache_key = str(user_id).strip()
+        if not refresh:
+            hit, cached = self.lesson_cache.lookup(cache_key)
+            if hit:
+                # Callers may add keys; the cached document itself stays untouched.
+                return dict(cached) if cached is not None else None
+        async with self._io.measure("load_lesson_state"):
+            lesson_state = await self.backend.get(LESSONS_COLLECTION, user_id)
+        self.lesson_cache.put(cache_key, lesson_state)
+        return dict(lesson_state) if lesson_state is not None else None
+
+    def mark_lesson_state_loaded(self, user_id: str, lesson_state: Optional[Dict[str, Any]]) -> None:
+        """Records a freshly read lesson document as persisted, so the next save can be a delta."""
+        if lesson_state is not None:
+            self.persisted_lesson_fields.mark_persisted(
+                str(user_id).strip(), {name: lesson_state.get(name) for name in LESSON_STATE_FIELDS}, replace=True
+            )
+
+    def forget_persisted(self, user_id: str) -> None:
+        """Drops what is known about the user's persisted documents; the next save rewrites them in full."""
+        self.persisted_lesson_fields.forget(str(user_id).strip())
+        self.persisted_session_snapshots.forget(str(user_id).strip())
+
+    def _lesson_document_write(self, user_id_str: str, lesson_state: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Decides how to write lesson state. Returns (mode, data, fields): mode is
+        "noop", "delta" (data is a field mask for update()) or "full" (data is the
+        whole document); fields are the lesson fields that data persists.
+        """
+        fields = {name: lesson_state.get(name) for name in LESSON_STATE_FIELDS}
+        changed = self.persisted_lesson_fields.changed_fields(user_id_str, fields)
+        if changed is not None and not changed:
+            return "noop", None, fields
+        last_updated = datetime.now().isoformat()
+        if changed is not None and not (LESSON_FULL_REWRITE_FIELDS & changed.keys()):
+            return "delta", {**changed, "last_updated": last_updated}, changed
+        return "full", {"user_id": user_id_str, **fields, "last_updated": last_updated}, fields
+
+    async def commit_state(
+        self,
+        app_name: str,
+        user_id: str,
+        lesson_state: Optional[Dict[str, Any]] = None,
+        session_write: Optional[Tuple[Optional[str], Dict[str, Any]]] = None,
+    ) -> bool:
+        """
+        Commits the lesson document (adk_lessons) and the session snapshot
+        (adk_sessions) in one batched write, so a save is a single RPC and the
+        two collections cannot disagree. Either part is skipped when it has not
+        changed since the last save; only the section index changing sends a
+        field-masked update. `session_write` is (session_id, snapshot) or None.
+        A sampled fraction of saves is read back (FIRESTORE_VERIFY_SAMPLE_RATE).
+        Returns False if nothing could be saved.
+        """
+        usage = _new_save_usage()
+        if lesson_state is not None and session_write is not None:
+            kind = "lesson_and_session"
+        else:
+            kind = "lesson_state" if lesson_state is not None else "session_state"
+        try:
+            async with self._io.measure("commit_state"):
+                return await self._commit_state(app_name, user_id, lesson_state, session_write, usage)
+        except Exception as e:
+            # The documents may or may not have been written; the next save rewrites them in full.
+            self.forget_persisted(user_id)
+            self.lesson_cache.invalidate(str(user_id).strip())
+            logger.exception("Failed to save state for user %s: %s", user_id, e)
+            return False
+        finally:
+            _record_save(kind, usage)
+
+    async def _commit_state(self, app_name, user_id, lesson_state, session_write, usage) -> bool:
+        if not user_id or not str(user_id).strip():
+            logger.error("Cannot save state: user_id is empty")
+            return False
+        user_id_str = str(user_id).strip()
+
+        lesson_mode, lesson_data, lesson_fields = None, None, None
+        if lesson_state is not None:
+            lesson_mode, lesson_data, lesson_fields = self._lesson_document_write(user_id_str, lesson_state)
+
+        session_doc = None
+        if session_write is not None:
+            session_id, snapshot = session_write
+            candidate = {"session_id": session_id, "state": snapshot}
+            if self.persisted_session_snapshots.changed_fields(user_id_str, candidate) != {}:
+                session_doc = candidate
+
+        if lesson_mode in (None, "noop") and session_doc is None:
+            usage["mode"] = "noop"
+            logger.debug("State for user %s unchanged, skipping write", user_id_str)
+            return True
+
+        async def commit(lesson_mode, lesson_data):
+            writes = []
+            if lesson_mode == "delta":
+                writes.append(Write("update", LESSONS_COLLECTION, user_id_str, lesson_data))
+            elif lesson_mode == "full":
+                writes.append(Write("set", LESSONS_COLLECTION, user_id_str, lesson_data))
+            if session_doc is not None:
+                writes.append(Write("set", SESSIONS_COLLECTION, session_document_id(app_name, user_id_str), session_doc))
+            usage["write"] += 1
+            await self.backend.commit(writes)
+            usage["bytes"] += sum(_approx_document_bytes(write.data) for write in writes)
+
+        logger.debug(
+            "Saving state for user %s: lesson=%s (section_index=%s), session snapshot=%s",
+            user_id_str, lesson_mode, (lesson_fields or {}).get("current_lesson_section_index"), session_doc is not None,
+        )
+        try:
+            await commit(lesson_mode, lesson_data)
+        except DocumentNotFound:
+            # A field update against a missing document fails the whole batch.
+            logger.info("Lesson state document for user %s is gone, rewriting it in full", user_id_str)
+            self.persisted_lesson_fields.forget(user_id_str)
+            lesson_mode, lesson_data, lesson_fields = self._lesson_document_write(user_id_str, lesson_state)
+            await commit(lesson_mode, lesson_data)
+
+        if lesson_mode in ("delta", "full"):
+            self.persisted_lesson_fields.mark_persisted(user_id_str, lesson_fields, replace=lesson_mode == "full")
+            # After either mode the document holds every lesson field of this snapshot.
+            self.lesson_cache.put(user_id_str, {
+                "user_id": user_id_str,
+                **{name: lesson_state.get(name) for name in LESSON_STATE_FIELDS},
+                "last_updated": lesson_data["last_updated"],
+            })
+        if session_doc is not None:
+            self.persisted_session_snapshots.mark_persisted(user_id_str, session_doc, replace=True)
+        usage["mode"] = "delta" if lesson_mode == "delta" else "full"
+
+        if lesson_mode in ("delta", "full") and _should_verify_save():
+            usage["read"] += 1
+            saved_data = await self.backend.get(LESSONS_COLLECTION, user_id_str)
+            if saved_data is None:
+                logger.error("Lesson state document for user %s does not exist after save attempt!", user_id_str)
+                return False
+            logger.info(
+                "Verified lesson state for user %s: section_index=%s, markdown sections=%d",
+                user_id_str,
+                saved_data.get("current_lesson_section_index"),
+                len(saved_data.get("parsed_section_markdowns") or []),
+            )
+        return True
+
+    # --- Session snapshot (adk_sessions) ---
+
+    async def load_session_state(self, app_name: str, user_id: str) -> Dict[str, Any]:
+        """The restorable session state saved for the user, or {}."""
+        async with self._io.measure("load_session_state"):
+            data = await self.backend.get(SESSIONS_COLLECTION, session_document_id(app_name, user_id))
+        return data.get("state", {}) if data else {}
+
+    # --- Completed lessons (adk_completed_lessons) and learning profile ---
+
+    async def save_completed_lesson(self, user_id: str, lesson_plan: Dict[str, Any], completion_date: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Records a completed lesson and folds it into the user's learning
+        profile in one transaction, so the two never disagree. Returns the
+        updated learning profile.
+        """
+        if completion_date is None:
+            completion_date = datetime.now().isoformat()
+        completed_lesson_data = {
+            "user_id": user_id,
+            "topic": lesson_plan.get("topic", "Unknown"),
+            "grade_level": lesson_plan.get("grade_level", "Unknown"),
+            "duration_minutes": lesson_plan.get("duration_minutes", 0),
+            "learning_objectives": lesson_plan.get("learning_objectives", []),
+            "completion_date": completion_date,
+            "sections_count": len(lesson_plan.get("sections", [])),
+        }
+        # Use topic as document ID to avoid duplicates
+        doc_id = f"{user_id}_{lesson_plan.get('topic', 'unknown').replace(' ', '_').lower()}"
+
+        updated = {}
+
+        async def record(profile_doc) -> Sequence[Write]:
+            if profile_doc is None:
+                profile_doc = build_profile_document(user_id, await self._completed_lessons(user_id, PROFILE_LESSON_FIELDS))
+            # Runs again on a retry; the attempt that commits is the last one.
+            updated["profile_doc"] = apply_completed_lesson(profile_doc, completed_lesson_data)
+            return [
+                Write("set", COMPLETED_LESSONS_COLLECTION, doc_id, completed_lesson_data),
+                Write("set", LEARNING_PROFILES_COLLECTION, user_id, updated["profile_doc"]),
+            ]
+
+        async with self._io.measure("save_completed_lesson"):
+            await self.backend.read_modify_write(LEARNING_PROFILES_COLLECTION, user_id, record)
+        logger.info("Saved completed lesson: %s for user %s", completed_lesson_data["topic"], user_id)
+        return profile_from_document(updated["profile_doc"])
+
+    async def completed_lessons(
+        self, user_id: str, fields: Optional[Iterable[str]] = None, limit: Optional[int] = None, start_after: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        The user's completed lessons, newest first. `fields` projects the query
+        so only those fields are read (default: all of COMPLETED_LESSON_FIELDS).
+        `limit` and `start_after` (the completion_date of the last lesson
+        already seen) page through the history. Needs the (user_id ASC,
+        completion_date DESC) composite index, see deployment/terraform/firestore.tf.
+        """
+        async with self._io.measure("load_completed_lessons"):
+            return await self._completed_lessons(user_id, fields, limit, start_after)
+
+    async def _completed_lessons(self, user_id, fields=None, limit=None, start_after=None) -> List[Dict[str, Any]]:
+        fields = tuple(fields) if fields else tuple(COMPLETED_LESSON_FIELDS)
+        documents = await self.backend.query(
+            COMPLETED_LESSONS_COLLECTION,
+            {"user_id": user_id},
+            order_by="completion_date",
+            descending=True,
+            fields=fields,
+            limit=limit,
+            start_after=start_after or None,
+        )
+        return [{name: document.get(name, COMPLETED_LESSON_FIELDS[name]) for name in fields} for document in documents]
+
+    async def completed_lessons_page(
+        self, user_id: str, limit: int = HISTORY_PAGE_SIZE, cursor: Optional[str] = None, total: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of lesson history: the `limit` most recent lessons (after
+        `cursor`, if given) with only topic and completion_date read.
+        Returns {"lessons", "total", "next_cursor"}; next_cursor is None on the
+        last page. `total` comes from the learning-profile aggregate and is
+        read from it when not supplied, so nothing is materialised to count.
+        """
+        if total is None:
+            lessons, profile = await asyncio.gather(
+                self.completed_lessons(user_id, HISTORY_LESSON_FIELDS, limit, cursor),
+                self.learning_profile(user_id),
+            )
+            total = profile["total_lessons_completed"]
+        else:
+            lessons = await self.completed_lessons(user_id, HISTORY_LESSON_FIELDS, limit, cursor)
+        next_cursor = lessons[-1]["completion_date"] if limit and len(lessons) == limit else None
+        return {"lessons": lessons, "total": max(total, len(lessons)), "next_cursor": next_cursor}
+
+    async def learning_profile(self, user_id: str) -> Dict[str, Any]:
+        """
+        The user's learning profile, read from their adk_learning_profiles
+        aggregate; users who predate it are backfilled from adk_completed_lessons once.
+        """
+        async with self._io.measure("load_learning_profile"):
+            document = await self.backend.get(LEARNING_PROFILES_COLLECTION, user_id)
+            if document is not None:
+                return profile_from_document(document)
+            profile_doc = build_profile_document(user_id, await self._completed_lessons(user_id, PROFILE_LESSON_FIELDS))
+            try:
+                # A create, so a concurrent save_completed_lesson (which also backfills) wins.
+                await self.backend.commit([Write("create", LEARNING_PROFILES_COLLECTION, user_id, profile_doc)])
+                logger.info("Backfilled learning profile for user %s from %d completed lessons", user_id, profile_doc["total_lessons_completed"])
+            except DocumentExists:
+                logger.debug("Learning profile for user %s was created concurrently", user_id)
+                # The concurrent writer may have folded in a lesson this backfill missed.
+                profile_doc = await self.backend.get(LEARNING_PROFILES_COLLECTION, user_id) or profile_doc
+        return profile_from_document(profile_doc)
+
+    async def completed_lesson_topics(self) -> List[str]:
+        """The topic of every completed lesson, across all users (offline catalog mining; a full collection scan)."""
+        async with self._io.measure("load_completed_lesson_topics"):
+            documents = await self.backend.query(COMPLETED_LESSONS_COLLECTION, {}, fields=("topic",))
+        return [document["topic"] for document in documents if document.get("topic")]
+
+    # --- Shared lesson content (see app.lesson_cache) ---
+
+    async def load_lesson_content(self, content_id: str) -> Optional[Dict[str, Any]]:
+        async with self._io.measure("load_lesson_content"):
+            return await self.backend.get(LESSON_CONTENT_COLLECTION, content_id)
+
+    async def save_lesson_content(self, content_id: str, document: Dict[str, Any]) -> None:
+        async with self._io.measure("save_lesson_content"):
+            await self.backend.commit([Write("set", LESSON_CONTENT_COLLECTION, content_id, document)])
+
+    async def lesson_content_keys(self) -> List[Dict[str, Any]]:
+        """{"key", "expires_at"} of every cached lesson, for indexing topics at startup."""
+        async with self._io.measure("load_lesson_content_keys"):
+            return await self.backend.query(LESSON_CONTENT_COLLECTION, {}, fields=("key", "expires_at"))
+
+    # --- Diagnostics ---
+
+    async def check_connectivity(self) -> bool:
+        """Writes, reads back and deletes a test document."""
+        try:
+            logger.info("[STORAGE TEST] Testing %s connectivity...", self.backend.name)
+            async with self._io.measure("check_connectivity"):
+                await self.backend.commit([Write("set", LESSONS_COLLECTION, "test_connection", {"test": "data", "timestamp": datetime.now().isoformat()})])
+                document = await self.backend.get(LESSONS_COLLECTION, "test_connection")
+                if document is not None:
+                    logger.debug("[STORAGE TEST] Read test successful: %s", truncate(document))
+                else:
+                    logger.warning("[STORAGE TEST] Read test failed - document not found")
+                await self.backend.commit([Write("delete", LESSONS_COLLECTION, "test_connection")])
+            logger.info("[STORAGE TEST] All %s tests passed!", self.backend.name)
+            return True
+        except Exception as e:
+            logger.exception("[STORAGE TEST] %s connectivity test failed: %s", self.backend.name, e)
+            return False
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {"storage": self.backend.stats(), "lesson_cache": self.lesson_cache.stats()}
+
+
+# Shared by the server and the agent callbacks.
+repository = Repository(create_backend())
@@ -18,8 +18,48 @@ import asyncio
 import base64
 import warnings
 import uuid 
-
-from app.agent import root_agent, load_session_state_from_firestore, test_firestore_connectivity, load_lesson_state_from_firestore, save_lesson_state_to_firestore
+import time
+
+from app.agent import root_agent, bootstrap_session_state, apply_bootstrap_to_session_state, flush_pending_writes, lesson_content_cache
+from app.envelopes import (
+    INTERRUPTED_MESSAGE,
+    TURN_COMPLETE_MESSAGE,
+    dumps,
+    encode_audio,
+    encode_image,
+    encode_markdown,
+    encode_tool_response,
+    encode_ui_feedback,
+)
+from app.logging_utils import AUDIO_LOG, SERVER_LOG, get_logger, shutdown_logging, truncate
+from app.idle import (
+    CLIENT_HEARTBEAT_TIMEOUT_SECONDS,
+    IDLE_PREROLL_MS,
+    LIVE_IDLE_TIMEOUT_SECONDS,
+    ActivityTracker,
+    PreRollBuffer,
+)
+from app.io_supervisor import storage_io
+from app.repository import repository
+from app.metrics import (
+    LIVE_STREAM_RESUME_SECONDS,
+    LIVE_STREAM_SUSPENSIONS_TOTAL,
+    LIVE_STREAMS_SUSPENDED,
+    REGISTRY,
+    SESSION_SETUP_PHASE_SECONDS,
+    SessionMetrics,
+)
+from app.outbound import AUDIO, CONTROL, AudioCoalescer, OutboundQueue, SendQueueOverflow, pcm_bytes_for_ms
+from app.presentation import section_markdown
+from app.admission import ADMISSION_REJECT_CLOSE_CODE, AdmissionController, AdmissionRejected
+from app.audio_frames import (
+    BINARY_AUDIO_TRANSPORT,
+    JSON_AUDIO_TRANSPORT,
+    FrameError,
+    SequenceTracker,
+    decode_media_frame,
+    negotiate_audio_transport,
+)
 from google.adk.sessions import InMemorySessionService
 
 from pathlib import Path
@@ -42,10 +82,10 @@ from google.adk.sessions import VertexAiSessionService
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 from datetime import datetime
 
 
@@ -58,8 +98,13 @@ warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 
 load_dotenv()
 
+logger = get_logger(SERVER_LOG)
+audio_logger = get_logger(AUDIO_LOG)
+
 APP_NAME = os.getenv("APP_NAME")
 main_app_runner = None
+# Limits concurrent live sessions on this instance; see app/admission.py.
+admission = AdmissionController()
 
 
 
@@ -72,12 +117,15 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     global main_app_runner
 
     # Test Firestore connectivity on startup
-    print("Testing Firestore connectivity...")
-    firestore_ok = test_firestore_connectivity()
+    logger.info("Testing Firestore connectivity...")
+    firestore_ok = await repository.check_connectivity()
     if not firestore_ok:
-        print("WARNING: Firestore connectivity test failed! State persistence may not work.")
+        logger.warning("Firestore connectivity test failed! State persistence may not work.")
     else:
-        print("Firestore connectivity test passed.")
+        logger.info("Firestore connectivity test passed.")
+
+    # Make cached lessons findable under differently phrased topics
+    storage_io.spawn(lesson_content_cache.warm(), name="warm_lesson_content_index")
 
     # Use in-memory session service for fast, non-blocking performance
     session_service = InMemorySessionService()
@@ -89,13 +137,20 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         session_service=session_service,
     )
 
-    print("Application startup complete.")
+    logger.info("Application startup complete.")
     yield # This is where the application starts serving requests
 
     # --- Shutdown logic (executed when the application is shutting down) ---
-    print("Application shutdown initiated...")
+    logger.info("Application shutdown initiated...")
+    await flush_pending_writes()
+    await storage_io.drain()
+    await repository.close()
+    logger.info("Storage I/O stats at shutdown: %s", storage_io.stats())
+    logger.info("Repository stats at shutdown: %s", repository.stats())
+    logger.info("Lesson content cache stats at shutdown: %s", lesson_content_cache.stats())
     # Add any cleanup code here if necessary, e.g., closing database connections
-    print("Application shutdown complete.")
+    logger.info("Application shutdown complete.")
+    shutdown_logging()
     
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(
@@ -115,16 +170,15 @@ async def start_agent_session(user_id, is_audio=False):
     if root_agent is None or main_app_runner is None:
         raise RuntimeError("Application not fully initialized. root_agent or session_service is None.")
     
-    print("[DEBUG] InMemoryRunner created.")
-    
     session_service_for_crud = main_app_runner.session_service
+    phase_started = time.monotonic()
     
     try:
         session = await session_service_for_crud.get_session(app_name=APP_NAME if APP_NAME else "kido-app-462308", user_id=user_id, session_id="")
         if session is not None:
-            print(f"[{user_id}] Existing session retrieved with ID: {session.id}")
+            logger.info("[%s] Existing session retrieved with ID: %s", user_id, session.id)
         else:
-            print(f"[{user_id}] Failed to retrieve session for user {user_id}")
+            logger.warning("[%s] Failed to retrieve session for user %s", user_id, user_id)
             raise RuntimeError(f"Session retrieval failed for user {user_id}")
     except Exception:
         session = await session_service_for_crud.create_session(
@@ -132,22 +186,51 @@ async def start_agent_session(user_id, is_audio=False):
             user_id=user_id,
             session_id="",
         )
-        print(f"[{user_id}] New session created with ID: {session.id}")
+        logger.info("[%s] New session created with ID: %s", user_id, session.id)
+
+    session_seconds = time.monotonic() - phase_started
 
     # --- Restore state from Firestore if available ---
-    restored_state = load_session_state_from_firestore(APP_NAME, user_id)
+    # Session state, lesson state and the learning profile are fetched concurrently
+    # off the event loop, so the callbacks never have to read Firestore themselves.
+    phase_started = time.monotonic()
+    restored_state, lesson_state, learning_profile, fetch_timings = await bootstrap_session_state(APP_NAME if APP_NAME else "kido-app-462308", user_id)
+    apply_bootstrap_to_session_state(session.state, user_id, session.id, restored_state, lesson_state, learning_profile)
+    bootstrap_seconds = time.monotonic() - phase_started
     if restored_state:
-        print(f"[RESTORE] Restoring session state from Firestore for user_id={user_id}")
-        session.state.update(restored_state)
-        # Ensure user_id is not overwritten by restored state
-        session.state['user_id'] = user_id
-        print(f"[RESTORE] Ensured user_id is set in session state: {session.state.get('user_id')}")
+        logger.info("[RESTORE] Restored session state from Firestore for user_id=%s", user_id)
     else:
-        print(f"[RESTORE] No existing state found for user_id={user_id}")
-        # Ensure user_id is set even if no restored state
-        session.state['user_id'] = user_id
-        print(f"[RESTORE] Set user_id in session state: {session.state.get('user_id')}")
-
+        logger.info("[RESTORE] No existing state found for user_id=%s", user_id)
+    if lesson_state and lesson_state.get("current_lesson_plan"):
+        logger.info("[RESTORE] Restored in-progress lesson for user_id=%s", user_id)
+
+    # run_live returns its event generator without waiting for the model, so the
+    # run_live phase is recorded when the first event arrives.
+    live_events, live_request_queue = start_live_stream(session)
+    live_events = _observe_run_live_phase(live_events, user_id, time.monotonic())
+
+    timings = {"session": session_seconds, "bootstrap": bootstrap_seconds}
+    timings.update({f"bootstrap_{fetch}": seconds for fetch, seconds in fetch_timings.items()})
+    for phase, seconds in timings.items():
+        SESSION_SETUP_PHASE_SECONDS.observe(seconds, phase=phase)
+    logger.info("[%s] Session setup timings: %s", user_id, {phase: round(seconds, 4) for phase, seconds in timings.items()})
+    return session, live_events, live_request_queue
+
+
+async def _observe_run_live_phase(live_events, user_id, started_at):
+    """Passes live_events through, observing the time from stream start to the first event as the run_live phase."""
+    first_event = True
+    async for event in live_events:
+        if first_event:
+            first_event = False
+            seconds = time.monotonic() - started_at
+            SESSION_SETUP_PHASE_SECONDS.observe(seconds, phase="run_live")
+            logger.info("[%s] First live event after %.4fs (run_live phase)", user_id, seconds)
+        yield event
+
+
+def start_live_stream(session, live_request_queue=None):
+    """Opens a run_live model stream on an existing session. Used at setup and when resuming an idle connection."""
     # Set response modality
     # modality = "AUDIO" if is_audio else "TEXT"
     
@@ -155,10 +238,11 @@ async def start_agent_session(user_id, is_audio=False):
 
     run_config = RunConfig(response_modalities=[modality])
     
-    print(f"[DEBUG] RunConfig created. Set response modality to: {modality}")
+    logger.debug("RunConfig created. Set response modality to: %s", modality)
 
     # Create a LiveRequestQueue for this session
-    live_request_queue = LiveRequestQueue()
+    if live_request_queue is None:
+        live_request_queue = LiveRequestQueue()
 
     # Start agent session
     live_events = main_app_runner.run_live(
@@ -166,185 +250,391 @@ async def start_agent_session(user_id, is_audio=False):
         live_request_queue=live_request_queue,
         run_config=run_config,
     )
-    print("[DEBUG] runner.run_live called. Expecting live_events stream.")
-    return main_app_runner, live_events, live_request_queue
+    logger.debug("runner.run_live called. Expecting live_events stream.")
+    return live_events, live_request_queue
 
 
-async def agent_to_client_messaging(websocket: WebSocket, live_events):
+async def _send_audio_frames(outbound: OutboundQueue, frames):
+    """Sends coalesced audio frames as serverContent messages with one audio part each."""
+    for audio_data, mime_type in frames:
+        await outbound.put(encode_audio(audio_data, mime_type), kind=AUDIO)
+        audio_logger.info("[AGENT TO CLIENT] Queued audio/pcm message (%d bytes).", len(audio_data))
+
+
+async def agent_to_client_messaging(websocket: WebSocket, live_events, outbound: OutboundQueue, session_metrics: SessionMetrics, activity: Optional[ActivityTracker] = None, session=None):
     """
     Handles communication from the ADK agent to the client WebSocket.
-    It streams events from the agent and sends structured messages back to the client
-    as individual JSON objects.
+    It streams events from the agent and queues structured messages for the client
+    as individual JSON objects; the connection's writer task does the actual sends.
+    Consecutive audio parts are coalesced into larger frames; the buffer is flushed
+    before any non-audio message so ordering is kept. Control messages
+    (interrupted, turnComplete, ui_feedback) jump ahead of queued audio, and an
+    interruption discards the audio still queued for the interrupted turn.
+    Lesson sections are shown by index: the markdown is looked up in the
+    session's parsed_section_markdowns, never carried by the model.
     """
-    print("[DEBUG] agent_to_client_messaging task started. Awaiting events from agent.")
+    logger.debug("agent_to_client_messaging task started. Awaiting events from agent.")
+    coalescer = AudioCoalescer()
     try:
         async for event in live_events:
-            # print(f"[AGENT TO CLIENT] Processing ADK event:", event)
+            # logger.debug("[AGENT TO CLIENT] Processing ADK event: %s", event)
+            session_metrics.on_live_event()
+            if activity is not None:
+                activity.on_activity()
 
             # Process content parts
             if event.content and event.content.parts:
                 for part in event.content.parts:
-                    # Handle inline_data (audio) - sent as a serverContent message with one audio part
-                    if part.inline_data:
-                        if part.inline_data.mime_type.startswith("audio/pcm"):
-                            audio_data = part.inline_data.data
-                            if audio_data:
-                                audio_message = {
-                                    "serverContent": {
-                                        "modelTurn": {
-                                            "parts": [{
-                                                "inlineData": {
-                                                    "data": base64.b64encode(audio_data).decode("ascii"),
-                                                    "mimeType": part.inline_data.mime_type
-                                                }
-                                            }]
-                                        }
-                                    }
-                                }
-                                await websocket.send_bytes(json.dumps(audio_message).encode('utf-8'))
-                                print(f"[AGENT TO CLIENT]: Sent individual audio/pcm message ({len(audio_data)} bytes).")
-
-                    elif part.function_call:
+                    # Handle inline_data (audio) - buffered and sent as serverContent audio messages
+                    if part.inline_data and part.inline_data.mime_type.startswith("audio/pcm"):
+                        audio_data = part.inline_data.data
+                        if audio_data:
+                            session_metrics.on_model_audio()
+                            await _send_audio_frames(outbound, coalescer.add(audio_data, part.inline_data.mime_type))
+                        continue
+
+                    # Anything that is not audio must not overtake buffered audio.
+                    await _send_audio_frames(outbound, coalescer.flush())
+
+                    if part.function_call:
                         tool_name = part.function_call.name
                         tool_args = part.function_call.args
-                        print(f"[AGENT TO CLIENT]: Detected function call for tool '{tool_name}' with args: {tool_args}")
+                        session_metrics.on_tool_call(tool_name, part.function_call.id)
+                        logger.info("[AGENT TO CLIENT] Detected function call for tool '%s' with args: %s", tool_name, truncate(tool_args))
                         
                         # Handle the dedicated UI feedback signal tool
                         if tool_name == "signal_ui_feedback_func":
-                            status_message = {
-                                "ui_feedback": {
-                                    "status": tool_args.get("status", "thinking"),
-                                    "message": tool_args.get("message", "Please wait...")
-                                }
-                            }
-                            await websocket.send_bytes(json.dumps(status_message).encode('utf-8'))
-                            print(f"[AGENT TO CLIENT]: Sent UI feedback from signal tool: {status_message}.")
+                            status = tool_args.get("status", "thinking")
+                            message = tool_args.get("message", "Please wait...")
+                            await outbound.put(encode_ui_feedback(status, message), kind=CONTROL)
+                            logger.info("[AGENT TO CLIENT] Sent UI feedback from signal tool: status='%s', message='%s'.", status, message)
                         
                         # Handle feedback for other long-running tools
                         elif tool_name == "lesson_creation_workflow":
-                            status_message = {
-                                "ui_feedback": {
-                                    "status": "thinking",
-                                    "message": "I'm planning a new lesson for you..."
-                                }
-                            }
-                            await websocket.send_bytes(json.dumps(status_message).encode('utf-8'))
-                            print(f"[AGENT TO CLIENT]: Sent UI feedback message: {status_message}.")
+                            message = "I'm planning a new lesson for you..."
+                            await outbound.put(encode_ui_feedback("thinking", message), kind=CONTROL)
+                            logger.info("[AGENT TO CLIENT] Sent UI feedback message: '%s'.", message)
 
                     # Handle function_response
                     elif part.function_response:
                         tool_name = part.function_response.name
                         tool_output = part.function_response.response
+                        session_metrics.on_tool_response(tool_name, part.function_response.id)
 
-                        print(
-                            f"[AGENT TO CLIENT]: Processing function response for tool '{tool_name}' with output: {tool_output}"
+                        logger.debug(
+                            "[AGENT TO CLIENT] Processing function response for tool '%s' with output: %s", tool_name, truncate(tool_output)
                         )
                         
                         # --- Special handling for image tool response: Send custom "image" JSON object ---
                         if tool_name == "generate_image_with_imagen" and isinstance(tool_output, dict) and "image_url" in tool_output:
                             image_url = tool_output["image_url"]
                             image_alt = tool_output.get("status", "Generated image")
-                            image_message = {
-                                "image": {  # Custom top-level key for image
-                                    "url": image_url,
-                                    "alt": image_alt
-                                }
-                            }
-                            await websocket.send_bytes(json.dumps(image_message).encode('utf-8'))
-                            print(f"[AGENT TO CLIENT]: Sent custom image message: {image_message}.")
-                        elif tool_name == "send_current_section_markdown_tool" and isinstance(tool_output, dict):
-                            markdown_message = {
-                                "markdown": {
-                                    "sectionIndex": tool_output.get("section_index"),
-                                    "content": tool_output.get("markdown_content", "")
-                                }
-                            }
-                            await websocket.send_bytes(json.dumps(markdown_message).encode('utf-8'))
-                            print(f"[AGENT TO CLIENT]: Sent section markdown message: {markdown_message}.")
+                            await outbound.put(encode_image(image_url, image_alt))
+                            logger.info("[AGENT TO CLIENT] Sent custom image message: %s.", image_url)
+                        elif tool_name == "show_lesson_section_func" and isinstance(tool_output, dict):
+                            section_index = tool_output.get("section_index")
+                            parsed_markdowns = session.state.get("parsed_section_markdowns") if session is not None else None
+                            markdown_content = section_markdown(parsed_markdowns, section_index) if tool_output.get("status") == "success" else None
+                            if markdown_content is not None:
+                                await outbound.put(encode_markdown(section_index, markdown_content))
+                                logger.info("[AGENT TO CLIENT] Sent section %s markdown message (%d chars).", section_index, len(markdown_content))
+                            else:
+                                logger.warning("[AGENT TO CLIENT] No stored markdown to show for section %s.", section_index)
                             # Skip generic toolResponse for this helper tool
                         else:
                             # --- Default handling for all other tool responses: Send "toolResponse" JSON object ---
                             # This matches the existing isToolResponseMessage type expected by MultimodalLiveClient
-                            tool_response_message = {
-                                "toolResponse": {
-                                    "functionResponses": [ # Even if it's one, it expects an array
-                                        {
-                                            "name": tool_name,
-                                            "response": tool_output,
-                                            "id": part.function_response.id # Include ID if present
-                                        }
-                                    ]
-                                }
-                            }
-                            await websocket.send_bytes(json.dumps(tool_response_message).encode('utf-8'))
-                            print(f"[AGENT TO CLIENT]: Sent generic tool response message: {tool_response_message}.")
+                            # Even if it's one, it expects an array; include ID if present
+                            await outbound.put(encode_tool_response(tool_name, tool_output, part.function_response.id))
+                            logger.info("[AGENT TO CLIENT] Sent generic tool response message for '%s'.", tool_name)
+
+            if event.turn_complete or event.interrupted:
+                session_metrics.on_turn_end()
+
+            if event.interrupted:
+                # Stale speech from the interrupted turn must not reach the client.
+                coalescer.discard()
+            elif event.turn_complete:
+                await _send_audio_frames(outbound, coalescer.flush())
 
             # Send turnComplete/interrupted as separate, dedicated messages after all content parts
             if event.turn_complete:
-                turn_complete_message = {
-                    "serverContent": { # These flags are part of serverContent structure
-                        "turnComplete": True,
-                        "modelTurn": {"parts": []} # Empty parts array for control messages
-                    }
-                }
-                await websocket.send_bytes(json.dumps(turn_complete_message).encode('utf-8'))
-                print("[AGENT TO CLIENT]: Sent turnComplete message.")
+                await outbound.put(TURN_COMPLETE_MESSAGE, kind=CONTROL)
+                logger.info("[AGENT TO CLIENT] Sent turnComplete message.")
 
             if event.interrupted:
-                interrupted_message = {
-                    "serverContent": { # These flags are part of serverContent structure
-                        "interrupted": True,
-                        "modelTurn": {"parts": []} # Empty parts array for control messages
-                    }
-                }
-                await websocket.send_bytes(json.dumps(interrupted_message).encode('utf-8'))
-                print("[AGENT TO CLIENT]: Sent interrupted message.")
-
+                discarded = await outbound.put_interrupt(INTERRUPTED_MESSAGE)
+                logger.info("[AGENT TO CLIENT] Sent interrupted message, discarded %d queued audio message(s).", discarded)
+
+        await _send_audio_frames(outbound, coalescer.flush())
+        # Let the writer deliver everything before this task completes.
+        await outbound.join()
+    except SendQueueOverflow as e:
+        logger.warning("Client too slow, disconnecting: %s", e)
+        await websocket.close(code=4008, reason="Client too slow")
     except Exception as e:
-        print(f"[ERROR] Agent to client messaging failed: {e}")
+        logger.exception("Agent to client messaging failed: %s", e)
         raise
+    finally:
+        logger.info(
+            "[AGENT TO CLIENT] Audio coalescing sent %d frame(s) for %d part(s), saved %d.",
+            coalescer.frames_out, coalescer.parts_in, coalescer.frames_saved,
+        )
+
 
+def _queue_position_feedback(position, eta_seconds):
+    minutes = max(1, round(eta_seconds / 60))
+    return encode_ui_feedback(
+        "queued",
+        f"Lots of friends are learning right now! You're number {position} in line, about {minutes} min.",
+    )
+
+
+# Microphone audio format, used to size the idle pre-roll buffer.
+USER_AUDIO_MIME_TYPE = "audio/pcm;rate=16000"
+# How often LiveStream.run() checks for idleness and silent clients.
+IDLE_CHECK_INTERVAL_SECONDS = 1.0
 
-async def client_to_agent_messaging(websocket, live_request_queue):
-    """Client to agent communication"""
-    print("[DEBUG] client_to_agent_messaging task started. Waiting for client messages.")
+
+class LiveStream:
+    """
+    The model side of one connection: a run_live stream and the task that
+    relays its events to the client.
+
+    When neither the child nor the model has been active for
+    LIVE_IDLE_TIMEOUT_SECONDS the stream is torn down and its admission slot
+    released, while the WebSocket stays open. The next voice or typed input
+    starts a new stream on the same ADK session, so the conversation state is
+    intact. Client message handlers use it like a LiveRequestQueue.
+    """
+
+    def __init__(self, websocket, session, outbound, session_metrics, activity, live_events, live_request_queue, admission_ticket):
+        self.websocket = websocket
+        self.session = session
+        self.outbound = outbound
+        self.session_metrics = session_metrics
+        self.activity = activity
+        self.live_request_queue = live_request_queue
+        self._admission_ticket = admission_ticket
+        self._preroll = PreRollBuffer(pcm_bytes_for_ms(USER_AUDIO_MIME_TYPE, IDLE_PREROLL_MS))
+        self._resume_requested = asyncio.Event()
+        self._task = None
+        self._counted_suspended = False
+        self.suspensions = 0
+        self._start(live_events)
+
+    @property
+    def suspended(self):
+        return self.live_request_queue is None
+
+    def _start(self, live_events):
+        self._task = asyncio.create_task(
+            agent_to_client_messaging(self.websocket, live_events, self.outbound, self.session_metrics, self.activity, self.session)
+        )
+
+    def _request_resume(self):
+        if self.live_request_queue is None:
+            # Input is queued right away and consumed once the new stream is up.
+            self.live_request_queue = LiveRequestQueue()
+            for data, mime_type in self._preroll.drain():
+                self.live_request_queue.send_realtime(Blob(data=data, mime_type=mime_type))
+        self._resume_requested.set()
+
+    def send_realtime(self, blob):
+        voice = blob.mime_type.startswith("audio/") and self.activity.on_audio(blob.data)
+        if voice:
+            self.session_metrics.on_user_audio()
+        if self.suspended:
+            if not voice:
+                if blob.mime_type.startswith("audio/"):
+                    self._preroll.add(blob.data, blob.mime_type)
+                return
+            self._request_resume()
+        self.live_request_queue.send_realtime(blob)
+
+    def send_content(self, content):
+        self.activity.on_activity()
+        if self.suspended:
+            self._request_resume()
+        self.live_request_queue.send_content(content=content)
+
+    async def _stop_task(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _suspend(self):
+        logger.info("[IDLE] Suspending live stream for session %s after %.0fs idle.", self.session.id, self.activity.idle_seconds())
+        self.live_request_queue.close()
+        self.live_request_queue = None
+        await self._stop_task()
+        self.session_metrics.on_turn_end()
+        if self._admission_ticket is not None:
+            admission.release(self._admission_ticket)
+            self._admission_ticket = None
+        self.suspensions += 1
+        LIVE_STREAM_SUSPENSIONS_TOTAL.inc()
+        LIVE_STREAMS_SUSPENDED.inc()
+        self._counted_suspended = True
+
+    async def _send_queue_position(self, position, eta_seconds):
+        await self.outbound.put(_queue_position_feedback(position, eta_seconds), kind=CONTROL)
+
+    async def _resume(self):
+        """Returns False if the connection was shed while waiting for a slot."""
+        self._resume_requested.clear()
+        started = time.monotonic()
+        try:
+            self._admission_ticket = await admission.acquire(self._send_queue_position)
+        except AdmissionRejected as e:
+            logger.warning("[IDLE] Cannot resume live stream for session %s (%s).", self.session.id, e.reason)
+            await self.websocket.close(code=ADMISSION_REJECT_CLOSE_CODE, reason="Server busy, retry later")
+            return False
+        live_events, _ = start_live_stream(self.session, self.live_request_queue)
+        self._start(live_events)
+        self.activity.on_activity()
+        LIVE_STREAMS_SUSPENDED.dec()
+        self._counted_suspended = False
+        LIVE_STREAM_RESUME_SECONDS.observe(time.monotonic() - started)
+        logger.info("[IDLE] Resumed live stream for session %s.", self.session.id)
+        return True
+
+    async def run(self):
+        """
+        Supervises the stream until it ends on its own, the client stops
+        sending anything (heartbeats included), or a resume is shed.
+        Run as its own task for the lifetime of the connection.
+        """
+        try:
+            while True:
+                if self._task is not None:
+                    done, _ = await asyncio.wait({self._task}, timeout=IDLE_CHECK_INTERVAL_SECONDS)
+                    if done:
+                        self._task.result()
+                        return
+                    if LIVE_IDLE_TIMEOUT_SECONDS > 0 and self.activity.idle_seconds() >= LIVE_IDLE_TIMEOUT_SECONDS:
+                        await self._suspend()
+                elif self._resume_requested.is_set():
+                    if not await self._resume():
+                        return
+                else:
+                    try:
+                        await asyncio.wait_for(self._resume_requested.wait(), IDLE_CHECK_INTERVAL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                if self.activity.silent_seconds() >= CLIENT_HEARTBEAT_TIMEOUT_SECONDS:
+                    logger.info("[IDLE] Nothing received from the client for %.0fs, closing.", self.activity.silent_seconds())
+                    return
+        finally:
+            await self._stop_task()
+
+    def close(self):
+        if self.live_request_queue is not None:
+            self.live_request_queue.close()
+        if self._counted_suspended:
+            LIVE_STREAMS_SUSPENDED.dec()
+            self._counted_suspended = False
+        if self._admission_ticket is not None:
+            admission.release(self._admission_ticket)
+            self._admission_ticket = None
+
+
+def _handle_client_json_message(message, live_input):
+    """
+    Forwards a JSON client message (realtimeInput or clientContent) to the agent.
+    `live_input` is a LiveRequestQueue or anything with the same send methods (LiveStream).
+    """
+    if "realtimeInput" in message:
+        # IMPORTANT FIX: Access data from the first item in 'mediaChunks' array
+        media_chunks = message["realtimeInput"].get("mediaChunks")
+        if media_chunks and isinstance(media_chunks, list) and len(media_chunks) > 0:
+            first_chunk = media_chunks[0]
+            base64_data = first_chunk.get("data")
+            mime_type = first_chunk.get("mimeType", "audio/pcm") # Default to pcm if not specified
+
+            if base64_data:
+                decoded = base64.b64decode(base64_data)
+                live_input.send_realtime(
+                    Blob(data=decoded, mime_type=mime_type)
+                )
+                audio_logger.info("[CLIENT TO AGENT] Sent realtime audio to agent queue (length: %d bytes).", len(decoded))
+        else:
+            logger.warning("'realtimeInput' received without valid 'mediaChunks': %s", truncate(message))
+    elif "clientContent" in message:
+        text_data = message["clientContent"]
+        if text_data:
+            content = Content(role="user", parts=[Part.from_text(text=text_data)])
+            live_input.send_content(content=content)
+            logger.info("[CLIENT TO AGENT] Sent text content to agent queue: '%s'", truncate(text_data))
+    else:
+        logger.warning("Unexpected format from client: %s", truncate(message))
+
+
+def _handle_client_binary_frame(frame, live_input, sequence_tracker):
+    """Forwards a binary media frame (see app.audio_frames) to the agent queue."""
+    try:
+        media = decode_media_frame(frame)
+    except FrameError as e:
+        logger.warning("Dropping malformed binary frame (%d bytes): %s", len(frame), e)
+        return
+    skipped = sequence_tracker.observe(media.sequence)
+    if skipped:
+        audio_logger.warning("%d binary audio frame(s) missing before sequence %d", skipped, media.sequence)
+    live_input.send_realtime(Blob(data=media.data, mime_type=media.mime_type))
+
+
+async def _handle_client_text(text, live_input, outbound):
+    message = json.loads(text)
+    if "ping" in message:
+        # Application-level heartbeat, see app/idle.py. Not forwarded to the agent.
+        await outbound.put(dumps({"pong": message["ping"]}), kind=CONTROL)
+        return
+    _handle_client_json_message(message, live_input)
+
+
+async def client_to_agent_messaging(websocket, live_input, outbound, session_metrics, activity, audio_transport=JSON_AUDIO_TRANSPORT):
+    """
+    Client to agent communication.
+    In binary audio mode, microphone chunks arrive as binary frames and any
+    text frame is still treated as a JSON message.
+    """
+    logger.debug("client_to_agent_messaging task started (%s audio). Waiting for client messages.", audio_transport)
     try:
+        if audio_transport != BINARY_AUDIO_TRANSPORT:
+            while True:
+                text = await websocket.receive_text()
+                activity.on_message()
+                session_metrics.on_bytes_in(len(text.encode("utf-8")))
+                await _handle_client_text(text, live_input, outbound)
+
+        sequence_tracker = SequenceTracker()
         while True:
-            message = await websocket.receive_json()
-            # print(f"[CLIENT TO AGENT] Received from client: {message}")
-
-            if "realtimeInput" in message:
-                # IMPORTANT FIX: Access data from the first item in 'mediaChunks' array
-                media_chunks = message["realtimeInput"].get("mediaChunks")
-                if media_chunks and isinstance(media_chunks, list) and len(media_chunks) > 0:
-                    first_chunk = media_chunks[0]
-                    base64_data = first_chunk.get("data")
-                    mime_type = first_chunk.get("mimeType", "audio/pcm") # Default to pcm if not specified
-
-                    if base64_data:
-                        decoded = base64.b64decode(base64_data)
-                        live_request_queue.send_realtime(
-                            Blob(data=decoded, mime_type=mime_type)
-                        )
-                        print(f"[CLIENT TO AGENT] Sent realtime audio to agent queue (length: {len(decoded)} bytes).")
-                else:
-                    print(f"[WARN] 'realtimeInput' received without valid 'mediaChunks': {message}")
-            elif "clientContent" in message:
-                text_data = message["clientContent"]
-                if text_data:
-                    content = Content(role="user", parts=[Part.from_text(text=text_data)])
-                    live_request_queue.send_content(content=content)
-                    print(f"[CLIENT TO AGENT] Sent text content to agent queue: '{text_data}'")
-            else:
-                print(f"[WARN] Unexpected format from client: {message}")
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            activity.on_message()
+            frame = message.get("bytes")
+            if frame is not None:
+                session_metrics.on_bytes_in(len(frame))
+                _handle_client_binary_frame(frame, live_input, sequence_tracker)
+            elif message.get("text") is not None:
+                session_metrics.on_bytes_in(len(message["text"].encode("utf-8")))
+                await _handle_client_text(message["text"], live_input, outbound)
 
     except WebSocketDisconnect:
-        print("[CLIENT TO AGENT] WebSocket disconnected gracefully.")
+        logger.info("[CLIENT TO AGENT] WebSocket disconnected gracefully.")
     except Exception as e:
-        print(f"[ERROR] Client message handling failed: {e}")
+        logger.exception("Client message handling failed: %s", e)
         raise
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the live-path metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """Client websocket endpoint"""
@@ -352,51 +642,82 @@ async def websocket_endpoint(websocket: WebSocket):
     is_audio_flag = True
     # Wait for client connection
     await websocket.accept()
-    print("Client connected")
+    logger.info("Client connected")
 
     # We'll get user_id from the setup message
     user_id = None
     
     # Start tasks
-    agent_to_client_task = None
     client_to_agent_task = None
+    live_stream = None
+    outbound = None
+    outbound_writer_task = None
+    session_metrics = None
+    admission_ticket = None
     
     try:
         # Wait for setup message to get user_id
         setup_message = await websocket.receive_json()
+        setup_at = time.monotonic()
         if "setup" in setup_message:
             user_id = setup_message["setup"].get("user_id")
             run_id = setup_message["setup"].get("run_id")
-            print(f"[SETUP] run_id={run_id}, user_id={user_id}")
-            print(f"[SETUP DEBUG] user_id type: {type(user_id)}, length: {len(str(user_id)) if user_id else 0}")
+            audio_transport = negotiate_audio_transport(setup_message["setup"])
+            logger.info("[SETUP] run_id=%s, user_id=%s, audio_transport=%s", run_id, user_id, audio_transport)
             
             if not user_id:
-                print("[ERROR] No user_id provided in setup message")
+                logger.error("No user_id provided in setup message")
                 await websocket.close(code=4000, reason="No user_id provided")
                 return
         else:
-            print("[ERROR] No setup message received")
+            logger.error("No setup message received")
             await websocket.close(code=4000, reason="No setup message")
             return
 
-        print(f"Client #{user_id} connected")
+        logger.info("Client #%s connected", user_id)
+        # Created before admission so queue-position messages count as bytes out too.
+        session_metrics = SessionMetrics(setup_at)
+
+        async def send_and_count(payload):
+            await websocket.send_bytes(payload)
+            session_metrics.on_bytes_out(len(payload))
+
+        async def send_queue_position(position, eta_seconds):
+            await send_and_count(_queue_position_feedback(position, eta_seconds))
+
+        try:
+            admission_ticket = await admission.acquire(send_queue_position)
+        except AdmissionRejected as e:
+            logger.warning("[ADMISSION] Rejecting client #%s (%s): %s", user_id, e.reason, admission.stats())
+            await websocket.close(code=ADMISSION_REJECT_CLOSE_CODE, reason="Server busy, retry later")
+            return
 
         # Start agent session
         user_id_str = str(user_id)
-        print(f"[SETUP DEBUG] Converting user_id to string: '{user_id}' -> '{user_id_str}'")
-        runner, live_events, live_request_queue = await start_agent_session(user_id_str, is_audio=is_audio_flag)
+        session, live_events, live_request_queue = await start_agent_session(user_id_str, is_audio=is_audio_flag)
+
+        if audio_transport == BINARY_AUDIO_TRANSPORT:
+            # Acknowledge the negotiated transport so the client can switch to binary frames.
+            await send_and_count(dumps({"setupComplete": {"audioTransport": audio_transport}}))
 
         # Start tasks
-        agent_to_client_task = asyncio.create_task(
-            agent_to_client_messaging(websocket, live_events)
+        activity = ActivityTracker()
+
+        outbound = OutboundQueue(send_and_count, on_barge_in=session_metrics.on_barge_in)
+        outbound_writer_task = asyncio.create_task(outbound.run())
+        # From here on the live stream owns the admission slot.
+        live_stream = LiveStream(
+            websocket, session, outbound, session_metrics, activity, live_events, live_request_queue, admission_ticket
         )
+        admission_ticket = None
+        live_stream_task = asyncio.create_task(live_stream.run())
         client_to_agent_task = asyncio.create_task(
-            client_to_agent_messaging(websocket, live_request_queue)
+            client_to_agent_messaging(websocket, live_stream, outbound, session_metrics, activity, audio_transport)
         )
         
         # Wait until one of the tasks finishes (e.g., client disconnects)
         done, pending = await asyncio.wait(
-            [agent_to_client_task, client_to_agent_task],
+            [live_stream_task, client_to_agent_task, outbound_writer_task],
             return_when=asyncio.FIRST_COMPLETED
         )
         for task in pending:
@@ -404,11 +725,25 @@ async def websocket_endpoint(websocket: WebSocket):
         await asyncio.gather(*pending, return_exceptions=True) # Await cancellation
         
     except WebSocketDisconnect:
-        print(f"Client #{user_id} WebSocket disconnected gracefully.")
+        logger.info("Client #%s WebSocket disconnected gracefully.", user_id)
     except Exception as e:
-        print(f"Unhandled error in websocket_endpoint for client #{user_id}: {e}")
+        logger.exception("Unhandled error in websocket_endpoint for client #%s: %s", user_id, e)
     finally:
-        # Close LiveRequestQueue when connection ends
-        if 'live_request_queue' in locals():
+        # Close the live stream (or the LiveRequestQueue, if setup failed before it existed)
+        if live_stream is not None:
+            live_stream.close()
+            if live_stream.suspensions:
+                logger.info("[IDLE] Client #%s live stream was suspended %d time(s).", user_id, live_stream.suspensions)
+        elif 'live_request_queue' in locals():
             live_request_queue.close()
-        print(f"Client #{user_id} disconnected and resources cleaned up.")
\ No newline at end of file
+        if outbound is not None:
+            await outbound.close()
+            logger.info("[OUTBOUND] Client #%s send queue stats: %s", user_id, outbound.stats())
+        if session_metrics is not None:
+            logger.info("[METRICS] Client #%s session summary: %s", user_id, session_metrics.close())
+        if admission_ticket is not None:
+            admission.release(admission_ticket)
+        if user_id:
+            # Don't leave this user's last state sitting in a debounce window.
+            await flush_pending_writes(str(user_id))
+        logger.info("Client #%s disconnected and resources cleaned up.", user_id)
\ No newline at end of file
@@ -0,0 +1,410 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Document storage backends for the state repository (app/repository.py).
+
+The repository only needs a small document store: JSON-like dicts addressed
+by (collection, document id), atomic multi-document commits, equality +
+order-by queries and read-modify-write transactions. Implementations:
+
+  firestore  Cloud Firestore (app/firestore_backend.py), used in production
+  memory     in-process dicts, optionally with injected latency, for load
+             tests and profiling the callback flow on a laptop
+  sqlite     a local SQLite file, for running the app without cloud credentials
+
+STORAGE_BACKEND selects one. Every backend counts the RPCs it serves.
+"""
+
+import abc
+import asyncio
+import collections
+import copy
+import functools
+import json
+import math
+import os
+import random
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+# --- Configurable constants ---
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore")
+SQLITE_STORAGE_PATH = os.getenv("SQLITE_STORAGE_PATH", "kido_state.sqlite3")
+# Injected per-RPC latency for the memory backend: lognormal with this median and p99. 0 disables.
+MEMORY_STORAGE_LATENCY_MS = float(os.getenv("MEMORY_STORAGE_LATENCY_MS", "0"))
+MEMORY_STORAGE_LATENCY_P99_MS = float(os.getenv("MEMORY_STORAGE_LATENCY_P99_MS", "0"))
+
+# Read-modify-write attempts before giving up on a contended document.
+TRANSACTION_MAX_ATTEMPTS = 5
+
+# z-score of the 99th percentile of a standard normal distribution.
+_Z_P99 = 2.3263
+
+DocumentKey = Tuple[str, str]
+
+
+class StorageError(Exception):
+    """Base class for backend-neutral storage errors."""
+
+
+class DocumentNotFound(StorageError):
+    """An update targeted a document that does not exist."""
+
+
+class DocumentExists(StorageError):
+    """A create targeted a document that already exists."""
+
+
+class TransactionContention(StorageError):
+    """A read-modify-write kept losing to concurrent writers."""
+
+
+class Write(NamedTuple):
+    """One write in an atomic commit. `op` is "set", "update" (top-level field merge), "create" or "delete"."""
+
+    op: str
+    collection: str
+    doc_id: str
+    data: Optional[Dict[str, Any]] = None
+
+
+def apply_writes(writes: Sequence[Write], current: Callable[[str, str], Optional[Dict[str, Any]]]) -> Dict[DocumentKey, Optional[Dict[str, Any]]]:
+    """
+    Resolves `writes` against the documents returned by `current` and returns
+    the resulting document per key (None = deleted). Raises DocumentNotFound /
+    DocumentExists without side effects, so a caller can apply all or nothing.
+    """
+    results: Dict[DocumentKey, Optional[Dict[str, Any]]] = {}
+    for write in writes:
+        key = (write.collection, write.doc_id)
+        existing = results[key] if key in results else current(*key)
+        if write.op == "set":
+            results[key] = dict(write.data or {})
+        elif write.op == "update":
+            if existing is None:
+                raise DocumentNotFound(f"{write.collection}/{write.doc_id}")
+            results[key] = {**existing, **(write.data or {})}
+        elif write.op == "create":
+            if existing is not None:
+                raise DocumentExists(f"{write.collection}/{write.doc_id}")
+            results[key] = dict(write.data or {})
+        elif write.op == "delete":
+            results[key] = None
+        else:
+            raise ValueError(f"Unknown write op {write.op!r}")
+    return results
+
+
+def project(document: Mapping[str, Any], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return dict(document)
+    return {name: document[name] for name in fields if name in document}
+
+
+class LatencyModel:
+    """Lognormal per-RPC latency with the given median and 99th percentile, in milliseconds."""
+
+    def __init__(self, median_ms: float, p99_ms: float = 0.0):
+        self.median_ms = median_ms
+        self.p99_ms = max(p99_ms, median_ms)
+        self._mu = math.log(median_ms) if median_ms > 0 else 0.0
+        self._sigma = math.log(self.p99_ms / median_ms) / _Z_P99 if median_ms > 0 else 0.0
+
+    def sample_seconds(self, rng: random.Random) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return rng.lognormvariate(self._mu, self._sigma) / 1000
+
+
+class StorageBackend(abc.ABC):
+    """Async document store used by the repository. Documents are returned as fresh dicts."""
+
+    name = "abstract"
+
+    def __init__(self) -> None:
+        self.rpcs: "collections.Counter[str]" = collections.Counter()
+
+    def _count(self, op: str) -> None:
+        self.rpcs[op] += 1
+
+    @abc.abstractmethod
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """The document, or None if it does not exist."""
+
+    @abc.abstractmethod
+    async def commit(self, writes: Sequence[Write]) -> None:
+        """Applies all writes atomically."""
+
+    @abc.abstractmethod
+    async def query(
+        self,
+        collection: str,
+        where: Mapping[str, Any],
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        start_after: Any = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Documents whose fields equal `where`, ordered by `order_by` (documents
+        without it are skipped) and resuming after the `start_after` value of
+        that field. `fields` projects the result.
+        """
+
+    @abc.abstractmethod
+    async def read_modify_write(
+        self, collection: str, doc_id: str, mutate: Callable[[Optional[Dict[str, Any]]], Awaitable[Sequence[Write]]]
+    ) -> None:
+        """
+        Reads a document, awaits `mutate(document)` for the writes to make and
+        commits them atomically, provided the document did not change in
+        between; otherwise retries. `mutate` may run more than once.
+        """
+
+    async def close(self) -> None:  # noqa: B027 - a no-op unless the backend holds resources
+        """Releases the backend's connections and threads."""
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "rpcs": dict(self.rpcs)}
+
+
+class VersionedBackend(StorageBackend):
+    """
+    A backend that implements read_modify_write with optimistic concurrency:
+    documents carry a version, and a commit is refused if the version it was
+    based on is no longer current.
+    """
+
+    async def read_modify_write(self, collection, doc_id, mutate) -> None:
+        for _ in range(TRANSACTION_MAX_ATTEMPTS):
+            document, version = await self._get_versioned(collection, doc_id)
+            writes = await mutate(document)
+            if await self._commit_if_unchanged((collection, doc_id), version, writes):
+                return
+        raise TransactionContention(f"{collection}/{doc_id}")
+
+    @abc.abstractmethod
+    async def _get_versioned(self, collection: str, doc_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+        """The document (or None) and its current version (None if it does not exist)."""
+
+    @abc.abstractmethod
+    async def _commit_if_unchanged(self, key: DocumentKey, version: Optional[int], writes: Sequence[Write]) -> bool:
+        """Applies `writes` atomically if `key` is still at `version`; False, with nothing written, otherwise."""
+
+
+class MemoryBackend(VersionedBackend):
+    """
+    In-process store. With a LatencyModel every RPC first sleeps for a sampled
+    latency, so load tests see realistic storage tail latencies. Documents are
+    deep-copied in and out, as a network round trip would.
+    """
+
+    name = "memory"
+
+    def __init__(self, latency: Optional[LatencyModel] = None, seed: Optional[int] = None):
+        super().__init__()
+        self.latency = latency
+        self._rng = random.Random(seed)
+        self._documents: Dict[DocumentKey, Dict[str, Any]] = {}
+        self._versions: Dict[DocumentKey, int] = {}
+        self._next_version = 1
+
+    async def _rpc(self, op: str) -> None:
+        self._count(op)
+        if self.latency is not None:
+            await asyncio.sleep(self.latency.sample_seconds(self._rng))
+
+    def _current(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        return self._documents.get((collection, doc_id))
+
+    def _apply(self, writes: Sequence[Write]) -> None:
+        for key, document in apply_writes(writes, self._current).items():
+            if document is None:
+                self._documents.pop(key, None)
+                self._versions.pop(key, None)
+            else:
+                self._documents[key] = copy.deepcopy(document)
+                self._versions[key] = self._next_version
+                self._next_version += 1
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        await self._rpc("get")
+        return copy.deepcopy(self._documents.get((collection, doc_id)))
+
+    async def commit(self, writes: Sequence[Write]) -> None:
+        await self._rpc("commit")
+        self._apply(writes)
+
+    async def query(self, collection, where, order_by=None, descending=False, fields=None, limit=None, start_after=None):
+        await self._rpc("query")
+        matches = [
+            document for (doc_collection, _), document in self._documents.items()
+            if doc_collection == collection and all(document.get(name) == value for name, value in where.items())
+        ]
+        if order_by is not None:
+            matches = [document for document in matches if document.get(order_by) is not None]
+            if start_after is not None:
+                matches = [
+                    document for document in matches
+                    if (document[order_by] < start_after if descending else document[order_by] > start_after)
+                ]
+            matches.sort(key=lambda document: document[order_by], reverse=descending)
+        if limit:
+            matches = matches[:limit]
+        return [copy.deepcopy(project(document, fields)) for document in matches]
+
+    async def _get_versioned(self, collection, doc_id):
+        await self._rpc("get")
+        key = (collection, doc_id)
+        return copy.deepcopy(self._documents.get(key)), self._versions.get(key)
+
+    async def _commit_if_unchanged(self, key, version, writes):
+        await self._rpc("commit")
+        if self._versions.get(key) != version:
+            return False
+        self._apply(writes)
+        return True
+
+    def documents(self, collection: str) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of a collection, for tests and benchmarks."""
+        return {doc_id: copy.deepcopy(document) for (doc_collection, doc_id), document in self._documents.items() if doc_collection == collection}
+
+
+class SQLiteBackend(VersionedBackend):
+    """
+    Documents stored as JSON in one SQLite table. All SQLite work runs on a
+    single dedicated thread, which also serialises writers.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SQLITE_STORAGE_PATH):
+        super().__init__()
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-storage")
+
+    async def _call(self, op: str, func: Callable[..., Any], *args: Any) -> Any:
+        self._count(op)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    # Everything below named *_sync runs on the SQLite thread.
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, version INTEGER NOT NULL,"
+                " PRIMARY KEY (collection, id))"
+            )
+            self._connection = connection
+        return self._connection
+
+    def _get_sync(self, collection: str, doc_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+        row = self._db().execute(
+            "SELECT data, version FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+        ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def _commit_sync(self, writes: Sequence[Write], expected: Optional[Tuple[DocumentKey, Optional[int]]] = None) -> bool:
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if expected is not None:
+                key, version = expected
+                if self._get_sync(*key)[1] != version:
+                    db.execute("ROLLBACK")
+                    return False
+            results = apply_writes(writes, lambda collection, doc_id: self._get_sync(collection, doc_id)[0])
+            (next_version,) = db.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM documents").fetchone()
+            for (collection, doc_id), document in results.items():
+                if document is None:
+                    db.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id))
+                else:
+                    db.execute(
+                        "INSERT OR REPLACE INTO documents (collection, id, data, version) VALUES (?, ?, ?, ?)",
+                        (collection, doc_id, json.dumps(document, default=str), next_version),
+                    )
+                    next_version += 1
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return True
+
+    def _query_sync(self, collection, where, order_by, descending, fields, limit, start_after) -> List[Dict[str, Any]]:
+        sql = "SELECT data FROM documents WHERE collection = ?"
+        params: List[Any] = [collection]
+        for name, value in where.items():
+            sql += " AND json_extract(data, ?) = ?"
+            params += [f"$.{name}", value]
+        if order_by is not None:
+            path = f"$.{order_by}"
+            sql += " AND json_extract(data, ?) IS NOT NULL"
+            params.append(path)
+            if start_after is not None:
+                sql += f" AND json_extract(data, ?) {'<' if descending else '>'} ?"
+                params += [path, start_after]
+            sql += f" ORDER BY json_extract(data, ?) {'DESC' if descending else 'ASC'}"
+            params.append(path)
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [project(json.loads(row[0]), fields) for row in self._db().execute(sql, params)]
+
+    def _close_sync(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        return (await self._call("get", self._get_sync, collection, doc_id))[0]
+
+    async def commit(self, writes: Sequence[Write]) -> None:
+        await self._call("commit", self._commit_sync, writes)
+
+    async def query(self, collection, where, order_by=None, descending=False, fields=None, limit=None, start_after=None):
+        return await self._call("query", self._query_sync, collection, dict(where), order_by, descending, fields, limit, start_after)
+
+    async def _get_versioned(self, collection, doc_id):
+        return await self._call("get", self._get_sync, collection, doc_id)
+
+    async def _commit_if_unchanged(self, key, version, writes):
+        return await self._call("commit", self._commit_sync, writes, (key, version))
+
+    async def close(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close_sync)
+        self._executor.shutdown(wait=False)
+
+
+def create_backend(name: str = STORAGE_BACKEND) -> StorageBackend:
+    """The backend named by STORAGE_BACKEND (firestore, memory or sqlite)."""
+    if name == "memory":
+        latency = LatencyModel(MEMORY_STORAGE_LATENCY_MS, MEMORY_STORAGE_LATENCY_P99_MS) if MEMORY_STORAGE_LATENCY_MS > 0 else None
+        return MemoryBackend(latency=latency)
+    if name == "sqlite":
+        return SQLiteBackend(SQLITE_STORAGE_PATH)
+    if name == "firestore":
+        # Imported here so the other backends work without google-cloud-firestore.
+        from app.firestore_backend import FirestoreBackend
+        return FirestoreBackend()
+    raise ValueError(f"Unknown STORAGE_BACKEND {name!r}; expected firestore, memory or sqlite")
@@ -0,0 +1,225 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fuzzy topic matching.
+
+Learners phrase one topic many ways ("Dinosaurs", "the dinosaur", "dinos").
+A topic is reduced to stemmed tokens (filler words dropped), featurised as
+hashed character n-grams of those tokens, and compared to others by cosine
+similarity. TopicIndex keeps the L2-normalised vectors as posting lists in
+sorted NumPy arrays, so a lookup touches only the postings of the query's
+n-grams instead of scanning every topic.
+
+A high overall score is not enough: every content word of the requested
+topic must also be matched by some word of the candidate, so a narrower
+request ("volcanoes on Mars", "whale sharks") does not fall back to the
+broader topic it contains ("volcanoes", "sharks").
+
+The matching is lexical: it absorbs plurals, word order, filler words and
+small typos, not synonyms ("T-rex" and "dinosaurs" share nothing to match on).
+"""
+
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# --- Configurable constants ---
+# Minimum cosine similarity for a topic to stand in for the requested one. Above 1 disables fuzzy matching.
+# Around 0.5 abbreviations start to match ("dinos" ~ "dinosaurs"), but so do near misses ("rain" ~ "rainbows").
+TOPIC_MATCH_THRESHOLD = float(os.getenv("TOPIC_MATCH_THRESHOLD", "0.7"))
+# Minimum similarity between each word of the requested topic and its closest word in the candidate.
+TOPIC_WORD_MATCH_THRESHOLD = float(os.getenv("TOPIC_WORD_MATCH_THRESHOLD", "0.5"))
+
+_NGRAM = 3
+_HASH_MASK = (1 << 24) - 1
+# Postings added since the last merge are searched linearly. A lookup merges them first once there are
+# this many; add() only merges when they reach 1/8 of the index, so bulk loading sorts rarely.
+_MIN_MERGE_POSTINGS = 4096
+
+_STOP_WORDS = frozenset({
+    "a", "about", "all", "an", "and", "are", "at", "do", "does", "for", "how", "in", "is", "learn", "lesson",
+    "lessons", "me", "my", "of", "on", "or", "please", "some", "teach", "tell", "the", "to", "what", "why", "with", "work", "works",
+})
+# Checked in order; the first matching suffix is replaced.
+_SUFFIXES = (("sses", "ss"), ("ies", "y"), ("oes", "o"), ("xes", "x"), ("ches", "ch"), ("shes", "sh"), ("ing", ""))
+
+
+def _stem(token: str) -> str:
+    for suffix, replacement in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)] + replacement
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def topic_tokens(topic: str) -> List[str]:
+    """Stemmed content words of `topic`, in order."""
+    words = re.findall(r"[a-z0-9]+", (topic or "").lower())
+    return [_stem(word) for word in words if word not in _STOP_WORDS]
+
+
+def topic_vector(topic: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(hashed feature ids, weights) of `topic`: sorted unique ids and an L2-normalised weight each."""
+    return _tokens_vector(topic_tokens(topic))
+
+
+def _tokens_vector(tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    counts: Counter = Counter()
+    for token in tokens:
+        padded = f"#{token}#"
+        for start in range(max(1, len(padded) - _NGRAM + 1)):
+            counts[zlib.crc32(padded[start:start + _NGRAM].encode("utf-8")) & _HASH_MASK] += 1
+    if not counts:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.float32)
+    ids = np.fromiter(counts.keys(), dtype=np.uint32, count=len(counts))
+    weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    order = np.argsort(ids)
+    weights = weights[order]
+    return ids[order], weights / np.linalg.norm(weights)
+
+
+def _cosine(a: Tuple[np.ndarray, np.ndarray], b: Tuple[np.ndarray, np.ndarray]) -> float:
+    (a_ids, a_weights), (b_ids, b_weights) = a, b
+    _, a_at, b_at = np.intersect1d(a_ids, b_ids, assume_unique=True, return_indices=True)
+    return float(np.dot(a_weights[a_at], b_weights[b_at]))
+
+
+def topic_similarity(a: str, b: str) -> float:
+    """Cosine similarity of two topics, from 0 (nothing in common) to 1."""
+    return _cosine(topic_vector(a), topic_vector(b))
+
+
+def covers_topic(candidate: str, requested: str, word_threshold: Optional[float] = None) -> bool:
+    """Whether every content word of `requested` has a similar word in `candidate`."""
+    word_threshold = TOPIC_WORD_MATCH_THRESHOLD if word_threshold is None else word_threshold
+    candidate_vectors = [_tokens_vector([token]) for token in set(topic_tokens(candidate))]
+    return all(
+        any(_cosine(_tokens_vector([token]), vector) >= word_threshold for vector in candidate_vectors)
+        for token in set(topic_tokens(requested))
+    )
+
+
+def topics_match(requested: str, candidate: str, threshold: Optional[float] = None) -> bool:
+    """Whether `candidate` can stand in for `requested`: similar overall, and covering each requested word."""
+    threshold = TOPIC_MATCH_THRESHOLD if threshold is None else threshold
+    score = topic_similarity(requested, candidate)
+    return score > 0.0 and score >= threshold and covers_topic(candidate, requested)
+
+
+class TopicIndex:
+    """
+    Set of topics searchable by similarity. add() is cheap: new postings go
+    to an unsorted tail that is merged into the sorted arrays in bulk.
+    Not thread-safe; use it from the event loop.
+    """
+
+    def __init__(self, threshold: float = TOPIC_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._topics: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        # Merged postings, sorted by feature id.
+        self._ids = np.empty(0, dtype=np.uint32)
+        self._rows = np.empty(0, dtype=np.int32)
+        self._weights = np.empty(0, dtype=np.float32)
+        # Postings not merged yet.
+        self._tail: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._tail_size = 0
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    def __contains__(self, topic: str) -> bool:
+        row = self._row_of.get(topic)
+        return row is not None and bool(self._alive[row])
+
+    def add(self, topic: str) -> None:
+        row = self._row_of.get(topic)
+        if row is not None:
+            self._alive[row] = True
+            return
+        ids, weights = topic_vector(topic)
+        row = len(self._topics)
+        self._topics.append(topic)
+        self._row_of[topic] = row
+        if row >= len(self._alive):
+            self._alive = np.concatenate([self._alive, np.zeros(max(64, len(self._alive)), dtype=bool)])
+        self._alive[row] = True
+        if len(ids):
+            self._tail.append((ids, np.full(len(ids), row, dtype=np.int32), weights))
+            self._tail_size += len(ids)
+            if self._tail_size >= max(_MIN_MERGE_POSTINGS, len(self._ids) // 8):
+                self._merge()
+
+    def discard(self, topic: str) -> None:
+        row = self._row_of.get(topic)
+        if row is not None:
+            self._alive[row] = False
+
+    def _merge(self) -> None:
+        ids = np.concatenate([self._ids] + [posting[0] for posting in self._tail])
+        order = np.argsort(ids, kind="stable")
+        self._ids = ids[order]
+        self._rows = np.concatenate([self._rows] + [posting[1] for posting in self._tail])[order]
+        self._weights = np.concatenate([self._weights] + [posting[2] for posting in self._tail])[order]
+        self._tail = []
+        self._tail_size = 0
+
+    def _consolidated_tail(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if len(self._tail) > 1:
+            self._tail = [tuple(np.concatenate(part) for part in zip(*self._tail, strict=True))]
+        return self._tail[0]
+
+    def scores(self, topic: str) -> np.ndarray:
+        """Similarity of `topic` to every indexed topic, by row; 0 for discarded ones."""
+        if self._tail_size >= _MIN_MERGE_POSTINGS:
+            self._merge()
+        query_ids, query_weights = topic_vector(topic)
+        scores = np.zeros(len(self._topics), dtype=np.float64)
+        if not len(query_ids) or not self._topics:
+            return scores
+        if len(self._ids):
+            lo = np.searchsorted(self._ids, query_ids, side="left")
+            hi = np.searchsorted(self._ids, query_ids, side="right")
+            lengths = hi - lo
+            total = int(lengths.sum())
+            if total:
+                # Positions of every posting of every query feature, without a Python loop.
+                positions = np.repeat(lo - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+                contributions = self._weights[positions] * np.repeat(query_weights, lengths)
+                scores += np.bincount(self._rows[positions], weights=contributions, minlength=len(scores))
+        if self._tail:
+            ids, rows, weights = self._consolidated_tail()
+            at = np.minimum(np.searchsorted(query_ids, ids), len(query_ids) - 1)
+            hit = query_ids[at] == ids
+            if hit.any():
+                np.add.at(scores, rows[hit], weights[hit] * query_weights[at[hit]])
+        scores[~self._alive[: len(scores)]] = 0.0
+        return scores
+
+    def best_match(self, topic: str, threshold: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """The most similar indexed topic covering every word of `topic`, and its score, if it reaches the threshold."""
+        scores = self.scores(topic)
+        threshold = self.threshold if threshold is None else threshold
+        candidates = np.flatnonzero((scores >= threshold) & (scores > 0.0))
+        for row in candidates[np.argsort(-scores[candidates], kind="stable")]:
+            if covers_topic(self._topics[row], topic):
+                return self._topics[row], float(scores[row])
+        return None
@@ -0,0 +1,34 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lesson history queries (app/repository.py Repository.completed_lessons) filter by
+# user and order by completion date, newest first.
+resource "google_firestore_index" "completed_lessons_by_user_and_date" {
+  for_each   = local.deploy_project_ids
+  project    = each.value
+  database   = "(default)"
+  collection = "adk_completed_lessons"
+
+  fields {
+    field_path = "user_id"
+    order      = "ASCENDING"
+  }
+
+  fields {
+    field_path = "completion_date"
+    order      = "DESCENDING"
+  }
+
+  depends_on = [resource.google_project_service.shared_services]
+}
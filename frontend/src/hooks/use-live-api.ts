@@ -45,6 +45,11 @@ export type UseLiveAPIResults = {
   feedbackMessage: { status: string; message: string; } | null;
 };
 
+// Close code sent by the server when it is at capacity ("Try Again Later").
+const SERVER_BUSY_CLOSE_CODE = 1013;
+const BUSY_RETRY_BASE_MS = 2000;
+const BUSY_RETRY_MAX_MS = 60000;
+
 export type UseLiveAPIProps = {
   url?: string;
   userId?: string;
@@ -72,6 +77,9 @@ export function useLiveAPI({
 
   const [currentSectionMarkdown, setCurrentSectionMarkdown] = useState<string>('');
 
+  const busyRetryAttemptRef = useRef(0);
+  const busyRetryTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+
 
   // register audio for streaming server -> speakers
   useEffect(() => {
@@ -113,8 +121,20 @@ export function useLiveAPI({
   }, [connected, client, muted, audioRecorderRef]);
 
   useEffect(() => {
-    const onClose = () => {
+    const onClose = (ev: CloseEvent) => {
       setConnected(false);
+      if (ev.code !== SERVER_BUSY_CLOSE_CODE) {
+        busyRetryAttemptRef.current = 0;
+        return;
+      }
+      // Server is full: retry with exponential backoff and full jitter.
+      const attempt = busyRetryAttemptRef.current++;
+      const delay = Math.random() * Math.min(BUSY_RETRY_MAX_MS, BUSY_RETRY_BASE_MS * 2 ** attempt);
+      setFeedbackMessage({ status: "busy", message: "Lots of friends are learning right now! Trying again in a moment..." });
+      busyRetryTimerRef.current = setTimeout(() => {
+        busyRetryTimerRef.current = null;
+        client.connect().then(() => setConnected(true)).catch(() => setConnected(false));
+      }, delay);
     };
 
     const stopAudioStreamer = () => audioStreamerRef.current?.stop();
@@ -153,6 +173,10 @@ export function useLiveAPI({
       .on("turncomplete", onTurnComplete);
 
     return () => {
+      if (busyRetryTimerRef.current) {
+        clearTimeout(busyRetryTimerRef.current);
+        busyRetryTimerRef.current = null;
+      }
       client
         .off("close", onClose)
         .off("interrupted", stopAudioStreamer)
@@ -172,6 +196,10 @@ export function useLiveAPI({
   }, [client, setConnected]);
 
   const disconnect = useCallback(async () => {
+    if (busyRetryTimerRef.current) {
+      clearTimeout(busyRetryTimerRef.current);
+      busyRetryTimerRef.current = null;
+    }
     client.disconnect();
     setConnected(false);
   }, [setConnected, client]);
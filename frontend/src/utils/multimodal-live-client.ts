@@ -71,8 +71,22 @@ export type MultimodalLiveAPIClientConnection = {
   url?: string;
   runId?: string;
   userId?: string;
+  audioTransport?: AudioTransport;
 };
 
+/**
+ * "binary" sends microphone PCM as raw binary frames with an 8-byte header
+ * (version, mime code, sample rate, sequence number) instead of base64 JSON.
+ * The server confirms it in its setupComplete message.
+ */
+export type AudioTransport = "json" | "binary";
+
+const FRAME_VERSION = 1;
+const FRAME_HEADER_SIZE = 8;
+const MIME_PCM = 1;
+// Must be well below the server's CLIENT_HEARTBEAT_TIMEOUT_SECONDS.
+const HEARTBEAT_INTERVAL_MS = 20000;
+
 /**
  * A event-emitting class that manages the connection to the websocket and emits
  * events to the rest of the application.
@@ -84,7 +98,10 @@ export class MultimodalLiveClient extends EventEmitter<MultimodalLiveClientEvent
   public url: string = "";
   private runId: string;
   private userId?: string;
-  constructor({ url, userId, runId }: MultimodalLiveAPIClientConnection) {
+  private audioTransport: AudioTransport;
+  private audioSequence = 0;
+  private heartbeatTimer: ReturnType<typeof setInterval> | null = null;
+  constructor({ url, userId, runId, audioTransport }: MultimodalLiveAPIClientConnection) {
     super();
     if (window.location.hostname === 'localhost') {
       this.url = "ws://localhost:8000/ws" ;
@@ -93,6 +110,9 @@ export class MultimodalLiveClient extends EventEmitter<MultimodalLiveClientEvent
     }
     this.userId = userId;
     this.runId = runId || crypto.randomUUID();
+    this.audioTransport =
+      audioTransport ??
+      (process.env.REACT_APP_AUDIO_TRANSPORT === "binary" ? "binary" : "json");
     this.send = this.send.bind(this);
   }
 
@@ -138,14 +158,17 @@ export class MultimodalLiveClient extends EventEmitter<MultimodalLiveClientEvent
         this.emit("open");
 
         this.ws = ws;
+        this.audioSequence = 0;
         // Send initial setup message with runId
         const setupMessage = {
           setup: {
             run_id: this.runId,
             user_id: this.userId,
+            audio_transport: this.audioTransport,
           },
         };
         this._sendDirect(setupMessage);
+        this._startHeartbeat();
         ws.removeEventListener("error", onError);
         ws.addEventListener("close", (ev: CloseEvent) => {
           console.log(ev);
@@ -176,6 +199,7 @@ export class MultimodalLiveClient extends EventEmitter<MultimodalLiveClientEvent
     // could be that this is an old websocket and there's already a new instance
     // only close it if its still the correct reference
     if ((!ws || this.ws === ws) && this.ws) {
+      this._stopHeartbeat();
       this.ws.close();
       this.ws = null;
       this.log("client.close", `Disconnected`);
@@ -183,6 +207,26 @@ export class MultimodalLiveClient extends EventEmitter<MultimodalLiveClientEvent
     }
     return false;
   }
+  /**
+   * keeps the connection marked alive on the server while the mic is muted;
+   * the server closes connections that send nothing for a while
+   */
+  private _startHeartbeat() {
+    this._stopHeartbeat();
+    this.heartbeatTimer = setInterval(() => {
+      if (this.ws?.readyState === WebSocket.OPEN) {
+        this._sendDirect({ ping: Date.now() });
+      }
+    }, HEARTBEAT_INTERVAL_MS);
+  }
+
+  private _stopHeartbeat() {
+    if (this.heartbeatTimer) {
+      clearInterval(this.heartbeatTimer);
+      this.heartbeatTimer = null;
+    }
+  }
+
   protected async receive(data: Blob | string) {
   let response: LiveIncomingMessage;
   if (data instanceof Blob) {
@@ -196,6 +240,9 @@ export class MultimodalLiveClient extends EventEmitter<MultimodalLiveClientEvent
       return; 
     }
   }
+    if (response && "pong" in response) {
+      return;
+    }
     console.log("Parsed response:", response);
 
     if (isToolCallMessage(response)) {
@@ -351,6 +398,15 @@ export class MultimodalLiveClient extends EventEmitter<MultimodalLiveClientEvent
             ? "video"
             : "unknown";
 
+    if (this.audioTransport === "binary") {
+      const jsonChunks = chunks.filter((ch) => !this._sendBinaryAudio(ch));
+      if (!jsonChunks.length) {
+        this.log(`client.realtimeInput`, `${message} (binary)`);
+        return;
+      }
+      chunks = jsonChunks;
+    }
+
     const data: RealtimeInputMessage = {
       realtimeInput: {
         mediaChunks: chunks,
@@ -393,6 +449,29 @@ export class MultimodalLiveClient extends EventEmitter<MultimodalLiveClientEvent
     this.log(`client.send`, clientContentRequest);
   }
 
+  /**
+   * sends an audio/pcm chunk as a binary frame, returns false for anything
+   * that must still go through the JSON path
+   */
+  private _sendBinaryAudio(chunk: GenerativeContentBlob): boolean {
+    if (!this.ws || !chunk.mimeType.startsWith("audio/pcm")) {
+      return false;
+    }
+    const rateMatch = /rate=(\d+)/.exec(chunk.mimeType);
+    const sampleRate = rateMatch ? parseInt(rateMatch[1], 10) : 16000;
+    const pcm = new Uint8Array(base64ToArrayBuffer(chunk.data));
+    const frame = new Uint8Array(FRAME_HEADER_SIZE + pcm.byteLength);
+    const header = new DataView(frame.buffer);
+    header.setUint8(0, FRAME_VERSION);
+    header.setUint8(1, MIME_PCM);
+    header.setUint16(2, sampleRate);
+    header.setUint32(4, this.audioSequence);
+    this.audioSequence = (this.audioSequence + 1) >>> 0;
+    frame.set(pcm, FRAME_HEADER_SIZE);
+    this.ws.send(frame);
+    return true;
+  }
+
   /**
    *  used internally to send all messages
    *  don't use directly unless trying to send an unsupported message type
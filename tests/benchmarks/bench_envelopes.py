@@ -0,0 +1,94 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Microbenchmark: app.envelopes vs. the original nested-dict + json.dumps path
+on an audio-heavy trace (one simulated lesson of server -> client messages).
+
+    uv run python -m tests.benchmarks.bench_envelopes
+"""
+
+import base64
+import json
+import os
+import random
+import timeit
+from typing import Any
+
+from app import envelopes
+
+MIME = "audio/pcm;rate=24000"
+
+
+def build_trace(audio_seconds: int = 300, seed: int = 7) -> list[tuple[str, Any]]:
+    """~40 ms audio parts with a turnComplete every ~8 s and occasional tool traffic."""
+    rng = random.Random(seed)
+    trace: list[tuple[str, Any]] = []
+    for i in range(audio_seconds * 25):
+        trace.append(("audio", os.urandom(rng.choice((960, 1920, 3840)))))
+        if i % 200 == 199:
+            trace.append(("turn_complete", None))
+        if i % 500 == 250:
+            trace.append(("ui_feedback", ("thinking", "I'm planning a new lesson for you...")))
+            trace.append(("tool_response", ("get_my_learning_history_func", {"summary": "You have completed 3 lesson(s)"}, "id-1")))
+        if i % 700 == 350:
+            trace.append(("markdown", (i % 5, "## Volcanoes\n\n- Magma rises\n- Lava flows\n" * 5)))
+    return trace
+
+
+def legacy_encode(kind: str, payload: Any) -> bytes:
+    if kind == "audio":
+        message = {"serverContent": {"modelTurn": {"parts": [{"inlineData": {"data": base64.b64encode(payload).decode("ascii"), "mimeType": MIME}}]}}}
+    elif kind == "turn_complete":
+        message = {"serverContent": {"turnComplete": True, "modelTurn": {"parts": []}}}
+    elif kind == "ui_feedback":
+        message = {"ui_feedback": {"status": payload[0], "message": payload[1]}}
+    elif kind == "markdown":
+        message = {"markdown": {"sectionIndex": payload[0], "content": payload[1]}}
+    else:
+        message = {"toolResponse": {"functionResponses": [{"name": payload[0], "response": payload[1], "id": payload[2]}]}}
+    return json.dumps(message).encode("utf-8")
+
+
+def envelope_encode(kind: str, payload: Any) -> bytes:
+    if kind == "audio":
+        return envelopes.encode_audio(payload, MIME)
+    if kind == "turn_complete":
+        return envelopes.TURN_COMPLETE_MESSAGE
+    if kind == "ui_feedback":
+        return envelopes.encode_ui_feedback(*payload)
+    if kind == "markdown":
+        return envelopes.encode_markdown(*payload)
+    return envelopes.encode_tool_response(*payload)
+
+
+def main() -> None:
+    trace = build_trace()
+    for kind, payload in trace:
+        assert json.loads(legacy_encode(kind, payload)) == json.loads(envelope_encode(kind, payload))
+
+    runs = 5
+    legacy = min(timeit.repeat(lambda: [legacy_encode(k, p) for k, p in trace], number=1, repeat=runs))
+    fast = min(timeit.repeat(lambda: [envelope_encode(k, p) for k, p in trace], number=1, repeat=runs))
+    legacy_bytes = sum(len(legacy_encode(k, p)) for k, p in trace)
+    fast_bytes = sum(len(envelope_encode(k, p)) for k, p in trace)
+
+    print(f"messages: {len(trace)} (JSON backend for free-form payloads: {envelopes.JSON_BACKEND})")
+    print(f"legacy dict + json.dumps: {legacy * 1000:8.2f} ms  {legacy / len(trace) * 1e6:6.2f} us/msg  {legacy_bytes} bytes")
+    print(f"app.envelopes           : {fast * 1000:8.2f} ms  {fast / len(trace) * 1e6:6.2f} us/msg  {fast_bytes} bytes")
+    print(f"speedup: {legacy / fast:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Microbenchmark: app.topic_index lookup latency with 100k indexed topics,
+against a brute-force pass of topic_similarity over a sample of them.
+
+    uv run python -m tests.benchmarks.bench_topic_index
+"""
+
+import random
+import statistics
+import time
+
+from app.topic_index import TopicIndex, topic_similarity
+
+SUBJECTS = [
+    "dinosaur", "volcano", "planet", "ocean", "rainforest", "butterfly", "robot", "castle", "pyramid", "rainbow",
+    "shark", "honeybee", "glacier", "desert", "telescope", "skeleton", "tornado", "penguin", "magnet", "fossil",
+]
+ASPECTS = ["life", "history", "science", "secrets", "habitat", "colors", "sounds", "records", "myths", "future"]
+SYLLABLES = ["ka", "lo", "mi", "ru", "ze", "ta", "po", "ni", "shu", "ve", "dra", "qui"]
+
+
+def build_topics(count: int = 100_000, seed: int = 7) -> list[str]:
+    """Plausible topics plus invented words, so the n-gram postings are not all tiny."""
+    rng = random.Random(seed)
+    topics = set()
+    while len(topics) < count:
+        invented = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        topics.add(f"{rng.choice(SUBJECTS)} {rng.choice(ASPECTS)} of {invented}")
+    return sorted(topics)
+
+
+def main() -> None:
+    topics = build_topics()
+    started = time.perf_counter()
+    index = TopicIndex()
+    for topic in topics:
+        index.add(topic)
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(11)
+    queries = [rng.choice(topics).replace("dinosaur", "dinosaurs") for _ in range(200)]
+    queries += ["the " + rng.choice(topics).upper() for _ in range(200)]
+    latencies = []
+    hits = 0
+    for query in queries:
+        started = time.perf_counter()
+        hits += index.best_match(query) is not None
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    sample = topics[:5000]
+    started = time.perf_counter()
+    max(sample, key=lambda topic: topic_similarity(queries[0], topic))
+    brute_per_lookup = (time.perf_counter() - started) * len(topics) / len(sample)
+
+    print(f"indexed topics: {len(index)} (built in {build_seconds:.2f} s)")
+    print(f"lookups: {len(queries)}, matched: {hits}")
+    print(f"p50: {statistics.median(latencies) * 1000:7.3f} ms  p99: {latencies[int(len(latencies) * 0.99)] * 1000:7.3f} ms")
+    print(f"brute force (extrapolated): {brute_per_lookup * 1000:9.1f} ms per lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+
+from app.admission import QUEUE_FULL, QUEUE_TIMEOUT, AdmissionController, AdmissionRejected
+from app.metrics import LIVE_SESSION_OCCUPANCY, LIVE_SESSIONS_ACTIVE
+
+
+def test_admits_up_to_capacity_then_queues_in_order() -> None:
+    async def scenario():
+        admission = AdmissionController(max_sessions=2, max_waiting=2, wait_timeout=5)
+        first = await admission.acquire()
+        await admission.acquire()
+        assert LIVE_SESSIONS_ACTIVE.value() == 2
+        assert LIVE_SESSION_OCCUPANCY.value() == 1.0
+
+        positions = {"a": [], "b": []}
+        admitted = []
+
+        async def wait(name):
+            async def on_position(position, eta):
+                positions[name].append(position)
+            await admission.acquire(on_position)
+            admitted.append(name)
+
+        waiters = [asyncio.create_task(wait("a")), asyncio.create_task(wait("b"))]
+        await asyncio.sleep(0)
+        assert admission.waiting == 2
+        with pytest.raises(AdmissionRejected) as exc:
+            await admission.acquire()
+        assert exc.value.reason == QUEUE_FULL
+
+        admission.release(first)
+        await asyncio.sleep(0.01)
+        assert admitted == ["a"]
+        assert positions == {"a": [1], "b": [2, 1]}
+        assert admission.active == 2
+
+        admission.release(None)
+        await asyncio.gather(*waiters)
+        assert admitted == ["a", "b"]
+        assert admission.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiter_times_out_and_frees_its_place() -> None:
+    async def scenario():
+        admission = AdmissionController(max_sessions=1, max_waiting=1, wait_timeout=0.02)
+        await admission.acquire()
+        with pytest.raises(AdmissionRejected) as exc:
+            await admission.acquire()
+        assert exc.value.reason == QUEUE_TIMEOUT
+        assert admission.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue() -> None:
+    async def scenario():
+        admission = AdmissionController(max_sessions=1, max_waiting=1, wait_timeout=5)
+        ticket = await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        assert admission.waiting == 1
+        waiter.cancel()  # e.g. the client went away while queued
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert admission.waiting == 0
+        admission.release(ticket)
+        assert admission.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_eta_uses_observed_session_length() -> None:
+    admission = AdmissionController(max_sessions=10, expected_session_seconds=600)
+    assert admission.eta_seconds(5) == 300
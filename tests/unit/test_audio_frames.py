@@ -0,0 +1,84 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from app.audio_frames import (
+    BINARY_AUDIO_TRANSPORT,
+    FRAME_HEADER_SIZE,
+    JSON_AUDIO_TRANSPORT,
+    MIME_JPEG,
+    FrameError,
+    SequenceTracker,
+    decode_media_frame,
+    encode_media_frame,
+    negotiate_audio_transport,
+)
+
+
+def test_negotiate_audio_transport() -> None:
+    assert negotiate_audio_transport({"audio_transport": "binary"}) == BINARY_AUDIO_TRANSPORT
+    assert negotiate_audio_transport({"audio_transport": "BINARY"}) == BINARY_AUDIO_TRANSPORT
+    assert negotiate_audio_transport({}) == JSON_AUDIO_TRANSPORT
+    assert negotiate_audio_transport({"audio_transport": "carrier-pigeon"}) == JSON_AUDIO_TRANSPORT
+
+
+def test_pcm_frame_round_trip() -> None:
+    pcm = bytes(range(256)) * 4
+    frame = encode_media_frame(pcm, sequence=7, sample_rate=16000)
+    assert len(frame) == FRAME_HEADER_SIZE + len(pcm)
+
+    media = decode_media_frame(frame)
+    assert media.mime_type == "audio/pcm;rate=16000"
+    assert media.sample_rate == 16000
+    assert media.sequence == 7
+    assert media.data == pcm
+
+
+def test_non_pcm_frame_has_no_rate() -> None:
+    media = decode_media_frame(encode_media_frame(b"\xff\xd8", 0, sample_rate=0, mime_code=MIME_JPEG))
+    assert media.mime_type == "image/jpeg"
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [
+        b"",
+        encode_media_frame(b"", 0),
+        b"\x02" + encode_media_frame(b"abc", 0)[1:],
+        encode_media_frame(b"abc", 0, mime_code=99),
+    ],
+)
+def test_malformed_frames_are_rejected(frame: bytes) -> None:
+    with pytest.raises(FrameError):
+        decode_media_frame(frame)
+
+
+def test_sequence_tracker_counts_gaps_and_ignores_late_frames() -> None:
+    tracker = SequenceTracker()
+    assert tracker.observe(0) == 0
+    assert tracker.observe(1) == 0
+    assert tracker.observe(4) == 2
+    assert tracker.observe(3) == 0  # late frame
+    assert tracker.observe(5) == 0
+    assert tracker.gaps == 1
+    assert tracker.missing_frames == 2
+    assert tracker.frames == 5
+
+
+def test_sequence_tracker_wraps_around() -> None:
+    tracker = SequenceTracker()
+    tracker.observe(0xFFFFFFFF)
+    assert tracker.observe(0) == 0
+    assert tracker.gaps == 0
@@ -0,0 +1,61 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app.cache import TTLCache
+from app.metrics import CACHE_REQUESTS_TOTAL
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lookup_records_hits_and_misses() -> None:
+    cache = TTLCache("test_hits", max_entries=4, ttl_seconds=10)
+    assert cache.lookup("a") == (False, None)
+    cache.put("a", {"x": 1})
+    cache.put("b", None)
+    assert cache.lookup("a") == (True, {"x": 1})
+    # A cached None ("no document") is a hit, not a miss.
+    assert cache.lookup("b") == (True, None)
+    assert CACHE_REQUESTS_TOTAL.value(cache="test_hits", result="hit") == 2
+    assert CACHE_REQUESTS_TOTAL.value(cache="test_hits", result="miss") == 1
+    assert cache.stats()["hit_ratio"] == round(2 / 3, 4)
+
+
+def test_entries_expire_after_ttl() -> None:
+    clock = FakeClock()
+    cache = TTLCache("test_ttl", max_entries=4, ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.lookup("a") == (True, 1)
+    clock.now = 10.0
+    assert cache.lookup("a") == (False, None)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache = TTLCache("test_lru", max_entries=2, ttl_seconds=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.lookup("a")
+    cache.put("c", 3)
+    assert cache.lookup("b") == (False, None)
+    assert cache.lookup("a") == (True, 1)
+    assert cache.lookup("c") == (True, 3)
+    cache.invalidate("a")
+    assert cache.lookup("a") == (False, None)
@@ -0,0 +1,96 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+
+from app.catalog import CatalogBuilder, popular_topics, read_checkpoint
+from app.lesson_cache import lesson_content_key
+
+
+def lesson_for(topic):
+    return {
+        "lesson_plan": {"topic": topic},
+        "parsed_section_markdowns": [{"index": 0, "markdown": f"# {topic}"}],
+        "image_urls": {f"{topic} picture": f"https://example.com/{topic}.png"},
+    }
+
+
+class FakeWorkflow:
+    """Stands in for the lesson creation agents; records calls and peak parallelism."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, topic):
+        self.calls.append(topic)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        if topic in self.failing:
+            raise RuntimeError("model overloaded")
+        return lesson_for(topic)
+
+
+def test_popular_topics_group_phrasings():
+    topics = ["volcanoes", "Volcanoes", "the Volcanoes", "Volcanoes", "Sharks", "sharks", "Bees", ""]
+    assert popular_topics(topics, 2) == ["Volcanoes", "Sharks"]
+
+
+def test_run_is_bounded_deduplicated_and_resumable(tmp_path):
+    checkpoint = str(tmp_path / "catalog.jsonl")
+    published = {}
+
+    async def publish(key, entry):
+        published[key] = entry
+        return True
+
+    async def scenario():
+        first = FakeWorkflow(failing={"Sharks"})
+        stats = await CatalogBuilder(first, checkpoint, publish=publish, concurrency=2).run(
+            ["Volcanoes", "the volcanoes", "Sharks", "Bees", "Planets"]
+        )
+        assert stats == {"generated": 3, "skipped": 1, "failed": 1, "published": 3}
+        assert first.max_running == 2
+        assert published[lesson_content_key("Volcanoes")]["image_urls"] == {"Volcanoes picture": "https://example.com/Volcanoes.png"}
+
+        # A rerun only retries what is missing from the checkpoint.
+        second = FakeWorkflow()
+        stats = await CatalogBuilder(second, checkpoint, publish=publish).run(["Volcanoes", "Sharks", "Bees"])
+        assert second.calls == ["Sharks"]
+        assert stats["generated"] == 1 and stats["skipped"] == 2
+
+    asyncio.run(scenario())
+    assert set(read_checkpoint(checkpoint)) == {str(lesson_content_key(t)) for t in ("Volcanoes", "Sharks", "Bees", "Planets")}
+
+
+def test_unpublished_lessons_are_not_checkpointed_and_torn_lines_are_ignored(tmp_path):
+    checkpoint = tmp_path / "catalog.jsonl"
+    checkpoint.write_text(json.dumps({"key": str(lesson_content_key("Bees")), "topic": "Bees", **lesson_for("Bees")}) + "\n{\"key\": \"tor")
+
+    async def reject(key, entry):
+        return False
+
+    async def scenario():
+        workflow = FakeWorkflow()
+        stats = await CatalogBuilder(workflow, str(checkpoint), publish=reject).run(["Bees", "Sharks"])
+        assert workflow.calls == ["Sharks"]
+        assert stats["failed"] == 1
+
+    asyncio.run(scenario())
+    assert list(read_checkpoint(str(checkpoint))) == [str(lesson_content_key("Bees"))]
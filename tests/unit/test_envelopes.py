@@ -0,0 +1,74 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import json
+
+from app import envelopes
+
+
+def test_audio_envelope_matches_legacy_message() -> None:
+    pcm = bytes(range(200))
+    encoded = envelopes.encode_audio(pcm, "audio/pcm;rate=24000")
+    assert json.loads(encoded) == {
+        "serverContent": {
+            "modelTurn": {
+                "parts": [
+                    {
+                        "inlineData": {
+                            "data": base64.b64encode(pcm).decode("ascii"),
+                            "mimeType": "audio/pcm;rate=24000",
+                        }
+                    }
+                ]
+            }
+        }
+    }
+
+
+def test_control_envelopes() -> None:
+    assert json.loads(envelopes.TURN_COMPLETE_MESSAGE) == {
+        "serverContent": {"turnComplete": True, "modelTurn": {"parts": []}}
+    }
+    assert json.loads(envelopes.INTERRUPTED_MESSAGE) == {
+        "serverContent": {"interrupted": True, "modelTurn": {"parts": []}}
+    }
+
+
+def test_variable_envelopes_escape_their_fields() -> None:
+    tricky = 'He said "hi"\n\\ ünïcode 🦖'
+    assert json.loads(envelopes.encode_ui_feedback("thinking", tricky)) == {
+        "ui_feedback": {"status": "thinking", "message": tricky}
+    }
+    assert json.loads(envelopes.encode_image("https://x/y.png", tricky)) == {
+        "image": {"url": "https://x/y.png", "alt": tricky}
+    }
+    assert json.loads(envelopes.encode_markdown(None, tricky)) == {
+        "markdown": {"sectionIndex": None, "content": tricky}
+    }
+
+
+def test_tool_response_envelope() -> None:
+    response = {"summary": "ok", "items": [1, 2, {"nested": True}], 3: "int key"}
+    assert json.loads(envelopes.encode_tool_response("get_my_learning_history_func", response, "call-1")) == {
+        "toolResponse": {
+            "functionResponses": [
+                {
+                    "name": "get_my_learning_history_func",
+                    "response": {"summary": "ok", "items": [1, 2, {"nested": True}], "3": "int key"},
+                    "id": "call-1",
+                }
+            ]
+        }
+    }
@@ -0,0 +1,44 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import struct
+
+from app.idle import ActivityTracker, PreRollBuffer, pcm16_peak
+
+
+def _pcm(*samples: int) -> bytes:
+    return struct.pack(f"<{len(samples)}h", *samples)
+
+
+def test_pcm16_peak() -> None:
+    assert pcm16_peak(b"") == 0
+    assert pcm16_peak(_pcm(0, 0, 0, 0)) == 0
+    assert pcm16_peak(_pcm(-3000, 0, 0, 0, 200), stride=4) == 3000
+    assert pcm16_peak(_pcm(1, 2, 3) + b"\x00", stride=1) == 3  # odd trailing byte ignored
+
+
+def test_only_voice_counts_as_activity() -> None:
+    tracker = ActivityTracker(voice_peak=1000, now=0.0)
+    assert tracker.on_audio(_pcm(10, -20, 30, 5)) is False
+    assert tracker.idle_seconds(now=50.0) == 50.0
+    assert tracker.on_audio(_pcm(5000, 0, 0, 0)) is True
+    assert tracker.idle_seconds() < 1.0
+
+
+def test_preroll_keeps_most_recent_audio() -> None:
+    buffer = PreRollBuffer(max_bytes=6)
+    for chunk in (b"aa", b"bb", b"cc", b"dd"):
+        buffer.add(chunk, "audio/pcm")
+    assert [data for data, _ in buffer.drain()] == [b"bb", b"cc", b"dd"]
+    assert buffer.drain() == []
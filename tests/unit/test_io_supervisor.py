@@ -0,0 +1,81 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+
+from app.io_supervisor import IOSupervisor
+from app.metrics import BACKGROUND_TASK_ERRORS_TOTAL, STORAGE_IO_ERRORS_TOTAL
+
+
+def test_measure_shares_the_cap_with_async_calls() -> None:
+    async def scenario():
+        supervisor = IOSupervisor(max_concurrency=2, name="test")
+        running = 0
+        peak = 0
+        before = STORAGE_IO_ERRORS_TOTAL.value(op="async_fails")
+
+        async def async_call():
+            nonlocal running, peak
+            async with supervisor.measure("async_call"):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(async_call() for _ in range(5)))
+        assert peak == 2
+        assert supervisor.stats()["calls"] == 5
+
+        with pytest.raises(KeyError):
+            async with supervisor.measure("async_fails"):
+                raise KeyError("missing")
+        assert STORAGE_IO_ERRORS_TOTAL.value(op="async_fails") == before + 1
+        await supervisor.drain()
+        with pytest.raises(RuntimeError):
+            async with supervisor.measure("after_drain"):
+                pass
+
+    asyncio.run(scenario())
+
+
+def test_spawned_tasks_are_tracked_and_drained() -> None:
+    async def scenario():
+        supervisor = IOSupervisor(name="test")
+        finished = []
+        before = BACKGROUND_TASK_ERRORS_TOTAL.value(task="fails")
+
+        async def work():
+            await asyncio.sleep(0.01)
+            finished.append(True)
+
+        async def fails():
+            raise RuntimeError("boom")
+
+        async def hangs():
+            await asyncio.sleep(60)
+
+        supervisor.spawn(work(), name="work")
+        supervisor.spawn(fails(), name="fails")
+        hanging = supervisor.spawn(hangs(), name="hangs")
+        assert supervisor.pending_tasks == 3
+
+        await supervisor.drain(timeout=0.1)
+        assert finished == [True]
+        assert hanging.cancelled()
+        assert supervisor.pending_tasks == 0
+        assert BACKGROUND_TASK_ERRORS_TOTAL.value(task="fails") == before + 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,64 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app.learning_profile import (
+    DEFAULT_GRADE_LEVEL,
+    apply_completed_lesson,
+    build_profile_document,
+    empty_profile_document,
+    profile_from_document,
+)
+
+
+def lesson(topic: str, grade: str, date: str) -> dict:
+    return {"topic": topic, "grade_level": grade, "completion_date": date}
+
+
+def test_empty_profile_matches_default() -> None:
+    profile = profile_from_document(None)
+    assert profile["completed_topics"] == []
+    assert profile["grade_level"] == DEFAULT_GRADE_LEVEL
+    assert profile["total_lessons_completed"] == 0
+    assert profile_from_document(empty_profile_document("u1")) == profile
+
+
+def test_incremental_updates_match_full_rebuild() -> None:
+    lessons = [
+        lesson("Volcanoes", "Ages 6-10", "2025-01-01"),
+        lesson("Space", "Ages 11-14", "2025-01-02"),
+        lesson("Frogs", "Ages 11-14", "2025-01-03"),
+    ]
+    document = empty_profile_document("u1")
+    for completed in lessons:
+        before = document
+        document = apply_completed_lesson(document, completed)
+        assert before is not document
+    assert document == {**build_profile_document("u1", reversed(lessons)), "last_updated": document["last_updated"]}
+
+    profile = profile_from_document(document)
+    assert sorted(profile["completed_topics"]) == ["Frogs", "Space", "Volcanoes"]
+    assert profile["grade_level"] == "Ages 11-14"
+    assert profile["total_lessons_completed"] == 3
+    assert profile["recent_topics"] == ["Frogs", "Space", "Volcanoes"]
+
+
+def test_repeating_a_topic_replaces_its_record() -> None:
+    document = build_profile_document("u1", [
+        lesson("Volcanoes", "Ages 6-10", "2025-01-01"),
+        lesson("Space", "Ages 6-10", "2025-01-02"),
+    ])
+    document = apply_completed_lesson(document, lesson("volcanoes", "Ages 11-14", "2025-01-03"))
+    assert document["total_lessons_completed"] == 2
+    assert document["grade_counts"] == {"Ages 6-10": 1, "Ages 11-14": 1}
+    assert document["recent_topics"] == ["volcanoes", "Space"]
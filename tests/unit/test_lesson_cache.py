@@ -0,0 +1,146 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+
+# The shared repository is built at import; keep it off Firestore.
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+from app.io_supervisor import IOSupervisor
+from app.lesson_cache import ADVANCED_BUCKET, INTRO_BUCKET, LessonContentCache, lesson_content_key, normalize_topic
+from app.repository import LESSON_CONTENT_COLLECTION, Repository
+from app.storage import MemoryBackend
+from app.topic_index import TopicIndex
+
+PLAN = {"topic": "Volcanoes", "grade_level": "Ages 6-10", "sections": [{"title": "What is a volcano?"}]}
+SECTIONS = [{"index": 0, "markdown": "# Volcanoes"}, {"index": 1, "markdown": "## Lava"}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_repository():
+    backend = MemoryBackend()
+    return Repository(backend, io=IOSupervisor(name="test")), backend
+
+
+def make_cache(**kwargs):
+    repository, backend = make_repository()
+    return LessonContentCache(repository, max_entries=10, ttl_seconds=60, **kwargs), backend
+
+
+def test_topics_normalise_to_one_key():
+    assert normalize_topic("Teach me about  the Volcanoes!") == "volcanoes"
+    assert normalize_topic("VOLCANOES") == "volcanoes"
+    assert lesson_content_key("the volcanoes") == lesson_content_key("Volcanoes?")
+    assert lesson_content_key("  ?! ") is None
+
+
+def test_key_buckets_by_grade_and_completed_topics():
+    intro = lesson_content_key("Volcanoes", {"grade_level": "Ages 6-10", "completed_topics": ["Dinosaurs"]})
+    advanced = lesson_content_key("volcanoes", {"grade_level": "Ages 6-10", "completed_topics": ["The Volcanoes"]})
+    older = lesson_content_key("Volcanoes", {"grade_level": "Ages 11-14"})
+    assert intro.bucket == INTRO_BUCKET and advanced.bucket == ADVANCED_BUCKET
+    assert len({intro, advanced, older}) == 3
+    assert lesson_content_key("Volcanoes") == intro
+
+
+def test_hit_from_memory_returns_a_private_copy():
+    async def scenario():
+        cache, _ = make_cache()
+        key = lesson_content_key("Volcanoes")
+        assert await cache.get(key) is None
+        assert await cache.put(key, PLAN, SECTIONS)
+        first = await cache.get(key)
+        first["parsed_section_markdowns"].append({"index": 2, "markdown": "mutated"})
+        second = await cache.get(key)
+        assert second == {"lesson_plan": PLAN, "parsed_section_markdowns": SECTIONS}
+        assert cache.stats()["hits"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_persistent_tier_is_shared_and_expires():
+    async def scenario():
+        clock = Clock()
+        repository, backend = make_repository()
+        cache = LessonContentCache(repository, max_entries=10, ttl_seconds=60, clock=clock)
+        key = lesson_content_key("Volcanoes")
+        await cache.put(key, PLAN, SECTIONS)
+        assert backend.documents(LESSON_CONTENT_COLLECTION)[key.document_id]["key"] == str(key)
+
+        other_instance = LessonContentCache(repository, max_entries=10, ttl_seconds=60, clock=clock)
+        assert (await other_instance.get(key))["lesson_plan"] == PLAN
+        clock.now += 61
+        third_instance = LessonContentCache(repository, max_entries=10, ttl_seconds=60, clock=clock)
+        assert await third_instance.get(key) is None
+
+    asyncio.run(scenario())
+
+
+def test_invalid_content_is_never_cached():
+    def validate(plan):
+        if "sections" not in plan:
+            raise ValueError("no sections")
+        return dict(plan)
+
+    async def scenario():
+        cache, backend = make_cache(validate=validate)
+        key = lesson_content_key("Volcanoes")
+        assert not await cache.put(key, {"topic": "Volcanoes"}, SECTIONS)
+        assert not await cache.put(key, PLAN, [])
+        assert backend.documents(LESSON_CONTENT_COLLECTION) == {}
+        assert await cache.get(key) is None
+
+    asyncio.run(scenario())
+
+
+def test_similar_topics_hit_within_the_same_grade_and_bucket():
+    async def scenario():
+        repository, _ = make_repository()
+        writer = LessonContentCache(repository, max_entries=10, ttl_seconds=60, index_factory=TopicIndex)
+        await writer.put(lesson_content_key("Volcanoes"), PLAN, SECTIONS)
+        assert (await writer.get(lesson_content_key("how volcanoes work")))["lesson_plan"] == PLAN
+        assert await writer.get(lesson_content_key("Volcanoes", {"grade_level": "Ages 11-14"})) is None
+        assert writer.stats()["fuzzy_hits"] == 1
+
+        # Another instance learns the cached topics from the persistent tier.
+        reader = LessonContentCache(repository, max_entries=10, ttl_seconds=60, index_factory=TopicIndex)
+        assert await reader.get(lesson_content_key("the volcano")) is None
+        assert await reader.warm() == 1
+        assert (await reader.get(lesson_content_key("the volcano")))["parsed_section_markdowns"] == SECTIONS
+
+    asyncio.run(scenario())
+
+
+def test_catalog_entries_carry_images_and_their_own_ttl():
+    async def scenario():
+        clock = Clock()
+        repository, backend = make_repository()
+        cache = LessonContentCache(repository, max_entries=10, ttl_seconds=60, clock=clock)
+        key = lesson_content_key("Volcanoes")
+        await cache.put(key, PLAN, SECTIONS, image_urls={"a volcano": "https://example.com/v.png"}, ttl_seconds=3600)
+        assert backend.documents(LESSON_CONTENT_COLLECTION)[key.document_id]["expires_at"] == clock.now + 3600
+
+        clock.now += 600
+        other_instance = LessonContentCache(repository, max_entries=10, ttl_seconds=60, clock=clock)
+        assert (await other_instance.get(key))["image_urls"] == {"a volcano": "https://example.com/v.png"}
+
+    asyncio.run(scenario())
@@ -0,0 +1,145 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import time
+from collections.abc import Generator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from google.auth.credentials import Credentials
+from google.genai.types import Blob
+
+from app.admission import ADMISSION_REJECT_CLOSE_CODE, AdmissionController
+from app.idle import ActivityTracker
+from app.metrics import SessionMetrics
+
+SILENCE = bytes(320)
+VOICE = (20000).to_bytes(2, "little", signed=True) * 160
+
+
+@pytest.fixture(autouse=True)
+def mock_google_cloud_credentials() -> Generator[None, None, None]:
+    """Mock Google Cloud credentials for testing."""
+    with patch.dict(
+        os.environ,
+        {
+            "GOOGLE_APPLICATION_CREDENTIALS": "/path/to/mock/credentials.json",
+            "GOOGLE_CLOUD_PROJECT_ID": "mock-project-id",
+        },
+    ):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def mock_google_auth_default() -> Generator[None, None, None]:
+    """Mock google.auth.default and the Cloud Storage client app.agent builds at import."""
+    with (
+        patch("google.auth.default", return_value=(MagicMock(spec=Credentials), "mock-project-id")),
+        patch("google.cloud.storage.Client"),
+    ):
+        yield
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """app.server with a small admission controller, a fake runner and fast idle checks."""
+    from app import server
+
+    runner = MagicMock()
+    runner.run_live.side_effect = lambda **kwargs: _silent_model()
+    monkeypatch.setattr(server, "admission", AdmissionController(max_sessions=1, max_waiting=0, wait_timeout=1))
+    monkeypatch.setattr(server, "main_app_runner", runner)
+    monkeypatch.setattr(server, "IDLE_CHECK_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(server, "LIVE_IDLE_TIMEOUT_SECONDS", 0.05)
+    return server
+
+
+async def _silent_model():
+    """A run_live stream that never produces an event."""
+    await asyncio.Event().wait()
+    yield
+
+
+async def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def _start_suspended_stream(server):
+    """A LiveStream holding the only admission slot, run until it suspends for being idle."""
+    from google.adk.agents.live_request_queue import LiveRequestQueue
+
+    ticket = await server.admission.acquire()
+    stream = server.LiveStream(
+        AsyncMock(), MagicMock(id="session-1"), MagicMock(put=AsyncMock()), SessionMetrics(time.monotonic()),
+        ActivityTracker(), _silent_model(), LiveRequestQueue(), ticket,
+    )
+    task = asyncio.create_task(stream.run())
+    await _wait_for(lambda: stream.suspended)
+    return stream, task
+
+
+async def _stop(stream, task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    stream.close()
+
+
+def test_suspend_releases_the_slot_and_the_first_voiced_chunk_replays_preroll(server, monkeypatch) -> None:
+    async def scenario():
+        stream, task = await _start_suspended_stream(server)
+        try:
+            assert server.admission.active == 0
+            assert stream.suspensions == 1
+            monkeypatch.setattr(server, "LIVE_IDLE_TIMEOUT_SECONDS", 0)
+
+            stream.send_realtime(Blob(data=SILENCE, mime_type=server.USER_AUDIO_MIME_TYPE))
+            await asyncio.sleep(0.05)
+            assert stream.suspended
+            server.main_app_runner.run_live.assert_not_called()
+
+            stream.send_realtime(Blob(data=VOICE, mime_type=server.USER_AUDIO_MIME_TYPE))
+            await _wait_for(lambda: server.main_app_runner.run_live.called)
+            assert server.admission.active == 1
+            queue = server.main_app_runner.run_live.call_args.kwargs["live_request_queue"]
+            assert queue is stream.live_request_queue
+            replayed = [(await queue.get()).blob.data for _ in range(2)]
+            assert replayed == [SILENCE, VOICE]
+        finally:
+            await _stop(stream, task)
+        assert server.admission.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_rejected_resume_closes_the_connection(server) -> None:
+    async def scenario():
+        stream, task = await _start_suspended_stream(server)
+        other = await server.admission.acquire()
+        try:
+            stream.send_realtime(Blob(data=VOICE, mime_type=server.USER_AUDIO_MIME_TYPE))
+            await asyncio.wait_for(task, timeout=2)
+            assert ADMISSION_REJECT_CLOSE_CODE == 1013
+            stream.websocket.close.assert_awaited_once_with(code=1013, reason="Server busy, retry later")
+            server.main_app_runner.run_live.assert_not_called()
+        finally:
+            await _stop(stream, task)
+            server.admission.release(other)
+        assert server.admission.active == 0
+
+    asyncio.run(scenario())
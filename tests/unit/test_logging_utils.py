@@ -0,0 +1,47 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+
+from app.logging_utils import JsonFormatter, SamplingFilter, truncate
+
+
+def _record(level: int = logging.INFO, msg: str = "hello %s", args: tuple = ("world",)) -> logging.LogRecord:
+    return logging.LogRecord("kido.audio", level, __file__, 1, msg, args, None)
+
+
+def test_sampling_filter_keeps_one_in_n() -> None:
+    sampler = SamplingFilter(0.01)
+    kept = sum(sampler.filter(_record()) for _ in range(1000))
+    assert kept == 10
+
+
+def test_sampling_filter_zero_rate_drops_info_but_keeps_warnings() -> None:
+    sampler = SamplingFilter(0)
+    assert not sampler.filter(_record())
+    assert sampler.filter(_record(logging.WARNING))
+
+
+def test_truncate() -> None:
+    assert truncate("short", limit=10) == "short"
+    assert truncate("x" * 25, limit=10) == "xxxxxxxxxx...(15 more chars)"
+    assert truncate({"a": 1}, limit=100) == "{'a': 1}"
+
+
+def test_json_formatter() -> None:
+    entry = json.loads(JsonFormatter().format(_record()))
+    assert entry["severity"] == "INFO"
+    assert entry["category"] == "audio"
+    assert entry["message"] == "hello world"
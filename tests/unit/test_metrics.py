@@ -0,0 +1,99 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import patch
+
+import pytest
+
+from app import metrics
+from app.metrics import Counter, Histogram, Registry, SessionMetrics
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    registry = Registry()
+    hist = registry.register(Histogram("demo_seconds", "Demo.", labelnames=("tool",), buckets=(0.1, 1.0)))
+    hist.observe(0.05, tool="a")
+    hist.observe(0.1, tool="a")
+    hist.observe(5, tool="a")
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{tool="a",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{tool="a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{tool="a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{tool="a"} 3' in text
+    assert hist.count(tool="a") == 3
+
+
+def test_counter_without_labels() -> None:
+    registry = Registry()
+    counter = registry.register(Counter("demo_total", "Demo."))
+    counter.inc()
+    counter.inc(2)
+    assert "demo_total 3" in registry.render()
+
+
+def test_session_metrics_timings() -> None:
+    clock = [100.0]
+    with patch("app.metrics.time.monotonic", side_effect=lambda: clock[0]):
+        session = SessionMetrics(setup_at=100.0)
+        before_first_event = metrics.SETUP_TO_FIRST_EVENT_SECONDS.count()
+        before_response = metrics.USER_AUDIO_TO_MODEL_AUDIO_SECONDS.count()
+        before_gaps = metrics.MODEL_AUDIO_GAP_SECONDS.count()
+        before_tool = metrics.TOOL_ROUND_TRIP_SECONDS.count(tool="generate_image_with_imagen")
+
+        clock[0] = 100.5
+        session.on_live_event()
+        session.on_user_audio()
+        clock[0] = 101.0
+        session.on_user_audio()  # later voiced chunk restarts the timer
+        clock[0] = 101.2
+        session.on_model_audio()
+        clock[0] = 101.25
+        session.on_model_audio()
+        session.on_turn_end()
+
+        session.on_tool_call("generate_image_with_imagen", "call-1")
+        session.on_tool_call("signal_ui_feedback_func", "call-2")  # not timed
+        clock[0] = 103.0
+        session.on_tool_response("generate_image_with_imagen", "call-1")
+
+        session.on_bytes_in(10)
+        session.on_bytes_out(20)
+        summary = session.close()
+
+    assert summary == {"setup_to_first_event_seconds": 0.5, "bytes_in": 10, "bytes_out": 20}
+    assert metrics.SETUP_TO_FIRST_EVENT_SECONDS.count() == before_first_event + 1
+    assert metrics.USER_AUDIO_TO_MODEL_AUDIO_SECONDS.count() == before_response + 1
+    assert metrics.MODEL_AUDIO_GAP_SECONDS.count() == before_gaps + 1
+    assert metrics.TOOL_ROUND_TRIP_SECONDS.count(tool="generate_image_with_imagen") == before_tool + 1
+    assert "kido_active_connections" in metrics.REGISTRY.render()
+
+
+def test_response_latency_is_measured_from_the_last_voiced_chunk() -> None:
+    clock = [200.0]
+    observed = []
+    with patch("app.metrics.time.monotonic", side_effect=lambda: clock[0]), \
+            patch.object(metrics.USER_AUDIO_TO_MODEL_AUDIO_SECONDS, "observe",
+                         side_effect=lambda value, **labels: observed.append(value)):
+        session = SessionMetrics(setup_at=200.0)
+        session.on_user_audio()
+        clock[0] = 203.0
+        session.on_user_audio()
+        clock[0] = 203.4
+        session.on_model_audio()
+        clock[0] = 203.6
+        session.on_user_audio()  # barge-in while the model is speaking is not a new turn
+        session.on_model_audio()
+
+    assert observed == [pytest.approx(0.4)]
@@ -0,0 +1,208 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+
+from app.outbound import (
+    AUDIO,
+    BLOCK,
+    CONTROL,
+    DISCONNECT,
+    DROP_OLDEST_AUDIO,
+    NORMAL,
+    AudioCoalescer,
+    OutboundQueue,
+    SendQueueOverflow,
+    pcm_bytes_for_ms,
+)
+
+PCM_24K = "audio/pcm;rate=24000"
+
+
+def test_pcm_bytes_for_ms() -> None:
+    assert pcm_bytes_for_ms(PCM_24K, 100) == 4800
+    assert pcm_bytes_for_ms("audio/pcm;rate=16000", 20) == 640
+    assert pcm_bytes_for_ms("audio/pcm", 100) == 4800  # defaults to 24 kHz
+
+
+def test_coalescer_merges_until_window_is_full() -> None:
+    coalescer = AudioCoalescer(window_ms=100, max_bytes=1_000_000)
+    chunk = b"\x01" * 1200  # 25 ms at 24 kHz
+    assert coalescer.add(chunk, PCM_24K) == []
+    assert coalescer.add(chunk, PCM_24K) == []
+    assert coalescer.add(chunk, PCM_24K) == []
+    frames = coalescer.add(chunk, PCM_24K)
+    assert frames == [(chunk * 4, PCM_24K)]
+    assert coalescer.pending_bytes == 0
+    assert coalescer.frames_saved == 3
+
+
+def test_coalescer_respects_max_bytes() -> None:
+    coalescer = AudioCoalescer(window_ms=1000, max_bytes=2000)
+    assert coalescer.add(b"a" * 1500, PCM_24K) == []
+    frames = coalescer.add(b"b" * 1500, PCM_24K)
+    assert len(frames) == 1
+    assert len(frames[0][0]) == 3000
+
+
+def test_coalescer_flush_and_mime_change() -> None:
+    coalescer = AudioCoalescer(window_ms=100, max_bytes=1_000_000)
+    coalescer.add(b"a" * 10, PCM_24K)
+    frames = coalescer.add(b"b" * 10, "audio/pcm;rate=16000")
+    assert frames == [(b"a" * 10, PCM_24K)]
+    assert coalescer.flush() == [(b"b" * 10, "audio/pcm;rate=16000")]
+    assert coalescer.flush() == []
+    assert coalescer.parts_in == 2
+    assert coalescer.frames_out == 2
+
+
+def test_coalescer_discard_drops_buffered_audio() -> None:
+    coalescer = AudioCoalescer(window_ms=100, max_bytes=1_000_000)
+    coalescer.add(b"a" * 10, PCM_24K)
+    coalescer.add(b"b" * 10, PCM_24K)
+    assert coalescer.discard() == 20
+    assert coalescer.flush() == []
+    assert coalescer.frames_saved == 0
+
+
+def test_coalescer_disabled_passes_parts_through() -> None:
+    coalescer = AudioCoalescer(window_ms=0)
+    assert coalescer.add(b"abc", PCM_24K) == [(b"abc", PCM_24K)]
+    assert coalescer.frames_saved == 0
+
+
+def _collecting_queue(**kwargs: object) -> tuple[OutboundQueue, list[bytes]]:
+    sent: list[bytes] = []
+
+    async def send(payload: bytes) -> None:
+        sent.append(payload)
+
+    return OutboundQueue(send, **kwargs), sent  # type: ignore[arg-type]
+
+
+def test_outbound_queue_delivers_in_order() -> None:
+    async def scenario() -> list[bytes]:
+        queue, sent = _collecting_queue(max_messages=4, policy=BLOCK)
+        writer = asyncio.create_task(queue.run())
+        for i in range(10):
+            await queue.put(str(i).encode(), kind=AUDIO)
+        await queue.join()
+        await queue.close()
+        await writer
+        assert queue.sent == 10
+        return sent
+
+    assert asyncio.run(scenario()) == [str(i).encode() for i in range(10)]
+
+
+def test_outbound_queue_drops_oldest_audio_but_keeps_control() -> None:
+    async def scenario() -> None:
+        queue, sent = _collecting_queue(max_messages=3, policy=DROP_OLDEST_AUDIO)
+        await queue.put(b"control", kind=NORMAL)
+        await queue.put(b"a1", kind=AUDIO)
+        await queue.put(b"a2", kind=AUDIO)
+        await queue.put(b"a3", kind=AUDIO)  # no writer yet: queue is full
+        assert queue.dropped_audio == 1
+        assert queue.max_depth == 3
+        writer = asyncio.create_task(queue.run())
+        await queue.join()
+        await queue.close()
+        await writer
+        assert sent == [b"control", b"a2", b"a3"]
+
+    asyncio.run(scenario())
+
+
+def test_outbound_queue_disconnect_policy_raises() -> None:
+    async def scenario() -> None:
+        queue, _ = _collecting_queue(max_messages=1, policy=DISCONNECT)
+        await queue.put(b"a", kind=AUDIO)
+        with pytest.raises(SendQueueOverflow):
+            await queue.put(b"b", kind=AUDIO)
+
+    asyncio.run(scenario())
+
+
+def test_outbound_queue_block_policy_records_stall() -> None:
+    async def scenario() -> None:
+        release = asyncio.Event()
+        sent: list[bytes] = []
+
+        async def slow_send(payload: bytes) -> None:
+            await release.wait()
+            sent.append(payload)
+
+        queue = OutboundQueue(slow_send, max_messages=1, policy=BLOCK)
+        writer = asyncio.create_task(queue.run())
+        await queue.put(b"a")
+        await asyncio.sleep(0)  # writer picks up "a" and blocks in send
+        await queue.put(b"b")
+        producer = asyncio.create_task(queue.put(b"c"))
+        await asyncio.sleep(0.01)
+        assert not producer.done()
+        release.set()
+        await producer
+        await queue.join()
+        await queue.close()
+        await writer
+        assert sent == [b"a", b"b", b"c"]
+        assert queue.stall_seconds > 0
+
+    asyncio.run(scenario())
+
+
+def test_outbound_queue_rejects_unknown_policy() -> None:
+    async def noop(payload: bytes) -> None:
+        return None
+
+    with pytest.raises(ValueError):
+        OutboundQueue(noop, policy="yolo")
+
+
+def test_control_messages_jump_ahead_of_audio() -> None:
+    async def scenario() -> None:
+        queue, sent = _collecting_queue(max_messages=10)
+        await queue.put(b"a1", kind=AUDIO)
+        await queue.put(b"image", kind=NORMAL)
+        await queue.put(b"a2", kind=AUDIO)
+        await queue.put(b"turnComplete", kind=CONTROL)
+        writer = asyncio.create_task(queue.run())
+        await queue.join()
+        await queue.close()
+        await writer
+        assert sent == [b"turnComplete", b"a1", b"image", b"a2"]
+
+    asyncio.run(scenario())
+
+
+def test_interrupt_discards_queued_audio_and_records_latency() -> None:
+    async def scenario() -> None:
+        queue, sent = _collecting_queue(max_messages=10)
+        await queue.put(b"a1", kind=AUDIO)
+        await queue.put(b"markdown", kind=NORMAL)
+        await queue.put(b"a2", kind=AUDIO)
+        assert await queue.put_interrupt(b"interrupted") == 2
+        writer = asyncio.create_task(queue.run())
+        await queue.join()
+        await queue.close()
+        await writer
+        assert sent == [b"interrupted", b"markdown"]
+        stats = queue.stats()
+        assert stats["discarded_audio"] == 2
+        assert stats["barge_ins"] == 1
+        assert stats["mean_barge_in_seconds"] is not None
+
+    asyncio.run(scenario())
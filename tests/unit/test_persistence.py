@@ -0,0 +1,114 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+from app.persistence import DirtyFieldTracker, WriteScheduler
+
+
+class RecordingWriter:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.writes = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, key, payload):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.writes.append((key, payload))
+        self.in_flight -= 1
+        return True
+
+
+def test_burst_collapses_into_one_write_of_the_newest_payload() -> None:
+    async def scenario():
+        writer = RecordingWriter()
+        scheduler = WriteScheduler(writer, debounce_seconds=0.02)
+        for index in range(5):
+            scheduler.schedule("kid", {"section": index})
+        scheduler.schedule("other", {"section": 0})
+        await asyncio.sleep(0.05)
+        assert sorted(writer.writes, key=repr) == [("kid", {"section": 4}), ("other", {"section": 0})]
+        assert scheduler.stats()["coalesced"] == 4
+        assert not scheduler.pending("kid")
+
+    asyncio.run(scenario())
+
+
+def test_one_write_in_flight_and_newest_lands_last() -> None:
+    async def scenario():
+        writer = RecordingWriter(delay=0.02)
+        scheduler = WriteScheduler(writer, debounce_seconds=0)
+        scheduler.schedule("kid", 1)
+        await asyncio.sleep(0.005)  # first write is now in flight
+        scheduler.schedule("kid", 2)
+        scheduler.schedule("kid", 3)
+        await scheduler.flush("kid")
+        assert writer.writes == [("kid", 1), ("kid", 3)]
+        assert writer.max_in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_flush_skips_the_debounce_window() -> None:
+    async def scenario():
+        writer = RecordingWriter()
+        scheduler = WriteScheduler(writer, debounce_seconds=60)
+        scheduler.schedule("kid", "state")
+        await asyncio.wait_for(scheduler.flush_all(), timeout=1)
+        assert writer.writes == [("kid", "state")]
+
+    asyncio.run(scenario())
+
+
+def test_failed_write_is_counted_and_does_not_stop_the_worker() -> None:
+    async def scenario():
+        calls = []
+
+        async def flaky(key, payload):
+            calls.append(payload)
+            if payload == "bad":
+                raise RuntimeError("boom")
+            return payload != "false"
+
+        scheduler = WriteScheduler(flaky, debounce_seconds=0)
+        scheduler.schedule("a", "bad")
+        scheduler.schedule("b", "false")
+        scheduler.schedule("c", "good")
+        await scheduler.flush_all()
+        assert scheduler.stats()["failed"] == 2
+        assert scheduler.stats()["written"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_dirty_field_tracker_reports_only_changed_fields() -> None:
+    tracker = DirtyFieldTracker()
+    plan = {"topic": "Volcanoes", "sections": ["a", "b", "c"]}
+    assert tracker.changed_fields("kid", {"plan": plan, "index": 0}) is None
+
+    tracker.mark_persisted("kid", {"plan": plan, "index": 0}, replace=True)
+    assert tracker.changed_fields("kid", {"plan": plan, "index": 0}) == {}
+    assert tracker.changed_fields("kid", {"plan": plan, "index": 1}) == {"index": 1}
+    # An equal but distinct plan is not a change.
+    assert tracker.changed_fields("kid", {"plan": dict(plan), "index": 0}) == {}
+
+    tracker.mark_persisted("kid", {"index": 1})
+    new_plan = {"topic": "Rivers"}
+    assert tracker.changed_fields("kid", {"plan": new_plan, "index": 1}) == {"plan": new_plan}
+
+    tracker.forget("kid")
+    assert "kid" not in tracker
@@ -0,0 +1,97 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app.presentation import (
+    bullet_points,
+    render_presentation_markdown,
+    render_section_markdowns,
+    section_markdown,
+    split_presentation_markdown,
+)
+
+PLAN = {
+    "topic": "Volcanoes",
+    "duration_minutes": 20,
+    "grade_level": "Ages 6-10",
+    "learning_objectives": ["Explain what a volcano is", "Name two kinds of lava"],
+    "sections": [
+        {
+            "title": "What Is a Volcano?",
+            "duration_minutes": 5,
+            "content": "A volcano is an opening in the Earth. Hot magma rises up from deep inside!",
+            "activity": "Draw a volcano.",
+            "image_prompt": "a friendly cartoon volcano",
+        },
+        {
+            "title": "Lava",
+            "duration_minutes": 10,
+            "content": "- **Pahoehoe** is smooth\n- **A'a** is rough---and sharp",
+            "activity": "1. Touch sandpaper\n2. Touch silk",
+        },
+    ],
+    "wrap_up": {"title": "Review & Celebrate", "duration_minutes": 5, "content": "Volcanoes let magma out.", "activity": "Quiz time!"},
+}
+
+
+def test_bullet_points_keep_lists_and_split_narratives():
+    assert bullet_points("- one\n* two\n3) three") == ["one", "two", "three"]
+    assert bullet_points("Magma is hot. It rises! Does it cool? Yes.") == ["Magma is hot.", "It rises!", "Does it cool?", "Yes."]
+    assert bullet_points(None) == []
+
+
+def test_slides_follow_the_presentation_format():
+    sections = render_section_markdowns(PLAN)
+    assert [section["index"] for section in sections] == [0, 1, 2, 3]
+    assert sections[0]["markdown"].startswith("# Volcanoes\n\n## What We'll Learn Today\n* **Explain what a volcano is**")
+    assert sections[1]["markdown"].splitlines()[0] == '## What Is a Volcano? <span data-section-index="0"></span>'
+    assert "* Hot magma rises up from deep inside!" in sections[1]["markdown"]
+    assert "* Touch silk" in sections[2]["markdown"]
+    assert sections[3]["markdown"].startswith('## Review & Celebrate <span data-section-index="2"></span>')
+    assert "image_prompt" not in render_presentation_markdown(PLAN) and "cartoon" not in render_presentation_markdown(PLAN)
+
+
+def test_splitting_the_markdown_gives_the_same_sections():
+    # The orchestrator's after_tool callback splits the workflow output on '---'.
+    markdown = render_presentation_markdown(PLAN)
+    chunks = [chunk.strip() for chunk in markdown.split("---") if chunk.strip()]
+    assert chunks == [section["markdown"] for section in render_section_markdowns(PLAN)]
+    assert "A'a** is rough—and sharp" in markdown
+
+
+def test_section_markdown_resolves_sections_by_their_span_not_position():
+    sections = render_section_markdowns(PLAN)
+    assert section_markdown(sections, 0).startswith("## What Is a Volcano?")
+    assert section_markdown(sections, 1.0).startswith("## Lava")
+    # The wrap-up is section len(PLAN["sections"]).
+    assert section_markdown(sections, 2).startswith("## Review & Celebrate")
+    assert section_markdown(sections, 3) is None
+    assert section_markdown(sections, -1) is None
+    assert section_markdown(sections, True) is None
+    assert section_markdown(None, 0) is None
+
+
+def test_split_indices_follow_the_kept_slides():
+    markdown = '---\n# Bees\n---\n\n---\n## Hives <span data-section-index="0"></span>\n---\n## Wrap-Up <span data-section-index="1"></span>'
+    sections = split_presentation_markdown(markdown)
+    assert [section["index"] for section in sections] == [0, 1, 2]
+    assert section_markdown(sections, 0).startswith("## Hives")
+    assert section_markdown(sections, 1).startswith("## Wrap-Up")
+    assert split_presentation_markdown(None) == []
+
+
+def test_untagged_presentations_skip_the_title_slide():
+    sections = split_presentation_markdown("# Bees\n---\n## Hives\n---\n## Wrap-Up")
+    assert section_markdown(sections, 0) == "## Hives"
+    assert section_markdown(sections, 1) == "## Wrap-Up"
+    assert section_markdown(sections, 2) is None
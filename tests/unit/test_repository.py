@@ -0,0 +1,130 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+
+# The shared repository is built at import; keep it off Firestore.
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+from app.io_supervisor import IOSupervisor
+from app.repository import (
+    COMPLETED_LESSONS_COLLECTION,
+    LEARNING_PROFILES_COLLECTION,
+    LESSONS_COLLECTION,
+    SESSIONS_COLLECTION,
+    Repository,
+)
+from app.storage import MemoryBackend, Write
+
+LESSON = {
+    "current_lesson_plan": {"topic": "Volcanoes"},
+    "parsed_section_markdowns": [{"index": 0, "markdown": "# Volcanoes"}],
+    "current_lesson_section_index": 0,
+}
+
+
+def make_repository():
+    backend = MemoryBackend()
+    return Repository(backend, io=IOSupervisor(name="test")), backend
+
+
+def test_section_advance_after_bootstrap_is_a_field_update() -> None:
+    async def scenario():
+        repository, backend = make_repository()
+        await backend.commit([Write("set", LESSONS_COLLECTION, "u1", {"user_id": "u1", **LESSON})])
+
+        loaded = await repository.load_lesson_state("u1", refresh=True)
+        repository.mark_lesson_state_loaded("u1", loaded)
+        assert await repository.commit_state("app", "u1", lesson_state=dict(LESSON, current_lesson_section_index=1))
+        assert await repository.commit_state("app", "u1", lesson_state=dict(LESSON, current_lesson_section_index=1))
+
+        stored = backend.documents(LESSONS_COLLECTION)["u1"]
+        assert stored["current_lesson_section_index"] == 1
+        assert stored["current_lesson_plan"] == LESSON["current_lesson_plan"]
+        # One refresh read, one commit; the repeated save was a no-op.
+        assert backend.stats()["rpcs"] == {"commit": 2, "get": 1}
+
+        # Served from the cache, which the save kept current.
+        assert (await repository.load_lesson_state("u1"))["current_lesson_section_index"] == 1
+        assert backend.rpcs["get"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_delta_against_a_deleted_document_rewrites_it() -> None:
+    async def scenario():
+        repository, backend = make_repository()
+        await repository.commit_state("app", "u1", lesson_state=LESSON, session_write=("s1", {"last_completed_topic": "Frogs"}))
+        await backend.commit([Write("delete", LESSONS_COLLECTION, "u1")])
+
+        assert await repository.commit_state("app", "u1", lesson_state=dict(LESSON, current_lesson_section_index=2))
+        assert backend.documents(LESSONS_COLLECTION)["u1"]["parsed_section_markdowns"] == LESSON["parsed_section_markdowns"]
+        assert backend.documents(SESSIONS_COLLECTION)["app__u1"] == {"session_id": "s1", "state": {"last_completed_topic": "Frogs"}}
+        assert await repository.load_session_state("app", "u1") == {"last_completed_topic": "Frogs"}
+
+    asyncio.run(scenario())
+
+
+def test_completed_lessons_update_profile_and_history() -> None:
+    async def scenario():
+        repository, backend = make_repository()
+        # A lesson completed before profiles existed: the first save backfills it.
+        await backend.commit([Write("set", COMPLETED_LESSONS_COLLECTION, "u1_frogs", {
+            "user_id": "u1", "topic": "Frogs", "grade_level": "Ages 6-10", "completion_date": "2025-01-01T00:00:00",
+        })])
+        await repository.save_completed_lesson("u1", {"topic": "Space", "grade_level": "Ages 6-10"}, "2025-01-02T00:00:00")
+        saved = await repository.save_completed_lesson("u1", {"topic": "Volcanoes", "grade_level": "Ages 11-14"}, "2025-01-03T00:00:00")
+
+        profile = await repository.learning_profile("u1")
+        assert saved == profile
+        assert sorted(profile["completed_topics"]) == ["Frogs", "Space", "Volcanoes"]
+        assert profile["grade_level"] == "Ages 6-10"
+        assert backend.documents(LEARNING_PROFILES_COLLECTION)["u1"]["total_lessons_completed"] == 3
+
+        page = await repository.completed_lessons_page("u1", limit=2)
+        assert [lesson["topic"] for lesson in page["lessons"]] == ["Volcanoes", "Space"]
+        assert page["total"] == 3
+        rest = await repository.completed_lessons_page("u1", limit=2, cursor=page["next_cursor"], total=page["total"])
+        assert [lesson["topic"] for lesson in rest["lessons"]] == ["Frogs"]
+        assert rest["next_cursor"] is None
+
+    asyncio.run(scenario())
+
+
+def test_profile_backfill_losing_a_race_returns_the_stored_profile() -> None:
+    async def scenario():
+        repository, backend = make_repository()
+        commit = backend.commit
+
+        async def commit_after_concurrent_save(writes):
+            # A save_completed_lesson commits its profile between the backfill's read and create.
+            backend.commit = commit
+            await repository.save_completed_lesson("u1", {"topic": "Space", "grade_level": "Ages 6-10"}, "2025-01-02T00:00:00")
+            await commit(writes)
+
+        backend.commit = commit_after_concurrent_save
+        profile = await repository.learning_profile("u1")
+        assert profile["completed_topics"] == ["Space"]
+
+    asyncio.run(scenario())
+
+
+def test_connectivity_check_cleans_up() -> None:
+    async def scenario():
+        repository, backend = make_repository()
+        assert await repository.check_connectivity()
+        assert backend.documents(LESSONS_COLLECTION) == {}
+
+    asyncio.run(scenario())
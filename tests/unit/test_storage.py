@@ -0,0 +1,139 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import random
+
+import pytest
+
+from app.storage import (
+    DocumentExists,
+    DocumentNotFound,
+    LatencyModel,
+    MemoryBackend,
+    SQLiteBackend,
+    VersionedBackend,
+    Write,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make():
+        if request.param == "memory":
+            return MemoryBackend()
+        return SQLiteBackend(str(tmp_path / "state.sqlite3"))
+    return make
+
+
+def test_commit_is_atomic(make_backend) -> None:
+    async def scenario():
+        backend = make_backend()
+        await backend.commit([Write("set", "docs", "a", {"n": 1, "tag": "x"})])
+        await backend.commit([Write("update", "docs", "a", {"n": 2})])
+        assert await backend.get("docs", "a") == {"n": 2, "tag": "x"}
+
+        with pytest.raises(DocumentNotFound):
+            await backend.commit([Write("set", "docs", "b", {"n": 1}), Write("update", "docs", "missing", {"n": 1})])
+        assert await backend.get("docs", "b") is None
+        with pytest.raises(DocumentExists):
+            await backend.commit([Write("create", "docs", "a", {"n": 3})])
+
+        await backend.commit([Write("delete", "docs", "a")])
+        assert await backend.get("docs", "a") is None
+        assert backend.stats()["rpcs"]["commit"] == 5
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_query_filters_orders_projects_and_pages(make_backend) -> None:
+    async def scenario():
+        backend = make_backend()
+        await backend.commit([
+            Write("set", "lessons", f"u1_{day}", {"user_id": "u1", "topic": f"t{day}", "date": f"2025-01-0{day}", "big": "x" * 10})
+            for day in range(1, 6)
+        ] + [
+            Write("set", "lessons", "u2_1", {"user_id": "u2", "topic": "other", "date": "2025-01-09"}),
+            Write("set", "lessons", "u1_undated", {"user_id": "u1", "topic": "undated"}),
+        ])
+        page = await backend.query("lessons", {"user_id": "u1"}, order_by="date", descending=True, fields=("topic", "date"), limit=2)
+        assert page == [{"topic": "t5", "date": "2025-01-05"}, {"topic": "t4", "date": "2025-01-04"}]
+        page = await backend.query(
+            "lessons", {"user_id": "u1"}, order_by="date", descending=True, fields=("topic",), limit=2, start_after="2025-01-04"
+        )
+        assert page == [{"topic": "t3"}, {"topic": "t2"}]
+        assert len(await backend.query("lessons", {"user_id": "u1"})) == 6
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_read_modify_write_retries_on_concurrent_change(make_backend) -> None:
+    async def scenario():
+        backend = make_backend()
+        await backend.commit([Write("set", "counters", "c", {"n": 0})])
+        attempts = 0
+
+        async def increment(document):
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                # Another writer sneaks in between the read and the commit.
+                await backend.commit([Write("set", "counters", "c", {"n": 10})])
+            return [Write("set", "counters", "c", {"n": document["n"] + 1})]
+
+        await backend.read_modify_write("counters", "c", increment)
+        assert attempts == 2
+        assert await backend.get("counters", "c") == {"n": 11}
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_versioned_backend_without_transaction_hooks_cannot_be_built() -> None:
+    class Incomplete(VersionedBackend):
+        async def get(self, collection, doc_id):
+            return None
+
+        async def commit(self, writes):
+            pass
+
+        async def query(self, collection, where, **kwargs):
+            return []
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_memory_backend_injects_latency_and_copies_documents() -> None:
+    async def scenario():
+        backend = MemoryBackend(latency=LatencyModel(median_ms=2, p99_ms=5), seed=1)
+        document = {"items": [1]}
+        await backend.commit([Write("set", "docs", "a", document)])
+        document["items"].append(2)
+        fetched = await backend.get("docs", "a")
+        fetched["items"].append(3)
+        assert await backend.get("docs", "a") == {"items": [1]}
+        assert backend.stats()["rpcs"] == {"commit": 1, "get": 2}
+
+    asyncio.run(scenario())
+
+
+def test_latency_model_matches_median_and_p99() -> None:
+    model = LatencyModel(median_ms=10, p99_ms=100)
+    rng = random.Random(7)
+    samples = sorted(model.sample_seconds(rng) * 1000 for _ in range(20000))
+    assert 9 < samples[len(samples) // 2] < 11
+    assert 85 < samples[int(len(samples) * 0.99)] < 115
@@ -0,0 +1,79 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app import topic_index
+from app.topic_index import TopicIndex, covers_topic, topic_similarity, topic_tokens, topics_match
+
+
+def test_tokens_drop_filler_and_stem_plurals():
+    assert topic_tokens("Teach me about the Volcanoes!") == ["volcano"]
+    assert topic_tokens("Butterflies and moths") == ["butterfly", "moth"]
+    assert topic_tokens("Glass and cactus") == ["glass", "cactus"]
+
+
+def test_similarity_tolerates_phrasing_but_not_different_topics():
+    assert topic_similarity("dinosaurs", "The Dinosaur") > 0.999
+    assert topic_similarity("solar system", "system, solar") > 0.999
+    assert topic_similarity("photosynthesis", "photosynthsis") > 0.7
+    assert topic_similarity("dogs", "frogs") < 0.5
+    assert topic_similarity("", "dogs") == 0.0
+
+
+def test_best_match_respects_threshold_and_discard():
+    index = TopicIndex(threshold=0.7)
+    for topic in ("volcano", "solar system", "honeybee"):
+        index.add(topic)
+    assert index.best_match("how volcanoes work")[0] == "volcano"
+    assert index.best_match("sharks") is None
+    index.discard("volcano")
+    assert index.best_match("volcanoes") is None
+    assert "volcano" not in index and len(index) == 2
+    index.add("volcano")
+    assert index.best_match("volcanoes")[0] == "volcano"
+
+
+def test_narrower_topics_do_not_match_the_broader_topic_they_contain():
+    index = TopicIndex(threshold=0.7)
+    for topic in ("volcanoes", "sharks", "dinosaurs"):
+        index.add(topic)
+    assert topic_similarity("volcanoes on mars", "volcanoes") > 0.7
+    assert index.best_match("volcanoes on mars") is None
+    assert index.best_match("whale sharks") is None
+    assert not topics_match("volcanoes on mars", "volcanoes")
+    assert not covers_topic("sharks", "whale sharks")
+    # The broader request is covered by the narrower topic's words; the overall score decides.
+    assert covers_topic("whale sharks", "sharks")
+    assert index.best_match("Tell me about the sharks")[0] == "sharks"
+    assert topics_match("photosynthsis", "photosynthesis")
+
+
+def test_best_match_skips_higher_scoring_topics_that_miss_a_word():
+    index = TopicIndex(threshold=0.5)
+    index.add("volcanoes")
+    index.add("volcanoes mars rover")
+    assert index.best_match("volcanoes on mars")[0] == "volcanoes mars rover"
+    index.discard("volcanoes mars rover")
+    assert index.best_match("volcanoes on mars") is None
+
+
+def test_merged_and_unmerged_postings_score_the_same(monkeypatch):
+    monkeypatch.setattr(topic_index, "_MIN_MERGE_POSTINGS", 10 ** 9)
+    topics = [f"topic {word} number {n}" for n in range(50) for word in ("alpha", "beta")]
+    index = TopicIndex()
+    for topic in topics:
+        index.add(topic)
+    unmerged = index.scores("alpha number 7")
+    index._merge()
+    assert abs(index.scores("alpha number 7") - unmerged).max() < 1e-6
+    assert index.best_match("alpha number 7")[0] == "topic alpha number 7"